@@ -0,0 +1,7 @@
+"""
+Suíte de benchmarks do RPI.
+
+Executada pelo comando ``python manage.py benchmark``. Mede tempo, número de
+consultas SQL e pico de memória das views mais pesadas em bases de tamanhos
+diferentes, gravando o resultado em JSON e comparando com um baseline.
+"""
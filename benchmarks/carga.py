@@ -0,0 +1,128 @@
+"""
+Teste de carga simples contra um servidor em execução (só biblioteca padrão).
+
+Dispara requisições concorrentes durante um tempo fixo e informa
+requisições/segundo e latências, para comparar o runserver com o
+gunicorn + nginx:
+
+    python manage.py runserver 8000 --noreload
+    python -m benchmarks.carga http://localhost:8000/contas/login/ --rotulo runserver
+
+    docker compose up
+    python -m benchmarks.carga http://localhost:8000/contas/login/ --rotulo gunicorn
+
+Páginas autenticadas: copie o cookie de sessão do navegador em --sessao.
+"""
+
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def _trabalhador(url, cabecalhos, fim, latencias, erros, lock):
+    partes = urlsplit(url)
+    classe = http.client.HTTPSConnection if partes.scheme == "https" else http.client.HTTPConnection
+    caminho = partes.path or "/"
+    if partes.query:
+        caminho += "?" + partes.query
+
+    # Uma conexão keep-alive por trabalhador, como um navegador
+    conexao = classe(partes.netloc, timeout=30)
+    locais, falhas = [], 0
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        try:
+            conexao.request("GET", caminho, headers=cabecalhos)
+            resposta = conexao.getresponse()
+            resposta.read()
+            if resposta.status >= 400:
+                falhas += 1
+            else:
+                locais.append(time.perf_counter() - inicio)
+        except (OSError, http.client.HTTPException):
+            falhas += 1
+            conexao.close()
+            conexao = classe(partes.netloc, timeout=30)
+    conexao.close()
+
+    with lock:
+        latencias.extend(locais)
+        erros[0] += falhas
+
+
+def executar_carga(url, concorrencia, duracao, sessao=None, gzip=True):
+    cabecalhos = {"User-Agent": "rpi-carga/1.0"}
+    if sessao:
+        cabecalhos["Cookie"] = f"sessionid={sessao}"
+    if gzip:
+        cabecalhos["Accept-Encoding"] = "gzip"
+
+    latencias, erros, lock = [], [0], threading.Lock()
+    fim = time.perf_counter() + duracao
+    threads = [
+        threading.Thread(
+            target=_trabalhador, args=(url, cabecalhos, fim, latencias, erros, lock)
+        )
+        for _ in range(concorrencia)
+    ]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    decorrido = time.perf_counter() - inicio
+
+    latencias.sort()
+
+    def percentil(p):
+        if not latencias:
+            return 0.0
+        return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000
+
+    return {
+        "url": url,
+        "concorrencia": concorrencia,
+        "duracao_s": round(decorrido, 2),
+        "requisicoes": len(latencias),
+        "erros": erros[0],
+        "req_por_segundo": round(len(latencias) / decorrido, 1),
+        "latencia_ms_mediana": round(statistics.median(latencias) * 1000, 1) if latencias else 0.0,
+        "latencia_ms_p95": round(percentil(0.95), 1),
+        "latencia_ms_p99": round(percentil(0.99), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga (requisições/segundo).")
+    parser.add_argument("urls", nargs="+", help="URLs a testar (uma rodada por URL)")
+    parser.add_argument("-c", "--concorrencia", type=int, default=10)
+    parser.add_argument("-d", "--duracao", type=float, default=15, help="Segundos por URL")
+    parser.add_argument("--sessao", help="Valor do cookie sessionid para páginas autenticadas")
+    parser.add_argument("--sem-gzip", action="store_true", help="Não envia Accept-Encoding")
+    parser.add_argument("--rotulo", default="", help="Identifica a rodada (ex.: runserver)")
+    parser.add_argument("--saida", help="Acrescenta o resultado (JSON Lines) neste arquivo")
+    args = parser.parse_args(argv)
+
+    for url in args.urls:
+        resultado = executar_carga(
+            url, args.concorrencia, args.duracao, args.sessao, gzip=not args.sem_gzip
+        )
+        resultado["rotulo"] = args.rotulo
+        print(
+            f"{args.rotulo or '-'} {url}: {resultado['req_por_segundo']} req/s | "
+            f"mediana {resultado['latencia_ms_mediana']} ms | "
+            f"p95 {resultado['latencia_ms_p95']} ms | "
+            f"p99 {resultado['latencia_ms_p99']} ms | "
+            f"{resultado['requisicoes']} ok, {resultado['erros']} erros"
+        )
+        if args.saida:
+            with open(args.saida, "a", encoding="utf-8") as arquivo:
+                arquivo.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
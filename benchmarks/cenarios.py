@@ -0,0 +1,111 @@
+"""
+Cenários medidos pela suíte.
+
+Cada cenário recebe o `Client` de testes (já autenticado) e o dicionário
+devolvido por `dados.popular_base`, faz UMA requisição e devolve a resposta.
+O executor confere o status esperado para não medir páginas de erro.
+"""
+
+from django.urls import reverse
+
+CENARIOS = {}
+
+
+def cenario(nome, status=200):
+    """Registra a função no dicionário CENARIOS com o status HTTP esperado."""
+
+    def decorador(func):
+        CENARIOS[nome] = {"func": func, "status": status}
+        return func
+
+    return decorador
+
+
+def _periodo(base):
+    return {"data_inicio": base["data_inicio"], "data_fim": base["data_fim"]}
+
+
+def dados_post_ocorrencia(base, envolvidos=3, apreensoes=2):
+    """Monta o POST completo do formulário de ocorrência com os formsets."""
+    dados = {
+        "data_hora_bruta": "151435DEZ25",
+        "natureza": base["naturezas"][0].pk,
+        "tipo_acao": "C",
+        "instrumento": base["instrumento"].pk,
+        "opm": base["opms"][0].pk,
+        "municipio": base["municipios"][0].pk,
+        "rua": "RUA DO BENCHMARK",
+        "numero": "100",
+        "bairro": "CENTRO",
+        "resumo_cabecalho": "BENCHMARK",
+        "relato_historico": "relato gerado pelo benchmark",
+        # Management forms
+        "envolvidos-TOTAL_FORMS": envolvidos,
+        "envolvidos-INITIAL_FORMS": 0,
+        "apreensoes-TOTAL_FORMS": apreensoes,
+        "apreensoes-INITIAL_FORMS": 0,
+        "imagens-TOTAL_FORMS": 0,
+        "imagens-INITIAL_FORMS": 0,
+    }
+    for i in range(envolvidos):
+        dados.update(
+            {
+                f"envolvidos-{i}-nome": f"fulano {i}",
+                f"envolvidos-{i}-tipo_participante": "P",
+                f"envolvidos-{i}-idade": 30,
+                f"envolvidos-{i}-antecedentes": "N",
+            }
+        )
+    for i in range(apreensoes):
+        dados.update(
+            {
+                f"apreensoes-{i}-material_tipo": base["materiais"][i % 3].pk,
+                f"apreensoes-{i}-quantidade": "2",
+                f"apreensoes-{i}-unidade_medida": "un",
+            }
+        )
+    return dados
+
+
+@cenario("ocorrencia_list")
+def ocorrencia_list(client, base):
+    return client.get(reverse("ocorrencia_list"))
+
+
+@cenario("ocorrencia_create_post", status=302)
+def ocorrencia_create_post(client, base):
+    return client.post(reverse("ocorrencia_create"), dados_post_ocorrencia(base))
+
+
+@cenario("ocorrencia_create_post_grande", status=302)
+def ocorrencia_create_post_grande(client, base):
+    # Muitas linhas nos formsets: mede o custo por linha de formulário
+    return client.post(
+        reverse("ocorrencia_create"),
+        dados_post_ocorrencia(base, envolvidos=25, apreensoes=25),
+    )
+
+
+@cenario("lista_cvli")
+def lista_cvli(client, base):
+    return client.get(reverse("lista_cvli"), _periodo(base))
+
+
+@cenario("listar_prisoes_por_opm")
+def listar_prisoes_por_opm(client, base):
+    return client.get(reverse("listar_prisoes_por_opm"), _periodo(base))
+
+
+@cenario("painel_estatisticas")
+def painel_estatisticas(client, base):
+    return client.get(reverse("painel_estatisticas"), _periodo(base))
+
+
+@cenario("auditoria_geral")
+def auditoria_geral(client, base):
+    return client.get(reverse("auditoria_geral"))
+
+
+@cenario("gerar_pdf_relatorio")
+def gerar_pdf_relatorio(client, base):
+    return client.get(reverse("download_pdf_relatorio", args=[base["relatorio"].pk]))
@@ -0,0 +1,89 @@
+"""
+Benchmark de concorrência das chamadas AJAX do formulário.
+
+Simula muitos usuários preenchendo o formulário ao mesmo tempo (busca de
+naturezas e municípios da OPM) enquanto, opcionalmente, alguns clientes
+pedem uma página pesada (ex.: o PDF). Com workers síncronos as chamadas
+AJAX esperam na fila atrás das requisições pesadas; com workers ASGI as
+views assíncronas continuam respondendo.
+
+    # workers síncronos
+    WEB_CONCURRENCY=2 gunicorn -c gunicorn.conf.py core.wsgi:application
+    python -m benchmarks.concorrencia http://localhost:8000 --rotulo wsgi \\
+        --lenta /relatorio/1/pdf/ --sessao <sessionid>
+
+    # workers ASGI
+    WEB_CONCURRENCY=2 GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker \\
+        gunicorn -c gunicorn.conf.py core.asgi:application
+    python -m benchmarks.concorrencia http://localhost:8000 --rotulo asgi \\
+        --lenta /relatorio/1/pdf/ --sessao <sessionid>
+"""
+
+import argparse
+import threading
+
+from .carga import executar_carga
+
+CAMINHOS_AJAX = (
+    "/api/naturezas/buscar/?q=rou",
+    "/ajax/municipios/?opm_id={opm}",
+)
+
+
+def executar(base, usuarios, duracao, opm=1, lenta=None, clientes_lentos=0, sessao=None):
+    """Roda a carga AJAX (e a pesada, se houver) em paralelo e devolve os resultados."""
+    base = base.rstrip("/")
+    resultados = {}
+    rodadas = []
+
+    # Os usuários do formulário se dividem entre as chamadas AJAX
+    por_caminho = max(1, usuarios // len(CAMINHOS_AJAX))
+    for caminho in CAMINHOS_AJAX:
+        url = base + caminho.format(opm=opm)
+        rodadas.append((url, por_caminho))
+    if lenta and clientes_lentos:
+        rodadas.append((base + lenta, clientes_lentos))
+
+    def rodar(url, concorrencia):
+        resultados[url] = executar_carga(url, concorrencia, duracao, sessao)
+
+    threads = [threading.Thread(target=rodar, args=rodada) for rodada in rodadas]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return [resultados[url] for url, _ in rodadas]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concorrência das chamadas AJAX.")
+    parser.add_argument("base", help="URL base do servidor (ex.: http://localhost:8000)")
+    parser.add_argument("-u", "--usuarios", type=int, default=50, help="Usuários simultâneos no formulário")
+    parser.add_argument("-d", "--duracao", type=float, default=20)
+    parser.add_argument("--opm", type=int, default=1, help="OPM usada na busca de municípios")
+    parser.add_argument("--lenta", help="Caminho de uma página pesada para carga de fundo")
+    parser.add_argument("--clientes-lentos", type=int, default=4)
+    parser.add_argument("--sessao", help="Cookie sessionid (necessário para a página pesada)")
+    parser.add_argument("--rotulo", default="")
+    args = parser.parse_args(argv)
+
+    resultados = executar(
+        args.base,
+        args.usuarios,
+        args.duracao,
+        opm=args.opm,
+        lenta=args.lenta,
+        clientes_lentos=args.clientes_lentos if args.lenta else 0,
+        sessao=args.sessao,
+    )
+    for r in resultados:
+        print(
+            f"{args.rotulo or '-'} {r['url']} (x{r['concorrencia']}): "
+            f"{r['req_por_segundo']} req/s | mediana {r['latencia_ms_mediana']} ms | "
+            f"p95 {r['latencia_ms_p95']} ms | p99 {r['latencia_ms_p99']} ms | "
+            f"{r['erros']} erros"
+        )
+
+
+if __name__ == "__main__":
+    main()
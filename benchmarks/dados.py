@@ -0,0 +1,141 @@
+"""
+Geração da massa de dados usada pelos benchmarks.
+
+Tudo é criado dentro do banco de testes aberto pelo executor, nunca no banco
+real. As datas são espalhadas pelos últimos dias para que os filtros de
+período (plantão) das listagens encontrem registros.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from simple_history.utils import bulk_create_with_history
+
+from rpi import estatisticas
+from rpi.models import (
+    OPM,
+    Apreensao,
+    Envolvido,
+    Instrumento,
+    MaterialApreendidoTipo,
+    Municipio,
+    NaturezaOcorrencia,
+    Ocorrencia,
+    RelatorioDiario,
+)
+
+User = get_user_model()
+
+# Quantos dias de histórico a massa cobre (usado nos filtros de período)
+DIAS_COBERTOS = 7
+
+NATUREZAS = [
+    ("HOMICÍDIO DOLOSO", "N", "homicídio,cvli"),
+    ("FEMINICÍDIO", "N", "feminicídio,cvli"),
+    ("ROUBO A PEDESTRE", "N", "roubo,pedestre"),
+    ("TRÁFICO DE ENTORPECENTES", "N", "tráfico,drogas"),
+    ("RECUPERAÇÃO DE VEÍCULO", "P", "recuperado,veículo"),
+]
+
+# Participantes criados para cada ocorrência (tipo, idade)
+PARTICIPANTES = [("V", 31), ("P", 24), ("S", 19)]
+
+
+def popular_base(tamanho):
+    """
+    Cria `tamanho` ocorrências (com envolvidos e apreensões) em um relatório
+    aberto e devolve um dicionário com os objetos de apoio dos cenários.
+    """
+    usuario = User.objects.create_superuser(
+        username=f"bench{tamanho}",
+        email=f"bench{tamanho}@bm.rs.gov.br",
+        password="bench",
+    )
+
+    municipios = [Municipio.objects.create(nome=f"MUNICÍPIO {i}") for i in range(5)]
+    opms = []
+    for i in range(3):
+        opm = OPM.objects.create(nome=f"{i + 1}º BPM", sigla=f"{i + 1}BPM")
+        opm.municipios.set(municipios)
+        opms.append(opm)
+
+    naturezas = [
+        NaturezaOcorrencia.objects.create(nome=nome, tipo_impacto=tipo, tags_busca=tags)
+        for nome, tipo, tags in NATUREZAS
+    ]
+    instrumento = Instrumento.objects.create(nome="ARMA DE FOGO")
+    materiais = [
+        MaterialApreendidoTipo.objects.create(nome=nome)
+        for nome in ("PISTOLA", "MACONHA", "COCAÍNA")
+    ]
+
+    agora = timezone.now()
+    relatorio = RelatorioDiario.objects.create(
+        nr_relatorio=1,
+        ano_criacao=agora.year,
+        data_inicio=agora - timedelta(hours=1),
+        data_fim=agora + timedelta(hours=23),
+        usuario_responsavel=usuario,
+    )
+
+    # 1. Ocorrências (bulk com histórico para alimentar a auditoria)
+    ocorrencias = []
+    for i in range(tamanho):
+        ocorrencias.append(
+            Ocorrencia(
+                natureza=naturezas[i % len(naturezas)],
+                relatorio_diario=relatorio,
+                opm=opms[i % len(opms)],
+                municipio=municipios[i % len(municipios)],
+                instrumento=instrumento if i % len(naturezas) < 2 else None,
+                data_hora_fato=agora - timedelta(minutes=(i * 17) % (DIAS_COBERTOS * 1440)),
+                resumo_cabecalho=f"OCORRÊNCIA {i}",
+                relato_historico="relato de teste " * 20,
+                rua="RUA DAS FLORES",
+                numero=str(i),
+                bairro="CENTRO",
+            )
+        )
+    ocorrencias = bulk_create_with_history(ocorrencias, Ocorrencia, default_user=usuario)
+
+    # 2. Envolvidos e apreensões de cada ocorrência
+    envolvidos = []
+    apreensoes = []
+    for i, ocorrencia in enumerate(ocorrencias):
+        for tipo, idade in PARTICIPANTES:
+            envolvidos.append(
+                Envolvido(
+                    ocorrencia=ocorrencia,
+                    nome=f"ENVOLVIDO {i} {tipo}",
+                    tipo_participante=tipo,
+                    idade=idade,
+                    antecedentes="N",
+                )
+            )
+        apreensoes.append(
+            Apreensao(
+                ocorrencia=ocorrencia,
+                material_tipo=materiais[i % len(materiais)],
+                quantidade=Decimal("1.50"),
+                unidade_medida="kg",
+            )
+        )
+    bulk_create_with_history(envolvidos, Envolvido, default_user=usuario)
+    bulk_create_with_history(apreensoes, Apreensao, default_user=usuario)
+
+    # 3. bulk_create não dispara os sinais que mantêm as estatísticas
+    estatisticas.reconstruir()
+
+    return {
+        "usuario": usuario,
+        "relatorio": relatorio,
+        "opms": opms,
+        "municipios": municipios,
+        "naturezas": naturezas,
+        "instrumento": instrumento,
+        "materiais": materiais,
+        "data_inicio": (agora - timedelta(days=DIAS_COBERTOS)).strftime("%Y-%m-%d"),
+        "data_fim": agora.strftime("%Y-%m-%d"),
+    }
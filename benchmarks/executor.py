@@ -0,0 +1,201 @@
+"""
+Execução dos cenários e comparação com o baseline.
+
+O executor cria um banco de testes descartável (igual ao `manage.py test`),
+popula a massa para cada tamanho e mede cada cenário:
+
+- tempo: mediana e mínimo de N repetições (após um aquecimento);
+- consultas: número de comandos SQL de uma execução;
+- memória: pico alocado (tracemalloc) de uma execução.
+
+Cada execução roda dentro de um savepoint desfeito em seguida, para que os
+cenários que gravam (POST) não alterem a base dos cenários seguintes.
+"""
+
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+import django
+from django.core.cache import cache
+from django.db import connection, reset_queries, transaction
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.utils import timezone
+
+from .cenarios import CENARIOS
+from .dados import popular_base
+
+# Métricas comparadas com o baseline. As de tempo e memória usam o limite
+# percentual; a de consultas não admite aumento algum.
+METRICAS_PERCENTUAIS = ("tempo_ms_mediana", "memoria_pico_kb")
+
+# Cache próprio da execução: o default (FileBasedCache em cache/) é o mesmo
+# da aplicação em produção e não pode ser limpo nem receber dados do banco
+# de testes
+CACHES_BENCHMARK = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmark",
+    }
+}
+
+
+class CenarioIgnorado(Exception):
+    """Cenário que não pode rodar neste ambiente (ex.: WeasyPrint ausente)."""
+
+
+def _executar_uma_vez(func, client, base, status_esperado):
+    sid = transaction.savepoint()
+    try:
+        try:
+            resposta = func(client, base)
+        except (ImportError, OSError) as e:
+            raise CenarioIgnorado(str(e)) from e
+
+        # Respostas em streaming só fazem o trabalho quando consumidas
+        if getattr(resposta, "streaming", False):
+            b"".join(resposta.streaming_content)
+
+        if resposta.status_code != status_esperado:
+            raise AssertionError(
+                f"status {resposta.status_code} (esperado {status_esperado})"
+            )
+        return resposta
+    finally:
+        transaction.savepoint_rollback(sid)
+
+
+def medir(nome, client, base, repeticoes):
+    """Mede um cenário e devolve o dicionário de métricas."""
+    func = CENARIOS[nome]["func"]
+    status = CENARIOS[nome]["status"]
+
+    # 1. Aquecimento (cache de templates, URLconf, conexões)
+    _executar_uma_vez(func, client, base, status)
+
+    # 2. Tempo
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        _executar_uma_vez(func, client, base, status)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+
+    # 3. Consultas SQL
+    reset_queries()
+    with CaptureQueriesContext(connection) as consultas:
+        _executar_uma_vez(func, client, base, status)
+    # Lido já aqui: a próxima requisição limpa o log de consultas
+    total_consultas = len(consultas.captured_queries)
+
+    # 4. Pico de memória
+    tracemalloc.start()
+    try:
+        _executar_uma_vez(func, client, base, status)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "tempo_ms_mediana": round(statistics.median(tempos), 3),
+        "tempo_ms_min": round(min(tempos), 3),
+        "consultas": total_consultas,
+        "memoria_pico_kb": round(pico / 1024, 1),
+    }
+
+
+def executar(tamanhos, repeticoes, nomes_cenarios, log=print):
+    """Roda todos os cenários em todos os tamanhos e devolve o relatório."""
+    resultados = {}
+    ignorados = {}
+
+    # DEBUG desligado como em produção (e para não acumular o log de consultas)
+    setup_test_environment(debug=False)
+    caches_isolados = override_settings(CACHES=CACHES_BENCHMARK)
+    caches_isolados.enable()
+    nome_banco = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        for tamanho in tamanhos:
+            # Cada massa é desfeita no fim do tamanho; o cache dela também
+            cache.clear()
+            with transaction.atomic():
+                log(f"Populando base com {tamanho} ocorrências...")
+                base = popular_base(tamanho)
+                client = Client()
+                client.force_login(base["usuario"])
+
+                for nome in nomes_cenarios:
+                    chave = f"{nome}@{tamanho}"
+                    try:
+                        resultados[chave] = medir(nome, client, base, repeticoes)
+                    except CenarioIgnorado as e:
+                        ignorados[chave] = str(e)
+                        log(f"  - {chave}: ignorado ({e})")
+                        continue
+                    log(f"  - {chave}: {resultados[chave]}")
+
+                # Descarta a massa antes do próximo tamanho
+                transaction.set_rollback(True)
+    finally:
+        connection.creation.destroy_test_db(nome_banco, verbosity=0)
+        caches_isolados.disable()
+        teardown_test_environment()
+
+    return {
+        "meta": {
+            "data": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "banco": connection.vendor,
+            "tamanhos": list(tamanhos),
+            "repeticoes": repeticoes,
+        },
+        "resultados": resultados,
+        "ignorados": ignorados,
+    }
+
+
+def comparar(atual, baseline, limite):
+    """
+    Compara dois relatórios e devolve a lista de regressões encontradas.
+    `limite` é a tolerância relativa (0.2 = até 20% mais lento/maior).
+    """
+    regressoes = []
+    for chave, metricas in atual["resultados"].items():
+        anterior = baseline.get("resultados", {}).get(chave)
+        if not anterior:
+            continue
+
+        for metrica in METRICAS_PERCENTUAIS:
+            base_valor = anterior.get(metrica)
+            if base_valor and metricas[metrica] > base_valor * (1 + limite):
+                regressoes.append(
+                    f"{chave} {metrica}: {metricas[metrica]} "
+                    f"(baseline {base_valor}, +{metricas[metrica] / base_valor - 1:.0%})"
+                )
+
+        if metricas["consultas"] > anterior.get("consultas", metricas["consultas"]):
+            regressoes.append(
+                f"{chave} consultas: {metricas['consultas']} "
+                f"(baseline {anterior['consultas']})"
+            )
+    return regressoes
+
+
+def salvar_json(relatorio, caminho):
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+
+def carregar_json(caminho):
+    return json.loads(Path(caminho).read_text())
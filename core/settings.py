@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -9,12 +10,26 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = "django-insecure-_r(hk7kp^^z#-$580@ey&udji3digs1_1v(1#)_lw@(+i2k^-s"
+# Em produção defina DJANGO_SECRET_KEY, DJANGO_DEBUG=0 e DJANGO_ALLOWED_HOSTS
+# (ver gunicorn.conf.py e deploy/nginx.conf)
+SECRET_KEY = os.environ.get(
+    "DJANGO_SECRET_KEY",
+    "django-insecure-_r(hk7kp^^z#-$580@ey&udji3digs1_1v(1#)_lw@(+i2k^-s",
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get("DJANGO_DEBUG", "1") == "1"
+
+ALLOWED_HOSTS = os.environ.get(
+    "DJANGO_ALLOWED_HOSTS", "192.168.8.20,127.0.0.1,localhost"
+).split(",")
 
-ALLOWED_HOSTS = ["192.168.8.20", "127.0.0.1", "localhost"]
+# Atrás do nginx (docker-compose.yml define DJANGO_ATRAS_DO_PROXY=1): o
+# esquema original chega no X-Forwarded-Proto, que o nginx sempre reescreve.
+# Sem o proxy (runserver, gunicorn exposto direto) o cabeçalho viria do
+# cliente e não pode ser aceito
+if os.environ.get("DJANGO_ATRAS_DO_PROXY", "0") == "1":
+    SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
 
 # Application definition
@@ -32,6 +47,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Instrumentação de desempenho (ver METRICAS_* e CONSULTAS_LENTAS_* abaixo)
+    "rpi.middleware.ConsultasLentasMiddleware",
+    "rpi.middleware.MetricasMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -40,6 +58,8 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "simple_history.middleware.HistoryRequestMiddleware",
+    # Depois da autenticação: só usuários staff podem pedir perfis
+    "rpi.middleware.PerfilamentoMiddleware",
 ]
 
 ROOT_URLCONF = "core.urls"
@@ -54,6 +74,8 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                # relatorio_aberto (rpi/relatorio_atual.py)
+                "rpi.relatorio_atual.contexto",
             ],
         },
     },
@@ -116,10 +138,101 @@ STATICFILES_DIRS = [
 # Para produção
 STATIC_ROOT = BASE_DIR / "staticfiles"  # usado com collectstatic
 
+# Em produção o collectstatic gera nomes com hash do conteúdo e as versões
+# .gz/.br de cada arquivo (rpi/storage.py); o nginx serve tudo com cache
+# imutável. Em desenvolvimento os arquivos são servidos sem processamento.
+STORAGES = {
+    # Uploads deduplicados pelo SHA-256 (hard links para MEDIA_ROOT/blobs/);
+    # mídia já existente: manage.py deduplicar_midia. Lê também a mídia
+    # arquivada na camada fria (MIDIA_ARQUIVO_DIR)
+    "default": {
+        "BACKEND": "rpi.storage.ArmazenamentoComArquivo",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage"
+            if DEBUG
+            else "rpi.storage.ManifestPrecomprimidoStorage"
+        ),
+    },
+}
+
 # Media files (uploads)
+# Com DEBUG=0 o Django não serve /static/ (o nginx lê direto do disco, ver
+# deploy/nginx.conf). A mídia passa sempre pela view servir_midia, que exige
+# login (ver MIDIA_ENVIO abaixo)
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Envio de fotos em partes, com retomada (rpi/uploads.py). Os arquivos ficam
+# nesta área temporária (fora do MEDIA_ROOT, que o nginx publica) até serem
+# anexados à ocorrência pelo token; os não anexados expiram.
+UPLOAD_TEMPORARIO_DIR = BASE_DIR / "uploads_temporarios"
+UPLOAD_TEMPORARIO_HORAS = 24
+
+# Mídia sem referência no banco (manage.py limpar_midia_orfa): vai para a
+# quarentena (fora do MEDIA_ROOT) e é apagada de vez após
+# MIDIA_QUARENTENA_DIAS. Arquivos mais novos que MIDIA_ORFA_HORAS são
+# ignorados (podem pertencer a um registro ainda não gravado).
+MIDIA_QUARENTENA_DIR = BASE_DIR / "midia_quarentena"
+MIDIA_QUARENTENA_DIAS = 30
+MIDIA_ORFA_HORAS = 24
+
+# Camada fria (manage.py arquivar_midia_antiga, rpi/arquivo_midia.py): a
+# mídia dos relatórios finalizados há mais de MIDIA_ARQUIVO_DIAS vai para um
+# .zip por relatório em MIDIA_ARQUIVO_DIR (pode ser um disco mais lento). Ao
+# ser lido, o arquivo é extraído para MIDIA_ARQUIVO_CACHE_DIR, que guarda os
+# mais usados até MIDIA_ARQUIVO_CACHE_MB.
+MIDIA_ARQUIVO_DIR = Path(os.environ.get("DJANGO_MIDIA_ARQUIVO_DIR", BASE_DIR / "midia_arquivo"))
+MIDIA_ARQUIVO_DIAS = 365
+MIDIA_ARQUIVO_CACHE_DIR = BASE_DIR / "midia_arquivo_cache"
+MIDIA_ARQUIVO_CACHE_MB = 500
+
+# Entrega da mídia (rpi/midia.py): depois de conferir o login, o Django passa
+# o envio ao servidor web com "x-accel-redirect" (nginx) ou "x-sendfile"
+# (Apache/lighttpd). Vazio: o próprio Django envia, com suporte a Range.
+MIDIA_ENVIO = os.environ.get("DJANGO_MIDIA_ENVIO", "")
+# Pasta no disco -> location "internal" do nginx que a publica
+MIDIA_ACCEL_LOCAIS = {
+    MEDIA_ROOT: "/_midia/",
+    MIDIA_ARQUIVO_CACHE_DIR: "/_midia_arquivo/",
+}
+UPLOAD_TAMANHO_MAXIMO = 25 * 1024 * 1024  # mesmo client_max_body_size do nginx
+UPLOAD_TAMANHO_PARTE = 1024 * 1024  # abaixo do DATA_UPLOAD_MAX_MEMORY_SIZE
+
+# Fotos (ocorrências e envolvidos): antes de enviar, o navegador reduz a
+# imagem para no máximo IMAGEM_DIMENSAO_MAXIMA px no maior lado, em JPEG com
+# IMAGEM_QUALIDADE (%). O servidor recusa fotos acima de
+# IMAGEM_TAMANHO_MAXIMO, exceto com DJANGO_IMAGEM_ACEITAR_ORIGINAL=1 (aí o
+# navegador envia o original e vale só o UPLOAD_TAMANHO_MAXIMO).
+IMAGEM_DIMENSAO_MAXIMA = 1600
+IMAGEM_QUALIDADE = 80
+IMAGEM_TAMANHO_MAXIMO = 3 * 1024 * 1024
+IMAGEM_ACEITAR_ORIGINAL = os.environ.get("DJANGO_IMAGEM_ACEITAR_ORIGINAL", "0") == "1"
+# Fotos "iguais" entre ocorrências (rpi/assinaturas.py): até quantos bits de
+# diferença no dHash de 64 bits (no máximo 7; 0 = só cópias quase exatas)
+IMAGEM_DISTANCIA_SIMILAR = 6
+
+
+# Cache compartilhado entre os workers do gunicorn (o padrão do Django,
+# LocMemCache, é por processo: a invalidação feita num worker não chegaria
+# aos outros). Ex. com Redis:
+#   DJANGO_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   DJANGO_CACHE_LOCATION=redis://redis:6379/1
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "DJANGO_CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"
+        ),
+        "LOCATION": os.environ.get("DJANGO_CACHE_LOCATION", str(BASE_DIR / "cache")),
+    }
+}
+
+# manage.py test usa um cache em memória próprio: não lê entradas deixadas
+# pelo servidor de desenvolvimento nem grava dados do banco de testes em cache/
+if sys.argv[1:2] == ["test"]:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -154,3 +267,38 @@ EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
 # Política de Retenção de Auditoria (em dias)
 AUDIT_LOG_RETENTION_DAYS = 1
+
+# Métricas de desempenho por view (rpi.middleware.MetricasMiddleware)
+# Expostas em /metrics no formato do Prometheus para usuários staff ou para
+# quem enviar "Authorization: Bearer <METRICAS_TOKEN>" (se definido).
+METRICAS_HABILITADAS = True
+METRICAS_LIMITE_LENTO_MS = 1000  # Requisições acima disso vão para o log
+METRICAS_TOP_CONSULTAS = 5  # Consultas mais demoradas listadas no log
+METRICAS_TOKEN = os.environ.get("METRICAS_TOKEN", "")
+
+# Captura de consultas lentas (rpi.middleware.ConsultasLentasMiddleware)
+# None desliga a captura. Ex.: CONSULTAS_LENTAS_LIMITE_MS=200
+CONSULTAS_LENTAS_LIMITE_MS = (
+    float(os.environ["CONSULTAS_LENTAS_LIMITE_MS"])
+    if os.environ.get("CONSULTAS_LENTAS_LIMITE_MS")
+    else None
+)
+CONSULTAS_LENTAS_MAX_REGISTROS = 500  # Tamanho do buffer circular
+
+# Perfilamento sob demanda (rpi.middleware.PerfilamentoMiddleware)
+# Com PERFILAMENTO_HABILITADO=1, staff pode adicionar ?_perfil=1 (ou o
+# cabeçalho X-Perfil: 1) a qualquer URL; os perfis ficam em /desempenho/perfis/.
+PERFILAMENTO_HABILITADO = os.environ.get("PERFILAMENTO_HABILITADO") == "1"
+PERFILAMENTO_DIR = BASE_DIR / "perfis"
+PERFILAMENTO_MAX_ARQUIVOS = 50
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "rpi": {"handlers": ["console"], "level": "INFO"},
+    },
+}
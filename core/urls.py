@@ -3,7 +3,7 @@ from django.contrib.auth import views as auth_views
 from django.urls import path, include
 from rpi.forms import EmailLoginForm
 from django.conf import settings  # <--- ADICIONE ESTA LINHA
-from django.conf.urls.static import static
+from rpi.views import servir_midia
 
 urlpatterns = [
     # =======================================================
@@ -76,5 +76,11 @@ urlpatterns = [
         name="password_reset_complete",
     ),
     path("admin/", admin.site.urls),
+    # Mídia só para usuários logados, com ou sem DEBUG (ver rpi/midia.py)
+    path(
+        f"{settings.MEDIA_URL.strip('/')}/<path:caminho>",
+        servir_midia,
+        name="servir_midia",
+    ),
     path("", include("rpi.urls")),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
@@ -0,0 +1,10 @@
+#!/bin/sh
+# Ponto de entrada do contêiner em produção: aplica migrações, publica os
+# arquivos estáticos para o nginx e sobe o gunicorn (configurado por
+# variáveis de ambiente em gunicorn.conf.py).
+set -e
+
+python manage.py migrate --noinput
+python manage.py collectstatic --noinput
+
+exec gunicorn -c gunicorn.conf.py "${GUNICORN_APP:-core.wsgi:application}"
@@ -0,0 +1,56 @@
+"""
+Configuração do gunicorn para produção (substitui o runserver).
+
+Uso:
+    gunicorn -c gunicorn.conf.py core.wsgi:application
+    GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker \
+        gunicorn -c gunicorn.conf.py core.asgi:application
+
+Todas as opções podem ser ajustadas por variáveis de ambiente, sem rebuild da
+imagem. O nginx (deploy/nginx.conf) fica na frente e serve /static/ e /media/.
+"""
+
+import multiprocessing
+import os
+
+
+def _int(nome, padrao):
+    return int(os.environ.get(nome, padrao))
+
+
+# 1. ENDEREÇO
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+# 2. PROCESSOS
+# WEB_CONCURRENCY é a variável usada pela maioria das plataformas de hospedagem.
+# O padrão (2 x CPUs + 1) é a recomendação da documentação do gunicorn.
+workers = _int("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1)
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")
+threads = _int("GUNICORN_THREADS", 1)
+
+# 3. TEMPOS (segundos)
+# A geração de PDF é a requisição mais demorada; o timeout precisa cobri-la.
+timeout = _int("GUNICORN_TIMEOUT", 60)
+graceful_timeout = _int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = _int("GUNICORN_KEEPALIVE", 5)
+
+# 4. RECICLAGEM DOS WORKERS
+# Reinicia cada worker após N requisições (com variação aleatória para não
+# reiniciarem todos juntos), limitando vazamentos de memória.
+max_requests = _int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = _int("GUNICORN_MAX_REQUESTS_JITTER", 100)
+
+# 5. CARREGAMENTO
+# Carrega a aplicação antes do fork: os workers compartilham a memória das
+# páginas já importadas e sobem mais rápido.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# 6. LOGS (stdout/stderr, coletados pelo Docker)
+# GUNICORN_ACCESSLOG vazio desliga o log de acesso
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-") or None
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
+access_log_format = '%(h)s "%(r)s" %(s)s %(b)s %(M)sms "%(a)s"'
+
+# Só confia no X-Forwarded-* vindo do nginx
+forwarded_allow_ips = os.environ.get("GUNICORN_FORWARDED_ALLOW_IPS", "127.0.0.1")
@@ -11,6 +11,9 @@ from .models import (
     MaterialApreendidoTipo,
     Instrumento,
     AuditCleanupLog,
+    ConsultaLenta,
+    UploadTemporario,
+    MidiaArquivada,
 )
 
 # ----------------- 1. CONFIGURAÇÃO DE INLINES -----------------
@@ -207,4 +210,32 @@ class AuditCleanupLogAdmin(admin.ModelAdmin):
     readonly_fields = ('executed_at', 'records_deleted', 'status', 'message')
 
     # Impede que o admin crie logs manuais ou edite os existentes
-    def has_add_permission(self, request): return False
\ No newline at end of file
+    def has_add_permission(self, request): return False
+
+
+@admin.register(ConsultaLenta)
+class ConsultaLentaAdmin(admin.ModelAdmin):
+    list_display = ("registrado_em", "duracao_ms", "view", "origem")
+    list_filter = ("view",)
+    search_fields = ("sql_normalizado", "origem")
+    readonly_fields = [f.name for f in ConsultaLenta._meta.fields]
+
+    def has_add_permission(self, request): return False
+
+
+@admin.register(UploadTemporario)
+class UploadTemporarioAdmin(admin.ModelAdmin):
+    list_display = ("nome_original", "usuario", "recebido", "tamanho", "concluido", "atualizado_em")
+    list_filter = ("concluido",)
+    readonly_fields = [f.name for f in UploadTemporario._meta.fields]
+
+    def has_add_permission(self, request): return False
+
+
+@admin.register(MidiaArquivada)
+class MidiaArquivadaAdmin(admin.ModelAdmin):
+    list_display = ("nome", "relatorio", "pacote", "tamanho", "arquivado_em")
+    search_fields = ("nome", "pacote")
+    readonly_fields = [f.name for f in MidiaArquivada._meta.fields]
+
+    def has_add_permission(self, request): return False
@@ -4,3 +4,22 @@ from django.apps import AppConfig
 class RpiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "rpi"
+
+    def ready(self):
+        # Registra as verificações do "manage.py check" e anota os módulos
+        # pesados já carregados antes do URLconf (ver checks.py)
+        from . import checks
+
+        # Sinais que invalidam o cache de dados de referência
+        from . import referencias  # noqa: F401
+
+        # Hash perceptual das imagens e fotos gravadas
+        from . import assinaturas  # noqa: F401
+
+        # Invalidação do cache do relatório aberto
+        from . import relatorio_atual  # noqa: F401
+
+        # Manutenção das estatísticas consolidadas por dia de plantão
+        from . import estatisticas  # noqa: F401
+
+        checks.registrar_modulos_do_setup()
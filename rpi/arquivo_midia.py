@@ -0,0 +1,160 @@
+"""
+Camada fria da mídia: relatórios antigos em pacotes .zip.
+
+As fotos de relatórios finalizados há anos raramente são abertas, mas
+ocupam o mesmo disco rápido dos plantões atuais. O comando
+arquivar_midia_antiga move as imagens e fotos de envolvidos de cada
+relatório antigo para um pacote MIDIA_ARQUIVO_DIR/<ano>/relatorio-<nr>-<pk>.zip
+e registra cada nome no índice (MidiaArquivada).
+
+Os nomes nos FileFields não mudam. Quando um arquivo não está no MEDIA_ROOT,
+o storage padrão (ArmazenamentoComArquivo) procura o nome no índice e
+extrai só aquele membro do zip para MIDIA_ARQUIVO_CACHE_DIR (`extrair`).
+Esse cache guarda os arquivos mais usados: passando de
+MIDIA_ARQUIVO_CACHE_MB, saem os acessados há mais tempo. Assim `.path`,
+`.open()` e o PDF do relatório continuam funcionando.
+
+Os membros são gravados sem compressão (ZIP_STORED): JPEG e PNG já são
+comprimidos, e o zip serve para juntar os arquivos de um relatório num só,
+com índice interno para ler cada um diretamente.
+"""
+
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Envolvido, MidiaArquivada, OcorrenciaImagem
+
+
+def pasta_arquivo():
+    return Path(settings.MIDIA_ARQUIVO_DIR)
+
+
+def caminho_pacote(relatorio):
+    return Path(str(relatorio.ano_criacao)) / f"relatorio-{relatorio.nr_relatorio}-{relatorio.pk}.zip"
+
+
+def nomes_do_relatorio(relatorio):
+    """Nomes dos arquivos (imagens e fotos de envolvidos) das ocorrências do relatório."""
+    imagens = OcorrenciaImagem.objects.filter(
+        ocorrencia__relatorio_diario=relatorio
+    ).exclude(imagem="").exclude(imagem__isnull=True).values_list("imagem", flat=True)
+    fotos = Envolvido.objects.filter(
+        ocorrencia__relatorio_diario=relatorio
+    ).exclude(foto="").exclude(foto__isnull=True).values_list("foto", flat=True)
+    return sorted(set(imagens) | set(fotos))
+
+
+def arquivar_relatorio(relatorio, storage, simular=False):
+    """
+    Move para o pacote do relatório os arquivos dele que ainda estão no
+    MEDIA_ROOT. Devolve (quantidade, bytes).
+    """
+    # 1. Só o que ainda está no disco quente (e não foi arquivado antes)
+    arquivados = set(
+        MidiaArquivada.objects.filter(relatorio=relatorio).values_list("nome", flat=True)
+    )
+    pendentes = []
+    for nome in nomes_do_relatorio(relatorio):
+        caminho = storage.caminho_local(nome)
+        if nome not in arquivados and os.path.isfile(caminho):
+            pendentes.append((nome, caminho, os.path.getsize(caminho)))
+    total = sum(tamanho for _, _, tamanho in pendentes)
+    if simular or not pendentes:
+        return len(pendentes), total
+
+    # 2. Monta o pacote numa cópia e só então o substitui (um pacote
+    # existente recebe os novos arquivos)
+    relativo = caminho_pacote(relatorio)
+    destino = pasta_arquivo() / relativo
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=destino.parent, suffix=".zip.tmp")
+    os.close(descritor)
+    try:
+        if destino.exists():
+            with open(destino, "rb") as origem, open(temporario, "wb") as copia:
+                for bloco in iter(lambda: origem.read(1024 * 1024), b""):
+                    copia.write(bloco)
+        with zipfile.ZipFile(temporario, "a", zipfile.ZIP_STORED) as pacote:
+            existentes = set(pacote.namelist())
+            for nome, caminho, _ in pendentes:
+                if nome not in existentes:
+                    pacote.write(caminho, arcname=nome)
+        with zipfile.ZipFile(temporario) as pacote:
+            if pacote.testzip() is not None:
+                raise zipfile.BadZipFile(f"Pacote corrompido: {temporario}")
+        os.replace(temporario, destino)
+    except BaseException:
+        os.unlink(temporario)
+        raise
+
+    # 3. Registra no índice e só depois do commit tira do disco quente
+    with transaction.atomic():
+        MidiaArquivada.objects.bulk_create(
+            [
+                MidiaArquivada(nome=nome, relatorio=relatorio, pacote=str(relativo), tamanho=tamanho)
+                for nome, _, tamanho in pendentes
+            ],
+            ignore_conflicts=True,
+        )
+        transaction.on_commit(
+            lambda: [Path(caminho).unlink(missing_ok=True) for _, caminho, _ in pendentes]
+        )
+    return len(pendentes), total
+
+
+# --- LEITURA ---
+
+
+def caminho_cache(nome):
+    return Path(settings.MIDIA_ARQUIVO_CACHE_DIR).joinpath(*nome.split("/"))
+
+
+def extrair(registro):
+    """Caminho local do arquivo arquivado, extraído para o cache se preciso."""
+    destino = caminho_cache(registro.nome)
+    if destino.exists():
+        # Marca o acesso (o cache descarta os menos usados pelo mtime)
+        os.utime(destino)
+        return str(destino)
+
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=destino.parent)
+    try:
+        with os.fdopen(descritor, "wb") as saida, zipfile.ZipFile(
+            pasta_arquivo() / registro.pacote
+        ) as pacote, pacote.open(registro.nome) as membro:
+            for bloco in iter(lambda: membro.read(1024 * 1024), b""):
+                saida.write(bloco)
+        os.replace(temporario, destino)
+    except BaseException:
+        os.unlink(temporario)
+        raise
+    podar_cache()
+    return str(destino)
+
+
+def podar_cache(limite_mb=None):
+    """Apaga os arquivos acessados há mais tempo até o cache caber no limite."""
+    limite = (settings.MIDIA_ARQUIVO_CACHE_MB if limite_mb is None else limite_mb) * 1024 * 1024
+    arquivos = []
+    total = 0
+    for raiz, _, nomes in os.walk(settings.MIDIA_ARQUIVO_CACHE_DIR):
+        for nome in nomes:
+            caminho = os.path.join(raiz, nome)
+            try:
+                info = os.stat(caminho)
+            except FileNotFoundError:
+                continue
+            arquivos.append((info.st_mtime, info.st_size, caminho))
+            total += info.st_size
+
+    for _, tamanho, caminho in sorted(arquivos):
+        if total <= limite:
+            break
+        Path(caminho).unlink(missing_ok=True)
+        total -= tamanho
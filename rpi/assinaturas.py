@@ -0,0 +1,163 @@
+"""
+Detecção de fotos repetidas entre ocorrências (hash perceptual).
+
+Cada imagem da ocorrência e foto de envolvido recebe, ao ser gravada, um
+dHash de 64 bits: a imagem é reduzida a 9x8 tons de cinza e cada bit diz se
+um pixel é mais claro que o vizinho da direita. A mesma foto recomprimida,
+redimensionada ou com pequenos ajustes gera hashes a poucos bits de
+distância (Hamming); fotos diferentes ficam perto de 32.
+
+Busca (multi-index hashing): o hash é dividido em 4 segmentos de 16 bits,
+gravados em colunas indexadas (ver AssinaturaImagem). Se dois hashes
+diferem em até d bits, algum segmento difere em no máximo d // 4 bits. Com
+d <= 7 basta buscar, em cada segmento, o próprio valor e os 16 valores a 1
+bit dele: poucas consultas por índice, seja qual for o tamanho da tabela. A
+distância exata é conferida depois, só nos candidatos.
+
+Os sinais abaixo mantêm as assinaturas (registrados em RpiConfig.ready());
+as imagens já existentes são assinadas pelo comando gerar_assinaturas_imagens.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from PIL import Image, UnidentifiedImageError
+
+from .models import AssinaturaImagem, Envolvido, OcorrenciaImagem
+
+logger = logging.getLogger("rpi.assinaturas")
+
+SEGMENTOS = 4
+BITS_SEGMENTO = 16
+DISTANCIA_LIMITE = 2 * SEGMENTOS - 1  # maior distância que a busca garante achar
+
+# model -> nome do campo de arquivo e do campo na AssinaturaImagem
+ORIGENS = {
+    OcorrenciaImagem: ("imagem", "imagem"),
+    Envolvido: ("foto", "envolvido"),
+}
+
+
+# --- HASH ---
+
+
+def calcular(arquivo):
+    """dHash (inteiro de 64 bits sem sinal) de um arquivo de imagem aberto."""
+    with Image.open(arquivo) as imagem:
+        # JPEG: decodifica já reduzido (bem mais rápido numa foto grande)
+        imagem.draft("L", (64, 64))
+        pixels = list(imagem.convert("L").resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    valor = 0
+    for linha in range(8):
+        for coluna in range(8):
+            esquerda = pixels[linha * 9 + coluna]
+            valor = (valor << 1) | (esquerda > pixels[linha * 9 + coluna + 1])
+    return valor
+
+
+def para_banco(valor):
+    """Os 64 bits sem sinal no intervalo do BigIntegerField (complemento de dois)."""
+    return valor - 2**64 if valor >= 2**63 else valor
+
+
+def do_banco(valor):
+    return valor & (2**64 - 1)
+
+
+def segmentos(valor):
+    mascara = 2**BITS_SEGMENTO - 1
+    return [(valor >> (BITS_SEGMENTO * i)) & mascara for i in range(SEGMENTOS)]
+
+
+def distancia(a, b):
+    return (a ^ b).bit_count()
+
+
+# --- BUSCA ---
+
+
+def _vizinhos(segmento, raio):
+    """O segmento e, com raio 1, os valores a 1 bit dele."""
+    if raio == 0:
+        return [segmento]
+    return [segmento] + [segmento ^ (1 << bit) for bit in range(BITS_SEGMENTO)]
+
+
+def similares(valor, distancia_maxima=None, queryset=None):
+    """
+    [(assinatura, distância)] das assinaturas a até `distancia_maxima` bits
+    de `valor` (padrão IMAGEM_DISTANCIA_SIMILAR, no máximo 7), mais
+    próximas primeiro.
+    """
+    if distancia_maxima is None:
+        distancia_maxima = settings.IMAGEM_DISTANCIA_SIMILAR
+    distancia_maxima = min(distancia_maxima, DISTANCIA_LIMITE)
+    raio = distancia_maxima // SEGMENTOS
+
+    filtro = Q()
+    for indice, segmento in enumerate(segmentos(valor)):
+        filtro |= Q(**{f"segmento_{indice}__in": _vizinhos(segmento, raio)})
+
+    queryset = AssinaturaImagem.objects.all() if queryset is None else queryset
+    encontrados = []
+    for assinatura in queryset.filter(filtro):
+        bits = distancia(valor, do_banco(assinatura.dhash))
+        if bits <= distancia_maxima:
+            encontrados.append((assinatura, bits))
+    encontrados.sort(key=lambda item: (item[1], item[0].pk))
+    return encontrados
+
+
+# --- MANUTENÇÃO ---
+
+
+def atualizar(obj):
+    """
+    Cria, recalcula ou remove a assinatura de uma OcorrenciaImagem ou de um
+    Envolvido conforme o arquivo atual. Não recalcula se o arquivo é o mesmo.
+    """
+    campo, origem = ORIGENS[type(obj)]
+    arquivo = getattr(obj, campo)
+    atual = AssinaturaImagem.objects.filter(**{origem: obj}).first()
+
+    if not arquivo:
+        if atual:
+            atual.delete()
+        return None
+    if atual and atual.arquivo == arquivo.name:
+        return atual
+
+    try:
+        with arquivo.open("rb") as conteudo:
+            valor = calcular(conteudo)
+    except (OSError, UnidentifiedImageError):
+        # Arquivo ausente ou que não é imagem: fica sem assinatura
+        logger.warning("Não foi possível assinar %s", arquivo.name, exc_info=True)
+        if atual:
+            atual.delete()
+        return None
+
+    dados = {
+        "ocorrencia_id": obj.ocorrencia_id,
+        "arquivo": arquivo.name,
+        "dhash": para_banco(valor),
+    }
+    for indice, segmento in enumerate(segmentos(valor)):
+        dados[f"segmento_{indice}"] = segmento
+    assinatura, _ = AssinaturaImagem.objects.update_or_create(
+        **{origem: obj}, defaults=dados
+    )
+    return assinatura
+
+
+@receiver(post_save, sender=OcorrenciaImagem)
+@receiver(post_save, sender=Envolvido)
+def _assinar_ao_gravar(sender, instance, created, raw=False, **kwargs):
+    if raw or (created and not getattr(instance, ORIGENS[sender][0])):
+        return
+    # Depois do commit: o arquivo já está no storage e a gravação confirmada
+    transaction.on_commit(lambda: atualizar(instance))
@@ -0,0 +1,90 @@
+"""
+Select "sob demanda" para tabelas grandes (OPMs, municípios, naturezas,
+instrumentos, materiais).
+
+O `<select>` comum renderiza uma `<option>` por registro, em cada formulário
+e em cada linha dos formsets. O `SelectSobDemanda` renderiza só a opção
+vazia e a selecionada; as demais são buscadas pelo navegador (Select2) na
+view `buscar_catalogo`, paginada e servida do cache de referências. O
+`EscolhaSobDemandaField` valida apenas a chave primária enviada, sem
+carregar o queryset.
+
+Uso num ModelForm:
+
+    class Meta:
+        field_classes = {"opm": EscolhaSobDemandaField}
+        widgets = {"opm": SelectSobDemanda(catalogo="opms")}
+"""
+
+from django import forms
+from django.core.exceptions import ImproperlyConfigured
+from django.urls import reverse
+
+from . import referencias
+
+
+class SelectSobDemanda(forms.Select):
+    def __init__(self, attrs=None, catalogo=None, url=None):
+        super().__init__(attrs)
+        self.catalogo = catalogo
+        self.url = url
+
+    def get_context(self, name, value, attrs):
+        if not self.catalogo:
+            raise ImproperlyConfigured("SelectSobDemanda precisa do parâmetro 'catalogo'.")
+        context = super().get_context(name, value, attrs)
+        context["widget"]["attrs"]["data-catalogo"] = self.catalogo
+        context["widget"]["attrs"]["data-busca-url"] = self.url or reverse(
+            "buscar_catalogo", args=[self.catalogo]
+        )
+        return context
+
+    def _rotulos(self, valores):
+        """
+        Rótulo de cada valor selecionado, numa consulta só pelas chaves (ler
+        o catálogo inteiro do cache custaria uma leitura por linha de formset).
+        """
+        campo = self.choices.field
+        consulta = campo.queryset.filter(pk__in=valores)
+        if self.catalogo in referencias.CATALOGOS:
+            # O mesmo texto das opções buscadas pelo Select2
+            texto = referencias.CATALOGOS[self.catalogo][1]
+            return {str(pk): rotulo for pk, rotulo in consulta.values_list("pk", texto)}
+
+        return {
+            str(campo.prepare_value(obj)): campo.label_from_instance(obj)
+            for obj in consulta
+        }
+
+    def optgroups(self, name, value, attrs=None):
+        # Não itera self.choices (que consultaria a tabela inteira)
+        selecionados = [str(v) for v in value if v not in ("", None)]
+        opcoes = []
+        empty_label = getattr(getattr(self.choices, "field", None), "empty_label", None)
+        if empty_label is not None:
+            opcoes.append(("", empty_label))
+        if selecionados:
+            rotulos = self._rotulos(selecionados)
+            opcoes.extend((v, rotulos[v]) for v in selecionados if v in rotulos)
+
+        grupos = []
+        for indice, (valor, rotulo) in enumerate(opcoes):
+            opcao = self.create_option(
+                name, valor, rotulo, valor in selecionados, indice, attrs=attrs
+            )
+            grupos.append((None, [opcao], indice))
+        return grupos
+
+
+class EscolhaSobDemandaField(forms.ModelChoiceField):
+    """
+    ModelChoiceField com o SelectSobDemanda como widget padrão. A validação
+    (herdada) faz um único `queryset.get(pk=...)` do valor enviado.
+    """
+
+    widget = SelectSobDemanda
+
+    def __init__(self, queryset, *, catalogo=None, **kwargs):
+        super().__init__(queryset, **kwargs)
+        if catalogo:
+            self.widget.catalogo = catalogo
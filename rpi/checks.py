@@ -0,0 +1,41 @@
+import sys
+from importlib import import_module
+
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Módulos caros que não podem ser carregados junto com o URLconf. O PDF
+# (rpi/pdf.py) importa o WeasyPrint só quando gera um relatório.
+MODULOS_PESADOS = ("weasyprint", "cairocffi", "pydyf", "fontTools", "cssselect2")
+
+# Módulos pesados já presentes ao fim do django.setup() (antes do URLconf)
+_carregados_no_setup = None
+
+
+def registrar_modulos_do_setup():
+    """Chamado no AppConfig.ready(), antes de qualquer carga do URLconf."""
+    global _carregados_no_setup
+    _carregados_no_setup = {m for m in MODULOS_PESADOS if m in sys.modules}
+
+
+@register()
+def verificar_importacoes_pesadas(app_configs, **kwargs):
+    """
+    Falha se carregar o URLconf (o que todo worker e todo comando faz) puxar
+    algum dos MODULOS_PESADOS, o que atrasaria a inicialização dos processos.
+    """
+    if _carregados_no_setup is None:
+        registrar_modulos_do_setup()
+    import_module(settings.ROOT_URLCONF)
+
+    erros = []
+    for modulo in MODULOS_PESADOS:
+        if modulo in sys.modules and modulo not in _carregados_no_setup:
+            erros.append(
+                Error(
+                    f"O módulo '{modulo}' é importado durante a carga do URLconf.",
+                    hint="Importe-o dentro da função que o utiliza (ver rpi/pdf.py).",
+                    id="rpi.E001",
+                )
+            )
+    return erros
@@ -0,0 +1,124 @@
+"""
+Captura de consultas SQL lentas (opt-in).
+
+Ativada definindo CONSULTAS_LENTAS_LIMITE_MS no settings. O
+`ConsultasLentasMiddleware` cronometra cada comando da requisição; os que
+passam do limite são guardados em memória e, ao final da requisição,
+gravados na tabela ConsultaLenta junto com o plano de execução (EXPLAIN),
+fora do caminho crítico das consultas.
+"""
+
+import hashlib
+import re
+import sys
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+from .models import ConsultaLenta
+
+RAIZ_PROJETO = str(Path(settings.BASE_DIR).resolve())
+ARQUIVOS_IGNORADOS = ("middleware.py", "consultas_lentas.py")
+
+# Normalização: literais viram "?" para agrupar consultas iguais
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_PLACEHOLDER = re.compile(r"%s|\?")
+_RE_LISTA_IN = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACOS = re.compile(r"\s+")
+
+# Prefixo do EXPLAIN por banco (só SELECTs são explicados)
+PREFIXO_EXPLAIN = {
+    "sqlite": "EXPLAIN QUERY PLAN",
+    "postgresql": "EXPLAIN",
+    "mysql": "EXPLAIN",
+}
+
+
+def normalizar_sql(sql):
+    sql = _RE_STRING.sub("?", sql)
+    sql = _RE_NUMERO.sub("?", sql)
+    sql = _RE_PLACEHOLDER.sub("?", sql)
+    sql = _RE_LISTA_IN.sub("(...)", sql)
+    return _RE_ESPACOS.sub(" ", sql).strip()
+
+
+def impressao_digital(sql_normalizado):
+    return hashlib.sha1(sql_normalizado.encode()).hexdigest()
+
+
+def formato_parametros(params, many):
+    """Descreve os tipos dos parâmetros sem guardar os valores (dados pessoais)."""
+    if params is None:
+        return ""
+    if many:
+        params = list(params)
+        if not params:
+            return "0 x ()"
+        return f"{len(params)} x {formato_parametros(params[0], False)}"
+    if isinstance(params, dict):
+        tipos = ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items())
+    else:
+        tipos = ", ".join(type(v).__name__ for v in params)
+    return f"({tipos})"[:255]
+
+
+def local_da_chamada():
+    """Primeiro frame do código do projeto (fora do Django e deste módulo)."""
+    frame = sys._getframe(2)
+    while frame:
+        arquivo = frame.f_code.co_filename
+        if (
+            arquivo.startswith(RAIZ_PROJETO)
+            and "site-packages" not in arquivo
+            and not arquivo.endswith(ARQUIVOS_IGNORADOS)
+        ):
+            relativo = arquivo[len(RAIZ_PROJETO) + 1 :]
+            return f"{relativo}:{frame.f_lineno} em {frame.f_code.co_name}"[:255]
+        frame = frame.f_back
+    return ""
+
+
+def plano_de_execucao(alias, sql, params):
+    conexao = connections[alias]
+    prefixo = PREFIXO_EXPLAIN.get(conexao.vendor)
+    if not prefixo or not sql.lstrip().upper().startswith("SELECT"):
+        return ""
+    try:
+        with conexao.cursor() as cursor:
+            cursor.execute(f"{prefixo} {sql}", params)
+            return "\n".join(
+                " | ".join(str(coluna) for coluna in linha) for linha in cursor.fetchall()
+            )
+    except Exception as e:
+        return f"(EXPLAIN indisponível: {e})"
+
+
+def gravar(capturas, view):
+    """Grava as capturas da requisição e descarta as mais antigas do buffer."""
+    registros = []
+    for captura in capturas:
+        sql_normalizado = normalizar_sql(captura["sql"])
+        registros.append(
+            ConsultaLenta(
+                impressao_digital=impressao_digital(sql_normalizado),
+                sql_normalizado=sql_normalizado,
+                formato_parametros=captura["formato_parametros"],
+                view=view[:255],
+                origem=captura["origem"],
+                duracao_ms=captura["duracao_ms"],
+                plano_execucao=plano_de_execucao(
+                    captura["alias"], captura["sql"], captura["params"]
+                ),
+            )
+        )
+    ConsultaLenta.objects.bulk_create(registros)
+
+    maximo = getattr(settings, "CONSULTAS_LENTAS_MAX_REGISTROS", 500)
+    corte = (
+        ConsultaLenta.objects.order_by("-id").values_list("id", flat=True)[maximo : maximo + 1]
+    )
+    corte = list(corte)
+    if corte:
+        ConsultaLenta.objects.filter(id__lte=corte[0]).delete()
@@ -0,0 +1,282 @@
+"""
+Estatísticas consolidadas por dia de plantão.
+
+Os totais das listagens (prisões, materiais, CVLI) e do painel de
+estatísticas eram somados a partir das ocorrências a cada requisição; num
+período de um ano isso relê dezenas de milhares de linhas. As tabelas
+ResumoDiario* guardam esses totais já somados por dia de plantão × OPM ×
+município × natureza (× tipo de participante ou material), e as consultas
+de período somam no máximo algumas linhas por dia.
+
+Manutenção:
+- gravar ou excluir uma ocorrência, envolvido ou apreensão marca o dia de
+  plantão afetado (e o dia anterior, se a data do fato mudou); depois do
+  commit, `recalcular` refaz só esses dias a partir das linhas originais;
+- alterar o aspecto (tipo_impacto) de uma natureza atualiza as linhas dela;
+- o comando reconstruir_estatisticas refaz qualquer período. Use-o depois
+  de cargas que não disparam sinais (bulk_create, update(), SQL direto).
+"""
+
+import threading
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DateTimeField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    Apreensao,
+    Envolvido,
+    NaturezaOcorrencia,
+    Ocorrencia,
+    ResumoDiarioApreensoes,
+    ResumoDiarioEnvolvidos,
+    ResumoDiarioOcorrencias,
+)
+
+INICIO_PLANTAO = time(7, 0)
+_DESLOCAMENTO = timedelta(hours=INICIO_PLANTAO.hour, minutes=INICIO_PLANTAO.minute)
+RESUMOS = (ResumoDiarioOcorrencias, ResumoDiarioEnvolvidos, ResumoDiarioApreensoes)
+
+_pendentes = threading.local()
+
+
+def dia_plantao(momento):
+    """Dia do plantão de um data/hora (antes das 07:00 conta o dia anterior)."""
+    if momento is None:
+        return None
+    if timezone.is_naive(momento):
+        # Ocorrencia.save() converte data_hora_bruta em datetime sem fuso
+        momento = timezone.make_aware(momento)
+    return (timezone.localtime(momento) - _DESLOCAMENTO).date()
+
+
+def dias_do_periodo(data_inicio, data_fim):
+    """
+    Dias de plantão (date) das strings "AAAA-MM-DD" do filtro das listagens,
+    as mesmas de utils.calcular_janela_plantao.
+    """
+    return (
+        datetime.strptime(data_inicio, "%Y-%m-%d").date(),
+        datetime.strptime(data_fim, "%Y-%m-%d").date(),
+    )
+
+
+def _inicio(dia):
+    return timezone.make_aware(datetime.combine(dia, INICIO_PLANTAO))
+
+
+def _dia_no_banco(campo):
+    # O mesmo que dia_plantao(), calculado pelo banco para agrupar
+    return TruncDate(
+        ExpressionWrapper(F(campo) - Value(_DESLOCAMENTO), output_field=DateTimeField()),
+        tzinfo=timezone.get_current_timezone(),
+    )
+
+
+# --- RECÁLCULO ---
+
+
+def recalcular(dia_inicio, dia_fim=None):
+    """Refaz os resumos dos dias de plantão dia_inicio..dia_fim (inclusive)."""
+    dia_fim = dia_fim or dia_inicio
+    periodo = (_inicio(dia_inicio), _inicio(dia_fim + timedelta(days=1)))
+
+    with transaction.atomic():
+        # 1. Sai o que havia no período
+        for modelo in RESUMOS:
+            modelo.objects.filter(dia__range=(dia_inicio, dia_fim)).delete()
+
+        # 2. Ocorrências
+        ocorrencias = (
+            Ocorrencia.objects.filter(
+                data_hora_fato__gte=periodo[0], data_hora_fato__lt=periodo[1]
+            )
+            .annotate(dia=_dia_no_banco("data_hora_fato"))
+            .values("dia", "opm_id", "municipio_id", "natureza_id", "natureza__tipo_impacto")
+            .annotate(total=Count("pk"))
+            .order_by()
+        )
+        ResumoDiarioOcorrencias.objects.bulk_create(
+            [
+                ResumoDiarioOcorrencias(
+                    dia=linha["dia"],
+                    opm_id=linha["opm_id"],
+                    municipio_id=linha["municipio_id"],
+                    natureza_id=linha["natureza_id"],
+                    tipo_impacto=linha["natureza__tipo_impacto"],
+                    total=linha["total"],
+                )
+                for linha in ocorrencias
+            ],
+            batch_size=500,
+        )
+
+        # 3. Envolvidos e apreensões, pelos dados da ocorrência de cada um
+        dimensoes = {
+            "dia": "dia",
+            "opm_id": "ocorrencia__opm_id",
+            "municipio_id": "ocorrencia__municipio_id",
+            "natureza_id": "ocorrencia__natureza_id",
+            "tipo_impacto": "ocorrencia__natureza__tipo_impacto",
+        }
+        filtro = {
+            "ocorrencia__data_hora_fato__gte": periodo[0],
+            "ocorrencia__data_hora_fato__lt": periodo[1],
+        }
+
+        envolvidos = (
+            Envolvido.objects.filter(**filtro)
+            .annotate(dia=_dia_no_banco("ocorrencia__data_hora_fato"))
+            .values(*dimensoes.values(), "tipo_participante")
+            .annotate(total=Count("pk"))
+            .order_by()
+        )
+        ResumoDiarioEnvolvidos.objects.bulk_create(
+            [
+                ResumoDiarioEnvolvidos(
+                    **{campo: linha[origem] for campo, origem in dimensoes.items()},
+                    tipo_participante=linha["tipo_participante"],
+                    total=linha["total"],
+                )
+                for linha in envolvidos
+            ],
+            batch_size=500,
+        )
+
+        apreensoes = (
+            Apreensao.objects.filter(**filtro)
+            .annotate(dia=_dia_no_banco("ocorrencia__data_hora_fato"))
+            .values(*dimensoes.values(), "material_tipo_id", "unidade_medida")
+            .annotate(soma=Sum("quantidade"), total=Count("pk"))
+            .order_by()
+        )
+        ResumoDiarioApreensoes.objects.bulk_create(
+            [
+                ResumoDiarioApreensoes(
+                    **{campo: linha[origem] for campo, origem in dimensoes.items()},
+                    material_tipo_id=linha["material_tipo_id"],
+                    unidade_medida=linha["unidade_medida"],
+                    quantidade=linha["soma"],
+                    total=linha["total"],
+                )
+                for linha in apreensoes
+            ],
+            batch_size=500,
+        )
+
+
+def reconstruir(dia_inicio=None, dia_fim=None, dias_por_lote=31):
+    """
+    Refaz os resumos do período (por padrão, de todas as ocorrências), em
+    lotes de dias. Devolve o número de dias processados.
+    """
+    completo = dia_inicio is None and dia_fim is None
+    if dia_inicio is None or dia_fim is None:
+        datas = Ocorrencia.objects.exclude(data_hora_fato__isnull=True).order_by("data_hora_fato")
+        primeira = datas.values_list("data_hora_fato", flat=True).first()
+        ultima = datas.reverse().values_list("data_hora_fato", flat=True).first()
+        if primeira is None:
+            if completo:
+                for modelo in RESUMOS:
+                    modelo.objects.all().delete()
+            return 0
+        dia_inicio = dia_inicio or dia_plantao(primeira)
+        dia_fim = dia_fim or dia_plantao(ultima)
+
+    if completo:
+        # Resumos de dias que não têm mais ocorrências
+        for modelo in RESUMOS:
+            modelo.objects.exclude(dia__range=(dia_inicio, dia_fim)).delete()
+    if dia_inicio > dia_fim:
+        return 0
+
+    dia = dia_inicio
+    while dia <= dia_fim:
+        fim_lote = min(dia + timedelta(days=dias_por_lote - 1), dia_fim)
+        recalcular(dia, fim_lote)
+        dia = fim_lote + timedelta(days=1)
+    return (dia_fim - dia_inicio).days + 1
+
+
+def marcar(dia):
+    """Agenda o recálculo do dia para depois do commit da transação atual."""
+    if dia is None:
+        return
+    if not hasattr(_pendentes, "dias"):
+        _pendentes.dias = set()
+    _pendentes.dias.add(dia)
+    transaction.on_commit(_recalcular_pendentes)
+
+
+def _recalcular_pendentes():
+    # Vários itens gravados na mesma transação agendam o mesmo dia: o
+    # primeiro callback recalcula todos, os demais encontram o conjunto vazio
+    dias = getattr(_pendentes, "dias", set())
+    _pendentes.dias = set()
+    for dia in sorted(dias):
+        recalcular(dia)
+
+
+# --- SINAIS ---
+
+
+@receiver(pre_save, sender=Ocorrencia)
+def _guardar_dia_anterior(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    anterior = (
+        Ocorrencia.objects.filter(pk=instance.pk)
+        .values_list("data_hora_fato", flat=True)
+        .first()
+    )
+    instance._dia_plantao_anterior = dia_plantao(anterior)
+
+
+@receiver(post_save, sender=Ocorrencia)
+@receiver(post_delete, sender=Ocorrencia)
+def _marcar_ocorrencia(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    dia = dia_plantao(instance.data_hora_fato)
+    marcar(dia)
+    anterior = getattr(instance, "_dia_plantao_anterior", None)
+    if anterior != dia:
+        marcar(anterior)
+
+
+@receiver(post_save, sender=Envolvido)
+@receiver(post_delete, sender=Envolvido)
+@receiver(post_save, sender=Apreensao)
+@receiver(post_delete, sender=Apreensao)
+def _marcar_item(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if sender.ocorrencia.is_cached(instance):
+        momento = instance.ocorrencia.data_hora_fato
+    else:
+        # Na exclusão em cascata a ocorrência pode já ter saído; o dia dela
+        # é marcado pelo sinal da própria ocorrência
+        momento = (
+            Ocorrencia.objects.filter(pk=instance.ocorrencia_id)
+            .values_list("data_hora_fato", flat=True)
+            .first()
+        )
+    marcar(dia_plantao(momento))
+
+
+@receiver(post_save, sender=NaturezaOcorrencia)
+def _atualizar_aspecto(sender, instance, created=False, raw=False, **kwargs):
+    if created or raw:
+        return
+
+    def atualizar():
+        for modelo in RESUMOS:
+            modelo.objects.filter(natureza=instance).exclude(
+                tipo_impacto=instance.tipo_impacto
+            ).update(tipo_impacto=instance.tipo_impacto)
+
+    transaction.on_commit(atualizar)
@@ -1,8 +1,13 @@
 from django import forms
 from django.forms import FileInput, inlineformset_factory
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
+from django.core.files.uploadedfile import UploadedFile
 from django.contrib.auth import get_user_model
+from django.urls import reverse_lazy
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from . import uploads
+from .campos import EscolhaSobDemandaField, SelectSobDemanda
 from .models import (
     Ocorrencia,
     Envolvido,
@@ -12,6 +17,7 @@ from .models import (
     Instrumento,
     MaterialApreendidoTipo,
     NaturezaOcorrencia,
+    UploadTemporario,
 )
 
 # Obtém o modelo de usuário ativo (geralmente User ou CustomUser)
@@ -92,6 +98,12 @@ class EmailLoginForm(AuthenticationForm):
 
 # --- 1. CLASSES DE FORMULÁRIOS ---
 
+# Unidades de medida em ordem alfabética (ex: g, kg, pé, un), calculadas uma
+# vez no carregamento do módulo e não a cada linha do formset
+UNIDADES_ORDENADAS = [("", "---------")] + sorted(
+    Apreensao.TIPO_MEDIDA, key=lambda x: x[1]
+)
+
 
 class ApreensaoForm(forms.ModelForm):
     class Meta:
@@ -102,9 +114,12 @@ class ApreensaoForm(forms.ModelForm):
             "quantidade",
             "unidade_medida",
         ]
+        # Renderiza só o material selecionado; os demais vêm da busca
+        # (rpi/campos.py), e não uma <option> por material em cada linha
+        field_classes = {"material_tipo": EscolhaSobDemandaField}
         widgets = {
-            "material_tipo": forms.Select(
-                attrs={"class": "form-control"}
+            "material_tipo": SelectSobDemanda(
+                attrs={"class": "form-control"}, catalogo="materiais"
             ),
             "quantidade": forms.TextInput(
                 attrs={"placeholder": "1.00 ou 100", "class": "form-control"}
@@ -122,17 +137,8 @@ class ApreensaoForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        # 1. ORDENANDO AS CHOICES:
-        # Pega as choices atuais, remove a primeira (que costuma ser o "---------")
-        # e ordena pelo rótulo (item [1] da tupla)
-        choices = list(self.fields["unidade_medida"].choices)
-        blank_choice = choices[0] if choices[0][0] == "" else ("", "---------")
-
-        # Ordena o restante da lista alfabeticamente pelo nome (ex: g, kg, pé, un)
-        other_choices = sorted([c for c in choices if c[0] != ""], key=lambda x: x[1])
-
-        # Reidrata o campo com a nova ordem
-        self.fields["unidade_medida"].choices = [blank_choice] + other_choices
+        # 1. ORDENANDO AS CHOICES (já ordenadas em UNIDADES_ORDENADAS)
+        self.fields["unidade_medida"].choices = UNIDADES_ORDENADAS
 
         # 2. SEU CÓDIGO DE ESTILIZAÇÃO (AJUSTADO):
         for field_name, field in self.fields.items():
@@ -144,7 +150,76 @@ class ApreensaoForm(forms.ModelForm):
                 field.widget.attrs["class"] = "form-control"
 
 
-class EnvolvidoForm(forms.ModelForm):
+class UploadPorTokenForm(forms.ModelForm):
+    """
+    Base dos formulários com foto. Além do campo de arquivo comum, aceita
+    `upload_token`: o arquivo já foi enviado em partes (rpi/uploads.py) e é
+    anexado ao campo `campo_upload` do modelo no save(), deixando o POST do
+    formulário pequeno. O token só vale para quem fez o envio: a view passa
+    `usuario` (request.user).
+    """
+
+    campo_upload = None
+    upload_token = forms.UUIDField(required=False, widget=forms.HiddenInput())
+
+    def __init__(self, *args, usuario=None, **kwargs):
+        self.usuario = usuario
+        super().__init__(*args, **kwargs)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        limite = uploads.tamanho_maximo_imagem()
+
+        # Arquivo enviado junto com o formulário
+        arquivo = cleaned_data.get(self.campo_upload)
+        if isinstance(arquivo, UploadedFile) and arquivo.size > limite:
+            self.add_error(self.campo_upload, self._erro_tamanho(arquivo.size, limite))
+
+        # Arquivo enviado antes, em partes
+        self.upload = None
+        token = cleaned_data.get("upload_token")
+        if token:
+            self.upload = UploadTemporario.objects.filter(
+                token=token, usuario=self.usuario, concluido=True
+            ).first()
+            if self.upload is None:
+                self.add_error(
+                    "upload_token",
+                    "Envio da imagem não encontrado ou expirado. Selecione o arquivo novamente.",
+                )
+            elif self.upload.tamanho > limite:
+                self.add_error("upload_token", self._erro_tamanho(self.upload.tamanho, limite))
+            else:
+                # Mesma validação do ImageField para um arquivo enviado no POST
+                with uploads.abrir(self.upload) as arquivo:
+                    try:
+                        forms.ImageField().clean(arquivo)
+                    except ValidationError as e:
+                        self.add_error("upload_token", e)
+        return cleaned_data
+
+    @staticmethod
+    def _erro_tamanho(tamanho, limite):
+        return ValidationError(
+            "Imagem muito grande (%(tamanho).1f MB; máximo %(limite).0f MB).",
+            params={"tamanho": tamanho / (1024 * 1024), "limite": limite / (1024 * 1024)},
+        )
+
+    def save(self, commit=True):
+        upload = getattr(self, "upload", None)
+        if upload:
+            with uploads.abrir(upload) as arquivo:
+                getattr(self.instance, self.campo_upload).save(
+                    upload.nome_original, arquivo, save=False
+                )
+            # A área temporária só é limpa se a gravação for confirmada
+            transaction.on_commit(lambda: uploads.descartar(upload))
+        return super().save(commit)
+
+
+class EnvolvidoForm(UploadPorTokenForm):
+    campo_upload = "foto"
+
     class Meta:
         model = Envolvido
         fields = (
@@ -205,9 +280,22 @@ class OcorrenciaForm(forms.ModelForm):
             "rua": forms.TextInput(attrs={"placeholder": "Rua, Av. ..."}),
             "numero": forms.TextInput(),
             "bairro": forms.TextInput(),
-            "instrumento": forms.Select(
-                attrs={"class": "form-control"}
+            # Selects sob demanda (rpi/campos.py): só a opção selecionada vai
+            # no HTML; as demais são buscadas conforme o usuário digita
+            "natureza": SelectSobDemanda(
+                catalogo="naturezas", url=reverse_lazy("buscar_naturezas_ajax")
+            ),
+            "instrumento": SelectSobDemanda(
+                attrs={"class": "form-control"}, catalogo="instrumentos"
             ),  # Ou form-control
+            "opm": SelectSobDemanda(catalogo="opms"),
+            "municipio": SelectSobDemanda(catalogo="municipios"),
+        }
+        field_classes = {
+            "natureza": EscolhaSobDemandaField,
+            "instrumento": EscolhaSobDemandaField,
+            "opm": EscolhaSobDemandaField,
+            "municipio": EscolhaSobDemandaField,
         }
 
     def __init__(self, *args, **kwargs):
@@ -221,11 +309,8 @@ class OcorrenciaForm(forms.ModelForm):
             }
         )
 
-        # Otimização: Ordenar os instrumentos por nome no dropdown do formulário
+        # Os instrumentos chegam ordenados por nome pela busca sob demanda
         if "instrumento" in self.fields:
-            self.fields["instrumento"].queryset = Instrumento.objects.all().order_by(
-                "nome"
-            )
             self.fields["instrumento"].empty_label = "Selecione o instrumento..."
 
         # Aplicação automática de classes CSS (Bootstrap)
@@ -237,7 +322,9 @@ class OcorrenciaForm(forms.ModelForm):
                 widget.attrs["class"] = "form-control"
 
 
-class OcorrenciaImagemForm(forms.ModelForm):
+class OcorrenciaImagemForm(UploadPorTokenForm):
+    campo_upload = "imagem"
+
     class Meta:
         model = OcorrenciaImagem
         fields = ("imagem", "legenda")
@@ -260,11 +347,17 @@ class OcorrenciaImagemForm(forms.ModelForm):
 
 
 # --- 2. FÁBRICAS DE FORMSETS ---
+# Classes montadas uma vez no carregamento do módulo; as views só instanciam.
 
 EnvolvidoFormSet = inlineformset_factory(
     Ocorrencia, Envolvido, form=EnvolvidoForm, extra=1, can_delete=True
 )
 
+# Na edição não aparece a linha extra de envolvido
+EnvolvidoEdicaoFormSet = inlineformset_factory(
+    Ocorrencia, Envolvido, form=EnvolvidoForm, extra=0, can_delete=True
+)
+
 ApreensaoFormSet = inlineformset_factory(
     Ocorrencia, Apreensao, form=ApreensaoForm, extra=1, can_delete=True
 )
@@ -277,6 +370,17 @@ ImagemFormSet = inlineformset_factory(
     can_delete=True,
 )
 
+# Fotos nas telas de cadastro/edição da ocorrência (widgets padrão)
+OcorrenciaImagemFormSet = inlineformset_factory(
+    Ocorrencia,
+    OcorrenciaImagem,
+    form=OcorrenciaImagemForm,
+    fields=("imagem", "legenda"),
+    widgets={"imagem": forms.ClearableFileInput(), "legenda": forms.TextInput()},
+    extra=1,
+    can_delete=True,
+)
+
 
 class InstrumentoForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,56 @@
+"""
+Política de histórico (django-simple-history) dos modelos do app.
+
+O `HistoricalRecords` padrão grava um registro a cada `save()`, mesmo quando
+nenhum campo mudou (ex.: formulário reenviado sem alterações). Esses
+registros vazios só aumentam as tabelas de histórico que a auditoria e o
+purge_audit_logs percorrem. O `HistoricoSemRepeticao` compara os campos
+rastreados com o último registro e não grava quando são iguais.
+
+Criações e exclusões são sempre registradas.
+"""
+
+from datetime import datetime
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from simple_history.models import HistoricalRecords
+
+
+def _valor(campo, obj):
+    valor = getattr(obj, campo.attname)
+    if isinstance(campo, models.FileField):
+        # No histórico o arquivo vira texto (o nome); no modelo, um FieldFile
+        return str(valor or "")
+    if isinstance(valor, datetime) and settings.USE_TZ and timezone.is_naive(valor):
+        # Ocorrencia.save() converte data_hora_bruta em datetime sem fuso
+        return timezone.make_aware(valor)
+    return valor
+
+
+class HistoricoSemRepeticao(HistoricalRecords):
+    # Controle de concorrência (ItemVersionado): muda a cada save, não é dado
+    campos_ignorados = ("versao",)
+
+    def sem_alteracao(self, instance, using=None):
+        """True se os campos rastreados são iguais aos do último registro."""
+        ultimo = (
+            getattr(instance, self.manager_name)
+            .using(using)
+            .order_by("-history_date", "-history_id")
+            .first()
+        )
+        if ultimo is None or ultimo.history_type == "-":
+            return False
+        return all(
+            _valor(campo, instance) == _valor(campo, ultimo)
+            for campo in self.fields_included(instance)
+            if campo.name not in self.campos_ignorados
+        )
+
+    def post_save(self, instance, created, using=None, **kwargs):
+        if not created and not kwargs.get("raw", False):
+            if self.sem_alteracao(instance, using=using):
+                return
+        super().post_save(instance, created, using=using, **kwargs)
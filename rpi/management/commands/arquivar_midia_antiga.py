@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from rpi import arquivo_midia
+from rpi.models import RelatorioDiario
+from rpi.storage import ArmazenamentoComArquivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Move as imagens e fotos dos relatórios finalizados há mais de "
+        "MIDIA_ARQUIVO_DIAS para pacotes .zip por relatório em MIDIA_ARQUIVO_DIR "
+        "(camada fria, lida sob demanda pelo storage)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=settings.MIDIA_ARQUIVO_DIAS,
+            help="Idade mínima do relatório (fim do período) para arquivar.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Apenas informa o que seria arquivado.",
+        )
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ArmazenamentoComArquivo):
+            # Sem ele ninguém leria a mídia arquivada
+            raise CommandError(
+                "O storage padrão (STORAGES['default']) precisa ser "
+                "rpi.storage.ArmazenamentoComArquivo."
+            )
+        simular = options["dry_run"]
+        limite = timezone.now() - timedelta(days=options["dias"])
+
+        # 1. Relatórios finalizados antigos com alguma imagem ou foto
+        relatorios = (
+            RelatorioDiario.objects.filter(finalizado=True)
+            .alias(fim=Coalesce("data_fim", "data_inicio"))
+            .filter(fim__lt=limite)
+            .filter(
+                Q(ocorrencias__imagens__imagem__gt="")
+                | Q(ocorrencias__envolvidos__foto__gt="")
+            )
+            .distinct()
+            .order_by("data_inicio")
+        )
+
+        # 2. Um pacote por relatório
+        total_arquivos = total_bytes = pacotes = 0
+        for relatorio in relatorios.iterator():
+            arquivos, tamanho = arquivo_midia.arquivar_relatorio(
+                relatorio, default_storage, simular
+            )
+            if not arquivos:
+                continue
+            pacotes += 1
+            total_arquivos += arquivos
+            total_bytes += tamanho
+            self.stdout.write(
+                f"  Relatório {relatorio.nr_relatorio}/{relatorio.ano_criacao}: "
+                f"{arquivos} arquivos ({tamanho / (1024 * 1024):.1f} MB)"
+            )
+
+        prefixo = "[simulação] " if simular else ""
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefixo}{total_arquivos} arquivos ({total_bytes / (1024 * 1024):.1f} MB) "
+                f"de {pacotes} relatórios movidos para {settings.MIDIA_ARQUIVO_DIR}."
+            )
+        )
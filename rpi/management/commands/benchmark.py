@@ -0,0 +1,80 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.cenarios import CENARIOS
+from benchmarks.executor import carregar_json, comparar, executar, salvar_json
+
+BASELINE_PADRAO = Path(settings.BASE_DIR) / "benchmarks" / "baseline.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa a suíte de benchmarks (tempo, consultas SQL e memória) das views "
+        "principais e compara com o baseline gravado"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tamanhos",
+            default="10,100,500",
+            help="Quantidades de ocorrências da massa, separadas por vírgula.",
+        )
+        parser.add_argument("--repeticoes", type=int, default=5)
+        parser.add_argument(
+            "--cenarios",
+            default=",".join(CENARIOS),
+            help=f"Cenários a executar. Disponíveis: {', '.join(CENARIOS)}.",
+        )
+        parser.add_argument(
+            "--saida",
+            default="bench_output.json",
+            help="Arquivo JSON onde o resultado desta execução é gravado.",
+        )
+        parser.add_argument("--baseline", default=str(BASELINE_PADRAO))
+        parser.add_argument(
+            "--limite",
+            type=float,
+            default=0.2,
+            help="Tolerância de regressão para tempo e memória (0.2 = 20%%).",
+        )
+        parser.add_argument(
+            "--salvar-baseline",
+            action="store_true",
+            help="Grava o resultado como novo baseline em vez de comparar.",
+        )
+
+    def handle(self, *args, **options):
+        tamanhos = [int(t) for t in options["tamanhos"].split(",") if t.strip()]
+        nomes = [c.strip() for c in options["cenarios"].split(",") if c.strip()]
+
+        desconhecidos = set(nomes) - set(CENARIOS)
+        if desconhecidos:
+            raise CommandError(f"Cenários desconhecidos: {', '.join(desconhecidos)}")
+
+        relatorio = executar(tamanhos, options["repeticoes"], nomes, log=self.stdout.write)
+        salvar_json(relatorio, options["saida"])
+        self.stdout.write(f"\nResultado gravado em {options['saida']}")
+
+        baseline = Path(options["baseline"])
+        if options["salvar_baseline"]:
+            salvar_json(relatorio, baseline)
+            self.stdout.write(self.style.SUCCESS(f"Baseline atualizado em {baseline}"))
+            return
+
+        if not baseline.exists():
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Baseline {baseline} não encontrado. Use --salvar-baseline para criá-lo."
+                )
+            )
+            return
+
+        regressoes = comparar(relatorio, carregar_json(baseline), options["limite"])
+        if regressoes:
+            for linha in regressoes:
+                self.stderr.write(self.style.ERROR(f"  - {linha}"))
+            raise CommandError(f"{len(regressoes)} regressão(ões) acima do limite.")
+
+        self.stdout.write(self.style.SUCCESS("Nenhuma regressão em relação ao baseline."))
@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rpi.historico import HistoricoSemRepeticao
+
+
+class Command(BaseCommand):
+    help = (
+        "Mostra o crescimento das tabelas de histórico no período e quantos "
+        "registros são alterações vazias (iguais ao registro anterior), que a "
+        "política do HistoricoSemRepeticao deixa de gravar"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=30, help="Tamanho do período.")
+
+    def _vazios(self, model, inicio):
+        """Registros '~' do período idênticos ao registro anterior do mesmo objeto."""
+        historico = model.history
+        campos = [
+            campo.attname
+            for campo in model._meta.fields
+            if campo.name not in HistoricoSemRepeticao.campos_ignorados
+        ]
+        pk = model._meta.pk.attname
+
+        # Percorre em ordem de objeto e data, comparando com o anterior
+        registros = historico.filter(
+            **{f"{pk}__in": historico.filter(history_date__gte=inicio).values(pk)}
+        ).order_by(pk, "history_date", "history_id")
+
+        vazios = 0
+        anterior = None
+        for registro in registros.values("history_type", "history_date", *campos).iterator():
+            valores = tuple(registro[c] for c in campos)
+            if (
+                anterior is not None
+                and registro["history_type"] == "~"
+                and anterior[0] == registro[pk]
+                and anterior[1] == valores
+                and registro["history_date"] >= inicio
+            ):
+                vazios += 1
+            anterior = (registro[pk], valores)
+        return vazios
+
+    def handle(self, *args, **options):
+        dias = options["dias"]
+        inicio = timezone.now() - timedelta(days=dias)
+
+        self.stdout.write(
+            f"Histórico dos últimos {dias} dias (desde {inicio:%d/%m/%Y %H:%M}):\n"
+        )
+        self.stdout.write(
+            f"{'Modelo':<26}{'total':>9}{'período':>9}{'vazios':>9}"
+            f"{'antes/dia':>11}{'depois/dia':>12}"
+        )
+
+        soma_periodo = soma_vazios = 0
+        for model in apps.get_models():
+            # Mesmo critério do purge_audit_logs
+            if not hasattr(model, "history"):
+                continue
+
+            total = model.history.count()
+            no_periodo = model.history.filter(history_date__gte=inicio).count()
+            vazios = self._vazios(model, inicio) if no_periodo else 0
+            soma_periodo += no_periodo
+            soma_vazios += vazios
+
+            self.stdout.write(
+                f"{model.__name__:<26}{total:>9}{no_periodo:>9}{vazios:>9}"
+                f"{no_periodo / dias:>11.1f}{(no_periodo - vazios) / dias:>12.1f}"
+            )
+
+        self.stdout.write(
+            f"\nTotal no período: {soma_periodo} registros, {soma_vazios} vazios "
+            f"({soma_vazios / soma_periodo:.0%})." if soma_periodo else "\nNenhum registro no período."
+        )
+        if soma_vazios:
+            self.stdout.write(
+                "Os vazios já gravados podem ser removidos com "
+                "'manage.py clean_duplicate_history --auto'."
+            )
@@ -0,0 +1,88 @@
+import os
+import uuid
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from rpi.storage import ArmazenamentoDeduplicado, sha256_arquivo
+
+
+def _mb(tamanho):
+    return f"{tamanho / (1024 * 1024):.1f} MB ({tamanho} bytes)"
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula o SHA-256 da mídia já existente em MEDIA_ROOT e troca os arquivos "
+        "repetidos por hard links para um único blob (ver ArmazenamentoDeduplicado). "
+        "Os nomes gravados no banco não mudam. Informa o espaço recuperado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Apenas informa o que seria feito, sem alterar arquivos.",
+        )
+
+    def handle(self, *args, **options):
+        simular = options["dry_run"]
+        storage = (
+            default_storage
+            if isinstance(default_storage, ArmazenamentoDeduplicado)
+            else ArmazenamentoDeduplicado()
+        )
+
+        arquivos = duplicados = recuperado = 0
+        vistos = {}  # sha256 -> inode, para o --dry-run (nenhum blob é criado)
+
+        # 1. Percorre a mídia (fora da pasta de blobs)
+        for raiz, pastas, nomes in os.walk(storage.location):
+            if os.path.abspath(raiz) == os.path.abspath(storage.location):
+                pastas[:] = [p for p in pastas if p != storage.pasta_blobs]
+            for nome in nomes:
+                caminho = os.path.join(raiz, nome)
+                if os.path.islink(caminho) or not os.path.isfile(caminho):
+                    continue
+                arquivos += 1
+                info = os.stat(caminho)
+                sha256 = sha256_arquivo(caminho)
+                blob = storage.caminho_blob(sha256)
+
+                # 2. Primeira ocorrência do conteúdo: vira o blob
+                if simular:
+                    if sha256 not in vistos:
+                        vistos[sha256] = info.st_ino
+                        continue
+                    mesmo = vistos[sha256] == info.st_ino
+                else:
+                    if not os.path.exists(blob):
+                        os.makedirs(os.path.dirname(blob), exist_ok=True)
+                        os.link(caminho, blob)
+                        continue
+                    mesmo = os.path.samefile(blob, caminho)
+                if mesmo:
+                    continue
+
+                # 3. Repetido: troca o arquivo por um link para o blob (o
+                # os.replace é atômico, quem estiver lendo não vê o arquivo sumir)
+                duplicados += 1
+                if info.st_nlink == 1:
+                    recuperado += info.st_size
+                if not simular:
+                    temporario = f"{caminho}.{uuid.uuid4().hex[:8]}.dedup"
+                    os.link(blob, temporario)
+                    os.replace(temporario, caminho)
+
+        # 4. Blobs sem nenhum nome apontando para eles
+        orfaos, tamanho = storage.remover_blobs_orfaos(simular)
+        recuperado += tamanho
+
+        prefixo = "[simulação] " if simular else ""
+        self.stdout.write(
+            f"{prefixo}{arquivos} arquivos verificados, {duplicados} repetidos "
+            f"trocados por links, {orfaos} blobs órfãos removidos."
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"{prefixo}Espaço recuperado: {_mb(recuperado)}.")
+        )
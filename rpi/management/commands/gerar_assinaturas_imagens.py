@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from rpi import assinaturas
+from rpi.models import AssinaturaImagem
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula o hash perceptual (AssinaturaImagem) das imagens de ocorrências "
+        "e fotos de envolvidos que ainda não têm assinatura ou cujo arquivo mudou"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--todas",
+            action="store_true",
+            help="Recalcula também as assinaturas já existentes.",
+        )
+
+    def handle(self, *args, **options):
+        for model, (campo, origem) in assinaturas.ORIGENS.items():
+            queryset = (
+                model.objects.exclude(**{campo: ""})
+                .exclude(**{f"{campo}__isnull": True})
+                .only("pk", "ocorrencia_id", campo)
+                .order_by("pk")
+            )
+            if options["todas"]:
+                # Apaga e refaz (atualizar() pula o arquivo já assinado)
+                AssinaturaImagem.objects.filter(
+                    **{f"{origem}__isnull": False}
+                ).delete()
+
+            assinadas = falhas = 0
+            for obj in queryset.iterator(chunk_size=500):
+                if assinaturas.atualizar(obj) is None:
+                    falhas += 1
+                else:
+                    assinadas += 1
+
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: {assinadas} assinadas, "
+                f"{falhas} sem assinatura (arquivo ausente ou inválido)."
+            )
+        self.stdout.write(self.style.SUCCESS("Assinaturas atualizadas."))
@@ -0,0 +1,232 @@
+"""
+Move para a quarentena os arquivos do MEDIA_ROOT que nenhum registro usa
+(ocorrências excluídas, fotos substituídas) e apaga a quarentena antiga.
+
+Os nomes dos arquivos em disco e os nomes referenciados no banco (FileFields
+dos modelos e do histórico dentro de AUDIT_LOG_RETENTION_DAYS) são
+ordenados em disco, em lotes, e comparados num único passo: a memória usada
+não cresce com o volume de mídia.
+
+Feito para rodar agendado, ex. no cron do servidor:
+
+    30 3 * * *  cd /app && python manage.py limpar_midia_orfa
+
+Duas execuções ao mesmo tempo não se sobrepõem (a segunda sai com erro).
+"""
+
+import fcntl
+import heapq
+import os
+import posixpath
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models
+from django.utils import timezone
+
+from rpi.storage import ArmazenamentoDeduplicado
+
+LOTE = 100_000  # nomes ordenados na memória por vez
+FORMATO_PASTA = "%Y%m%d-%H%M%S"
+
+
+def _ordenados(nomes, lote=LOTE):
+    """
+    Os nomes em ordem e sem repetição, com no máximo `lote` na memória.
+    `nomes` é consumido inteiro já na chamada (só a leitura em ordem fica
+    para depois): quem chama controla o que é lido antes do quê.
+    """
+    partes = []
+    bloco = []
+    for nome in nomes:
+        bloco.append(nome)
+        if len(bloco) >= lote:
+            parte = tempfile.TemporaryFile("w+", encoding="utf-8", errors="surrogateescape")
+            parte.writelines(f"{n}\n" for n in sorted(bloco))
+            parte.seek(0)
+            partes.append(parte)
+            bloco = []
+    bloco.sort()
+    return _mesclar(partes, bloco)
+
+
+def _mesclar(partes, bloco):
+    fontes = [(linha[:-1] for linha in parte) for parte in partes] + [bloco]
+    anterior = None
+    try:
+        for nome in heapq.merge(*fontes):
+            if nome != anterior:
+                yield nome
+                anterior = nome
+    finally:
+        for parte in partes:
+            parte.close()
+
+
+def _diferenca(arquivos, referenciados):
+    """Os itens de `arquivos` que não estão em `referenciados` (ambos em ordem)."""
+    referenciados = iter(referenciados)
+    atual = next(referenciados, None)
+    for nome in arquivos:
+        while atual is not None and atual < nome:
+            atual = next(referenciados, None)
+        if nome != atual:
+            yield nome
+
+
+class Command(BaseCommand):
+    help = (
+        "Move para a quarentena (MIDIA_QUARENTENA_DIR) os arquivos de mídia sem "
+        "referência no banco nem no histórico, e apaga a quarentena com mais de "
+        "MIDIA_QUARENTENA_DIAS dias"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Apenas lista os órfãos, sem mover nem apagar nada.",
+        )
+        parser.add_argument(
+            "--horas",
+            type=int,
+            default=settings.MIDIA_ORFA_HORAS,
+            help="Idade mínima (modificação ou novo link) para um arquivo ser considerado órfão.",
+        )
+        parser.add_argument(
+            "--dias-quarentena",
+            type=int,
+            default=settings.MIDIA_QUARENTENA_DIAS,
+            help="Tempo na quarentena antes de apagar de vez.",
+        )
+
+    def _arquivos(self, raiz, limite):
+        """
+        Nomes (relativos, com '/') dos arquivos do MEDIA_ROOT sem alteração
+        desde `limite`. Vale também o ctime: um nome novo do
+        ArmazenamentoDeduplicado é um hard link que herda o mtime (antigo)
+        do blob, mas o link atualiza o ctime.
+        """
+        for pasta, pastas, nomes in os.walk(raiz):
+            if pasta == raiz:
+                # Blobs do ArmazenamentoDeduplicado: só são apagados sem nomes
+                pastas[:] = [p for p in pastas if p != ArmazenamentoDeduplicado.pasta_blobs]
+            relativa = os.path.relpath(pasta, raiz)
+            for nome in nomes:
+                caminho = os.path.join(pasta, nome)
+                try:
+                    info = os.stat(caminho)
+                except FileNotFoundError:
+                    continue
+                if max(info.st_mtime, info.st_ctime) >= limite:
+                    continue
+                if "\n" not in nome:
+                    yield posixpath.normpath(posixpath.join(relativa.replace(os.sep, "/"), nome))
+
+    def _referenciados(self, inicio_historico):
+        """Nomes gravados nos FileFields dos modelos e do histórico ainda retido."""
+        for model in apps.get_models():
+            if not model._meta.managed or model._meta.proxy:
+                continue
+            campos = [c.attname for c in model._meta.fields if isinstance(c, models.FileField)]
+            if not campos:
+                continue
+            historico = getattr(model, "history", None)
+            for campo in campos:
+                consultas = [model._default_manager.all()]
+                if historico is not None:
+                    consultas.append(historico.filter(history_date__gte=inicio_historico))
+                for consulta in consultas:
+                    nomes = (
+                        consulta.exclude(**{campo: ""})
+                        .exclude(**{f"{campo}__isnull": True})
+                        .values_list(campo, flat=True)
+                    )
+                    for nome in nomes.iterator(chunk_size=5000):
+                        yield posixpath.normpath(nome)
+
+    def _mover(self, raiz, nome, destino):
+        origem = os.path.join(raiz, *nome.split("/"))
+        alvo = destino.joinpath(*nome.split("/"))
+        alvo.parent.mkdir(parents=True, exist_ok=True)
+        # Mesmo disco: rename (um hard link para o blob continua valendo)
+        shutil.move(origem, alvo)
+
+    def _purgar_quarentena(self, pasta, dias, simular):
+        limite = timezone.localtime() - timedelta(days=dias)
+        apagadas = 0
+        for lote in sorted(pasta.iterdir()) if pasta.is_dir() else []:
+            try:
+                data = timezone.make_aware(datetime.strptime(lote.name, FORMATO_PASTA))
+            except ValueError:
+                continue
+            if data < limite:
+                apagadas += 1
+                if not simular:
+                    shutil.rmtree(lote)
+        return apagadas
+
+    def handle(self, *args, **options):
+        simular = options["dry_run"]
+        raiz = os.path.abspath(settings.MEDIA_ROOT)
+        quarentena = Path(settings.MIDIA_QUARENTENA_DIR)
+        if not os.path.isdir(raiz):
+            raise CommandError(f"MEDIA_ROOT não encontrado: {raiz}")
+
+        # 1. Impede execuções sobrepostas (ex.: cron com a anterior atrasada)
+        quarentena.mkdir(parents=True, exist_ok=True)
+        trava = open(quarentena / ".trava", "w")
+        try:
+            fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            trava.close()
+            raise CommandError("Outra execução do limpar_midia_orfa está em andamento.")
+
+        try:
+            # 2. Arquivos (exceto os recentes, ver --horas) e só DEPOIS as
+            # referências: um arquivo visto no disco cuja referência for
+            # gravada durante a varredura ainda aparece na leitura do banco
+            limite = timezone.now() - timedelta(hours=options["horas"])
+            inicio_historico = timezone.now() - timedelta(
+                days=getattr(settings, "AUDIT_LOG_RETENTION_DAYS", 180)
+            )
+            arquivos = _ordenados(self._arquivos(raiz, limite.timestamp()))
+            referenciados = _ordenados(self._referenciados(inicio_historico))
+
+            # 3. Órfãos para a quarentena, num lote com a data da execução
+            destino = quarentena / timezone.localtime().strftime(FORMATO_PASTA)
+            orfaos = tamanho = 0
+            for nome in _diferenca(arquivos, referenciados):
+                caminho = os.path.join(raiz, *nome.split("/"))
+                try:
+                    tamanho += os.stat(caminho).st_size
+                except FileNotFoundError:
+                    continue
+                orfaos += 1
+                if simular:
+                    self.stdout.write(f"  {nome}")
+                else:
+                    self._mover(raiz, nome, destino)
+
+            # 4. Quarentena vencida e blobs que ficaram sem nome
+            lotes = self._purgar_quarentena(quarentena, options["dias_quarentena"], simular)
+            blobs = 0
+            if isinstance(default_storage, ArmazenamentoDeduplicado):
+                blobs, _ = default_storage.remover_blobs_orfaos(simular)
+        finally:
+            trava.close()
+
+        prefixo = "[simulação] " if simular else ""
+        acao = "seriam movidos" if simular else f"movidos para {destino}" if orfaos else "movidos"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefixo}{orfaos} arquivos órfãos ({tamanho / (1024 * 1024):.1f} MB) "
+                f"{acao}; {lotes} lotes da quarentena e {blobs} blobs sem nome apagados."
+            )
+        )
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from rpi import uploads
+from rpi.models import UploadTemporario
+
+
+class Command(BaseCommand):
+    help = (
+        "Apaga os envios em partes não anexados a nenhuma ocorrência depois de "
+        "UPLOAD_TEMPORARIO_HORAS, e os arquivos da área temporária sem registro"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--horas",
+            type=int,
+            default=settings.UPLOAD_TEMPORARIO_HORAS,
+            help="Idade mínima (desde a última parte recebida) para apagar.",
+        )
+
+    def handle(self, *args, **options):
+        # 1. Envios expirados (registro + arquivo)
+        removidos = 0
+        for upload in uploads.expirados(options["horas"]).iterator():
+            uploads.descartar(upload)
+            removidos += 1
+
+        # 2. Arquivos órfãos (ex.: registro apagado com o processo interrompido)
+        orfaos = 0
+        pasta = Path(settings.UPLOAD_TEMPORARIO_DIR)
+        if pasta.is_dir():
+            # Lista os arquivos antes dos registros: um envio iniciado no meio
+            # do caminho já tem registro quando seu arquivo aparece
+            arquivos = list(pasta.glob("*.parcial"))
+            tokens = {t.hex for t in UploadTemporario.objects.values_list("token", flat=True)}
+            for arquivo in arquivos:
+                if arquivo.stem not in tokens:
+                    arquivo.unlink(missing_ok=True)
+                    orfaos += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{removidos} envios expirados e {orfaos} arquivos órfãos removidos."
+            )
+        )
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rpi import estatisticas
+
+
+def _data(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Data inválida: {valor} (use AAAA-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Refaz as estatísticas consolidadas por dia de plantão (ResumoDiario*) "
+        "a partir das ocorrências, envolvidos e apreensões. Sem período, "
+        "reconstrói tudo e remove resumos de dias sem ocorrências"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", type=_data, help="Primeiro dia de plantão (AAAA-MM-DD).")
+        parser.add_argument("--ate", type=_data, help="Último dia de plantão (AAAA-MM-DD).")
+
+    def handle(self, *args, **options):
+        desde, ate = options["desde"], options["ate"]
+        if desde and ate and desde > ate:
+            raise CommandError("--desde deve ser anterior ou igual a --ate.")
+
+        dias = estatisticas.reconstruir(desde, ate)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{dias} dias de plantão recalculados: "
+                + ", ".join(
+                    f"{modelo.objects.count()} {modelo._meta.verbose_name_plural.lower()}"
+                    for modelo in estatisticas.RESUMOS
+                )
+                + "."
+            )
+        )
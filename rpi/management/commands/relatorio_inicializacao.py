@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Mostra o tempo de importação dos módulos carregados na inicialização "
+        "(django.setup() + URLconf), usando 'python -X importtime'"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--modulo",
+            default=settings.ROOT_URLCONF,
+            help="Módulo importado após o django.setup() (padrão: o URLconf).",
+        )
+        parser.add_argument("--top", type=int, default=20)
+
+    def handle(self, *args, **options):
+        codigo = (
+            "import django; django.setup(); "
+            f"import importlib; importlib.import_module({options['modulo']!r})"
+        )
+
+        # 1. Roda um interpretador limpo com o importtime ligado
+        inicio = time.perf_counter()
+        processo = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", codigo],
+            capture_output=True,
+            text=True,
+            env=os.environ.copy(),
+            cwd=settings.BASE_DIR,
+        )
+        total = time.perf_counter() - inicio
+        if processo.returncode != 0:
+            raise CommandError(processo.stderr.strip().splitlines()[-1])
+
+        # 2. Lê as linhas "import time: self [us] | cumulative | imported package"
+        modulos = []
+        for linha in processo.stderr.splitlines():
+            if not linha.startswith("import time:") or "imported package" in linha:
+                continue
+            proprio, acumulado, nome = linha[len("import time:") :].split("|")
+            modulos.append((int(proprio), int(acumulado), nome.rstrip()))
+
+        # 3. Agrupa o tempo próprio por pacote de primeiro nível
+        por_pacote = defaultdict(int)
+        for proprio, _, nome in modulos:
+            por_pacote[nome.strip().split(".")[0]] += proprio
+
+        soma = sum(proprio for proprio, _, _ in modulos)
+        self.stdout.write(
+            f"Processo completo: {total * 1000:.0f} ms | importações: {soma / 1000:.0f} ms "
+            f"({len(modulos)} módulos)\n"
+        )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Pacotes (tempo próprio somado):"))
+        for pacote, proprio in sorted(por_pacote.items(), key=lambda p: -p[1])[: options["top"]]:
+            self.stdout.write(f"  {proprio / 1000:8.1f} ms  {pacote}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("\nMódulos (tempo acumulado):"))
+        for _, acumulado, nome in sorted(modulos, key=lambda m: -m[1])[: options["top"]]:
+            self.stdout.write(f"  {acumulado / 1000:8.1f} ms  {nome.strip()}")
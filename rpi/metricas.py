@@ -0,0 +1,122 @@
+"""
+Registro em memória das métricas de desempenho por view.
+
+Alimentado pelo `rpi.middleware.MetricasMiddleware` e exportado no formato
+texto do Prometheus pela view `metricas_prometheus`. Os valores vivem no
+processo: com vários workers cada um expõe os próprios contadores, e o
+Prometheus soma as séries ao consultar.
+"""
+
+import threading
+from collections import defaultdict
+
+# Limites dos histogramas (Prometheus usa "le" = menor ou igual)
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+BUCKETS_BYTES = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+
+# nome da métrica -> (descrição, buckets)
+HISTOGRAMAS = {
+    "rpi_requisicao_duracao_segundos": (
+        "Tempo total da requisição",
+        BUCKETS_SEGUNDOS,
+    ),
+    "rpi_requisicao_sql_consultas": (
+        "Quantidade de comandos SQL por requisição",
+        BUCKETS_CONSULTAS,
+    ),
+    "rpi_requisicao_sql_duracao_segundos": (
+        "Tempo gasto no banco por requisição",
+        BUCKETS_SEGUNDOS,
+    ),
+    "rpi_requisicao_template_duracao_segundos": (
+        "Tempo de renderização de templates por requisição",
+        BUCKETS_SEGUNDOS,
+    ),
+    "rpi_resposta_tamanho_bytes": (
+        "Tamanho do corpo da resposta",
+        BUCKETS_BYTES,
+    ),
+}
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.soma += valor
+        self.total += 1
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.contagens[i] += 1
+                break
+
+
+def _rotulos(**rotulos):
+    partes = []
+    for chave, valor in rotulos.items():
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"')
+        partes.append(f'{chave}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = defaultdict(dict)  # métrica -> {(view, metodo): Histograma}
+        self._requisicoes = defaultdict(int)  # (view, metodo, status) -> total
+
+    def registrar(self, view, metodo, status, valores):
+        """
+        Registra uma requisição. `valores` mapeia o nome de cada histograma
+        (ver HISTOGRAMAS) para o valor observado.
+        """
+        chave = (view, metodo)
+        with self._lock:
+            self._requisicoes[(view, metodo, status)] += 1
+            for nome, valor in valores.items():
+                serie = self._histogramas[nome]
+                if chave not in serie:
+                    serie[chave] = Histograma(HISTOGRAMAS[nome][1])
+                serie[chave].observar(valor)
+
+    def limpar(self):
+        with self._lock:
+            self._histogramas.clear()
+            self._requisicoes.clear()
+
+    def exportar_prometheus(self):
+        """Devolve todas as séries no formato de exposição texto do Prometheus."""
+        linhas = [
+            "# HELP rpi_requisicoes_total Requisições atendidas por view, método e status",
+            "# TYPE rpi_requisicoes_total counter",
+        ]
+        with self._lock:
+            for (view, metodo, status), total in sorted(self._requisicoes.items()):
+                rotulos = _rotulos(view=view, metodo=metodo, status=status)
+                linhas.append(f"rpi_requisicoes_total{rotulos} {total}")
+
+            for nome, (descricao, _) in HISTOGRAMAS.items():
+                linhas.append(f"# HELP {nome} {descricao}")
+                linhas.append(f"# TYPE {nome} histogram")
+                for (view, metodo), hist in sorted(self._histogramas[nome].items()):
+                    acumulado = 0
+                    for limite, contagem in zip(hist.buckets, hist.contagens):
+                        acumulado += contagem
+                        rotulos = _rotulos(view=view, metodo=metodo, le=limite)
+                        linhas.append(f"{nome}_bucket{rotulos} {acumulado}")
+                    rotulos = _rotulos(view=view, metodo=metodo, le="+Inf")
+                    linhas.append(f"{nome}_bucket{rotulos} {hist.total}")
+                    rotulos = _rotulos(view=view, metodo=metodo)
+                    linhas.append(f"{nome}_sum{rotulos} {hist.soma:.6f}")
+                    linhas.append(f"{nome}_count{rotulos} {hist.total}")
+
+        return "\n".join(linhas) + "\n"
+
+
+# Instância única do processo
+registro = RegistroMetricas()
@@ -0,0 +1,264 @@
+import cProfile
+import heapq
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template import base as template_base
+
+from . import consultas_lentas, perfilamento
+from .metricas import registro
+
+logger = logging.getLogger("rpi.metricas")
+logger_consultas = logging.getLogger("rpi.consultas_lentas")
+
+# Acumulador do tempo de template da requisição atual (None = não medindo)
+_tempo_template = ContextVar("rpi_tempo_template", default=None)
+# Lista (duração, sql) da requisição atual (None = não medindo)
+_consultas_sql = ContextVar("rpi_consultas_sql", default=None)
+_profundidade_template = ContextVar("rpi_profundidade_template", default=0)
+
+
+def _instrumentar_templates():
+    """
+    Envolve `Template.render` uma única vez por processo. Includes e blocos
+    aninhados também passam por aqui, por isso só o nível mais externo é
+    cronometrado (senão o mesmo tempo seria somado várias vezes).
+    """
+    render_original = template_base.Template.render
+    if getattr(render_original, "_rpi_instrumentado", False):
+        return
+
+    def render(self, context):
+        acumulador = _tempo_template.get()
+        if acumulador is None:
+            return render_original(self, context)
+
+        profundidade = _profundidade_template.get()
+        token = _profundidade_template.set(profundidade + 1)
+        inicio = time.perf_counter()
+        try:
+            return render_original(self, context)
+        finally:
+            if profundidade == 0:
+                acumulador[0] += time.perf_counter() - inicio
+            _profundidade_template.reset(token)
+
+    render._rpi_instrumentado = True
+    template_base.Template.render = render
+
+
+def _cronometrar_sql(execute, sql, params, many, context):
+    consultas = _consultas_sql.get()
+    if consultas is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        consultas.append((time.perf_counter() - inicio, sql))
+
+
+def _instrumentar_conexao(sender=None, connection=None, **kwargs):
+    if _cronometrar_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_cronometrar_sql)
+
+
+def _instrumentar_sql():
+    """
+    Instala o cronômetro de SQL em todas as conexões do processo, inclusive
+    nas abertas depois pelas threads do sync_to_async (sob ASGI o ORM roda
+    em outra thread, com conexão própria). Cada conexão grava na lista da
+    requisição corrente, propagada pela ContextVar `_consultas_sql`.
+    """
+    connection_created.connect(_instrumentar_conexao, dispatch_uid="rpi_metricas_sql")
+    for conexao in connections.all(initialized_only=True):
+        _instrumentar_conexao(connection=conexao)
+
+
+class MetricasMiddleware:
+    """
+    Mede cada requisição (tempo total, consultas SQL, tempo de banco, tempo de
+    template e tamanho da resposta) e agrega por nome de rota no registro de
+    `rpi.metricas`. Requisições acima de METRICAS_LIMITE_LENTO_MS são
+    registradas no log com as consultas mais demoradas.
+
+    Funciona nos dois modos: sob ASGI não obriga o Django a rodar as views
+    assíncronas numa thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICAS_HABILITADAS", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.limite_lento = getattr(settings, "METRICAS_LIMITE_LENTO_MS", 1000) / 1000
+        self.top_consultas = getattr(settings, "METRICAS_TOP_CONSULTAS", 5)
+        _instrumentar_templates()
+        _instrumentar_sql()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    @contextmanager
+    def _medir(self, medicao):
+        """Cronometra SQL e templates de tudo o que rodar dentro do bloco."""
+        tokens = (
+            _consultas_sql.set(medicao["consultas"]),
+            _tempo_template.set(medicao["tempo_template"]),
+        )
+        try:
+            yield
+        finally:
+            _consultas_sql.reset(tokens[0])
+            _tempo_template.reset(tokens[1])
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        medicao = {"consultas": [], "tempo_template": [0.0]}  # consultas: (duração, sql)
+        inicio = time.perf_counter()
+        with self._medir(medicao):
+            response = self.get_response(request)
+        self._registrar(request, response, time.perf_counter() - inicio, medicao)
+        return response
+
+    async def __acall__(self, request):
+        medicao = {"consultas": [], "tempo_template": [0.0]}
+        inicio = time.perf_counter()
+        with self._medir(medicao):
+            response = await self.get_response(request)
+        self._registrar(request, response, time.perf_counter() - inicio, medicao)
+        return response
+
+    def _registrar(self, request, response, duracao, medicao):
+        consultas = medicao["consultas"]
+        tempo_template = medicao["tempo_template"][0]
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "<nao_resolvida>"
+        tempo_sql = sum(d for d, _ in consultas)
+        tamanho = 0 if response.streaming else len(response.content)
+
+        registro.registrar(
+            view,
+            request.method,
+            response.status_code,
+            {
+                "rpi_requisicao_duracao_segundos": duracao,
+                "rpi_requisicao_sql_consultas": len(consultas),
+                "rpi_requisicao_sql_duracao_segundos": tempo_sql,
+                "rpi_requisicao_template_duracao_segundos": tempo_template,
+                "rpi_resposta_tamanho_bytes": tamanho,
+            },
+        )
+
+        if duracao >= self.limite_lento:
+            piores = heapq.nlargest(self.top_consultas, consultas, key=lambda c: c[0])
+            detalhes = "\n".join(f"    {d * 1000:.1f} ms  {sql[:300]}" for d, sql in piores)
+            logger.warning(
+                "Requisição lenta: %s %s (%s) %.0f ms | %d consultas, %.0f ms de banco, "
+                "%.0f ms de template\n%s",
+                request.method,
+                request.path,
+                view,
+                duracao * 1000,
+                len(consultas),
+                tempo_sql * 1000,
+                tempo_template * 1000,
+                detalhes,
+            )
+
+
+class ConsultasLentasMiddleware:
+    """
+    Registra na tabela ConsultaLenta os comandos SQL mais demorados que
+    CONSULTAS_LENTAS_LIMITE_MS. Desligado (sem custo algum) quando o limite
+    não está definido.
+    """
+
+    def __init__(self, get_response):
+        limite = getattr(settings, "CONSULTAS_LENTAS_LIMITE_MS", None)
+        if limite is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.limite = limite / 1000
+
+    def __call__(self, request):
+        capturas = []
+
+        def capturar(alias):
+            def wrapper(execute, sql, params, many, context):
+                inicio = time.perf_counter()
+                try:
+                    return execute(sql, params, many, context)
+                finally:
+                    duracao = time.perf_counter() - inicio
+                    if duracao >= self.limite:
+                        capturas.append(
+                            {
+                                "alias": alias,
+                                "sql": sql,
+                                "params": None if many else params,
+                                "formato_parametros": consultas_lentas.formato_parametros(
+                                    params, many
+                                ),
+                                "origem": consultas_lentas.local_da_chamada(),
+                                "duracao_ms": duracao * 1000,
+                            }
+                        )
+
+            return wrapper
+
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(capturar(conexao.alias)))
+            response = self.get_response(request)
+
+        if capturas:
+            match = getattr(request, "resolver_match", None)
+            try:
+                consultas_lentas.gravar(capturas, match.view_name if match else request.path)
+            except Exception:
+                logger_consultas.exception("Falha ao gravar consultas lentas")
+
+        return response
+
+
+class PerfilamentoMiddleware:
+    """
+    Gera um perfil cProfile da requisição quando um usuário staff envia
+    `?_perfil=1` ou o cabeçalho `X-Perfil: 1`. Desligado por padrão
+    (PERFILAMENTO_HABILITADO): nesse caso o middleware nem é carregado.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PERFILAMENTO_HABILITADO", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pedido = "_perfil" in request.GET or request.headers.get("X-Perfil")
+        if not (pedido and request.user.is_staff):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        inicio = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duracao = time.perf_counter() - inicio
+
+        nome = perfilamento.salvar_perfil(profiler, request, response, duracao)
+        response["X-Perfil-Arquivo"] = nome
+        return response
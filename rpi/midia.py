@@ -0,0 +1,118 @@
+"""
+Entrega dos arquivos de mídia (fotos de envolvidos e imagens das
+ocorrências) só para usuários logados (view servir_midia).
+
+O Django confere a sessão e escolhe o arquivo; o envio dos bytes, conforme
+MIDIA_ENVIO, fica com:
+- "x-accel-redirect": o nginx, por uma location `internal` (deploy/nginx.conf)
+  que não pode ser acessada diretamente;
+- "x-sendfile": o Apache (mod_xsendfile) ou o lighttpd;
+- vazio: o próprio Django, em blocos, aceitando "Range: bytes=inicio-fim"
+  (o navegador pode retomar um download ou pedir só um trecho).
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+_RE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+TAMANHO_BLOCO = 64 * 1024
+CACHE_CONTROL = "private, max-age=2592000"  # nomes nunca são sobrescritos
+
+
+def intervalo(cabecalho, tamanho):
+    """
+    (inicio, fim) inclusivo do cabeçalho Range. None se não há Range, se
+    ele pede vários trechos ou se é inválido, ex. "bytes=5-2" (responde o
+    arquivo inteiro, RFC 7233); False se o trecho está fora do arquivo (416).
+    """
+    encontrado = _RE_RANGE.match((cabecalho or "").strip())
+    if not encontrado or encontrado.groups() == ("", ""):
+        return None
+    inicio, fim = encontrado.groups()
+    if inicio and fim and int(fim) < int(inicio):
+        return None
+    if inicio == "":
+        # "bytes=-500": os últimos 500 bytes
+        inicio, fim = max(tamanho - int(fim), 0), tamanho - 1
+    else:
+        inicio, fim = int(inicio), min(int(fim), tamanho - 1) if fim else tamanho - 1
+    if inicio >= tamanho:
+        return False
+    return inicio, fim
+
+
+def _ler(caminho, inicio, quantidade):
+    with open(caminho, "rb") as arquivo:
+        arquivo.seek(inicio)
+        while quantidade > 0:
+            bloco = arquivo.read(min(TAMANHO_BLOCO, quantidade))
+            if not bloco:
+                break
+            quantidade -= len(bloco)
+            yield bloco
+
+
+def _local_interno(caminho):
+    """URI da location interna do nginx que corresponde ao caminho, se houver."""
+    for pasta, prefixo in settings.MIDIA_ACCEL_LOCAIS.items():
+        pasta = os.path.join(os.path.abspath(pasta), "")
+        if caminho.startswith(pasta):
+            relativo = os.path.relpath(caminho, pasta).replace(os.sep, "/")
+            return prefixo + quote(relativo)
+    return None
+
+
+def resposta_arquivo(request, caminho):
+    """Resposta com o arquivo local `caminho` (absoluto), conforme MIDIA_ENVIO."""
+    info = os.stat(caminho)
+    tipo = mimetypes.guess_type(caminho)[0] or "application/octet-stream"
+    ultima_alteracao = http_date(info.st_mtime)
+
+    # 1. O navegador já tem esta versão
+    if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), info.st_mtime):
+        resposta = HttpResponseNotModified()
+
+    # 2. O servidor web envia (sem ocupar o worker do Python)
+    elif settings.MIDIA_ENVIO == "x-accel-redirect" and _local_interno(caminho):
+        resposta = HttpResponse(content_type=tipo)
+        resposta["X-Accel-Redirect"] = _local_interno(caminho)
+    elif settings.MIDIA_ENVIO == "x-sendfile":
+        resposta = HttpResponse(content_type=tipo)
+        resposta["X-Sendfile"] = caminho
+
+    # 3. O Django envia, inteiro ou só o trecho pedido
+    else:
+        trecho = intervalo(request.headers.get("Range"), info.st_size)
+        if_range = request.headers.get("If-Range")
+        if if_range and if_range != ultima_alteracao:
+            # Arquivo mudou desde o trecho anterior: manda inteiro
+            trecho = None
+        if trecho is False:
+            resposta = HttpResponse(status=416)
+            resposta["Content-Range"] = f"bytes */{info.st_size}"
+        elif trecho:
+            inicio, fim = trecho
+            resposta = StreamingHttpResponse(
+                _ler(caminho, inicio, fim - inicio + 1), status=206, content_type=tipo
+            )
+            resposta["Content-Range"] = f"bytes {inicio}-{fim}/{info.st_size}"
+            resposta["Content-Length"] = str(fim - inicio + 1)
+        else:
+            resposta = FileResponse(open(caminho, "rb"), content_type=tipo)
+        resposta["Accept-Ranges"] = "bytes"
+
+    resposta["Last-Modified"] = ultima_alteracao
+    resposta["Cache-Control"] = CACHE_CONTROL
+    return resposta
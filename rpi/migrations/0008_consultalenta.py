@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpi', '0007_alter_envolvido_tipo_documento_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsultaLenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('registrado_em', models.DateTimeField(auto_now_add=True)),
+                ('impressao_digital', models.CharField(db_index=True, max_length=40)),
+                ('sql_normalizado', models.TextField()),
+                ('formato_parametros', models.CharField(blank=True, max_length=255)),
+                ('view', models.CharField(blank=True, max_length=255)),
+                ('origem', models.CharField(blank=True, max_length=255, verbose_name='Chamada em')),
+                ('duracao_ms', models.FloatField(verbose_name='Duração (ms)')),
+                ('plano_execucao', models.TextField(blank=True, verbose_name='Plano de execução')),
+            ],
+            options={
+                'verbose_name': 'Consulta Lenta',
+                'verbose_name_plural': 'Consultas Lentas',
+                'ordering': ['-registrado_em'],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpi', '0008_consultalenta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apreensao',
+            name='versao',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='envolvido',
+            name='versao',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='historicalapreensao',
+            name='versao',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='historicalenvolvido',
+            name='versao',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='ocorrenciaimagem',
+            name='versao',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:42
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpi', '0009_versao_itens_ocorrencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadTemporario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('nome_original', models.CharField(max_length=255)),
+                ('tamanho', models.PositiveBigIntegerField(verbose_name='Tamanho (bytes)')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256 esperado')),
+                ('recebido', models.PositiveBigIntegerField(default=0, verbose_name='Bytes recebidos')),
+                ('concluido', models.BooleanField(default=False)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True, db_index=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads_temporarios', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Upload Temporário',
+                'verbose_name_plural': 'Uploads Temporários',
+                'ordering': ['-criado_em'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpi', '0010_upload_temporario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssinaturaImagem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('arquivo', models.CharField(max_length=255, verbose_name='Arquivo assinado')),
+                ('dhash', models.BigIntegerField()),
+                ('segmento_0', models.PositiveIntegerField(db_index=True)),
+                ('segmento_1', models.PositiveIntegerField(db_index=True)),
+                ('segmento_2', models.PositiveIntegerField(db_index=True)),
+                ('segmento_3', models.PositiveIntegerField(db_index=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('envolvido', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assinatura', to='rpi.envolvido')),
+                ('imagem', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assinatura', to='rpi.ocorrenciaimagem')),
+                ('ocorrencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assinaturas_imagens', to='rpi.ocorrencia')),
+            ],
+            options={
+                'verbose_name': 'Assinatura de Imagem',
+                'verbose_name_plural': 'Assinaturas de Imagens',
+                'constraints': [models.CheckConstraint(condition=models.Q(('imagem__isnull', False), ('envolvido__isnull', False), _connector='OR'), name='assinatura_imagem_com_origem')],
+            },
+        ),
+    ]
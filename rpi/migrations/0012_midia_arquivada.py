@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpi', '0011_assinatura_imagem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MidiaArquivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=255, unique=True)),
+                ('pacote', models.CharField(max_length=255, verbose_name='Pacote (relativo a MIDIA_ARQUIVO_DIR)')),
+                ('tamanho', models.PositiveBigIntegerField(verbose_name='Tamanho (bytes)')),
+                ('arquivado_em', models.DateTimeField(auto_now_add=True)),
+                ('relatorio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='midias_arquivadas', to='rpi.relatoriodiario')),
+            ],
+            options={
+                'verbose_name': 'Mídia Arquivada',
+                'verbose_name_plural': 'Mídias Arquivadas',
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rpi', '0012_midia_arquivada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoDiarioApreensoes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia do plantão')),
+                ('tipo_impacto', models.CharField(choices=[('N', 'Negativo'), ('P', 'Positivo')], max_length=1, verbose_name='Aspecto')),
+                ('unidade_medida', models.CharField(blank=True, choices=[('un', 'un'), ('kg', 'kg'), ('g', 'g'), ('pe', 'pé'), ('R$', 'Real (R$)'), ('US$', 'Dólar (US$)'), ('€', 'Euro (€)'), ('ARS', 'Peso Arg ($)')], max_length=3, verbose_name='Unidade de Medida')),
+                ('quantidade', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('total', models.PositiveIntegerField(verbose_name='Apreensões')),
+                ('material_tipo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rpi.materialapreendidotipo')),
+                ('municipio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rpi.municipio')),
+                ('natureza', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rpi.naturezaocorrencia')),
+                ('opm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rpi.opm')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário de Apreensões',
+                'verbose_name_plural': 'Resumos Diários de Apreensões',
+                'constraints': [models.UniqueConstraint(fields=('dia', 'opm', 'municipio', 'natureza', 'material_tipo', 'unidade_medida'), name='resumo_apreensoes_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumoDiarioEnvolvidos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia do plantão')),
+                ('tipo_impacto', models.CharField(choices=[('N', 'Negativo'), ('P', 'Positivo')], max_length=1, verbose_name='Aspecto')),
+                ('tipo_participante', models.CharField(choices=[('V', 'Vítima'), ('A', 'Autor'), ('M', 'Menor Infrator'), ('P', 'Preso'), ('T', 'Testemunha'), ('S', 'Suspeito')], max_length=1, verbose_name='Tipo')),
+                ('total', models.PositiveIntegerField(verbose_name='Envolvidos')),
+                ('municipio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rpi.municipio')),
+                ('natureza', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rpi.naturezaocorrencia')),
+                ('opm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rpi.opm')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário de Envolvidos',
+                'verbose_name_plural': 'Resumos Diários de Envolvidos',
+                'constraints': [models.UniqueConstraint(fields=('dia', 'opm', 'municipio', 'natureza', 'tipo_participante'), name='resumo_envolvidos_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumoDiarioOcorrencias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia do plantão')),
+                ('tipo_impacto', models.CharField(choices=[('N', 'Negativo'), ('P', 'Positivo')], max_length=1, verbose_name='Aspecto')),
+                ('total', models.PositiveIntegerField(verbose_name='Ocorrências')),
+                ('municipio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rpi.municipio')),
+                ('natureza', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rpi.naturezaocorrencia')),
+                ('opm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rpi.opm')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário de Ocorrências',
+                'verbose_name_plural': 'Resumos Diários de Ocorrências',
+                'constraints': [models.UniqueConstraint(fields=('dia', 'opm', 'municipio', 'natureza'), name='resumo_ocorrencias_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+def carregar_resumos(apps, schema_editor):
+    # Carga inicial dos resumos com as ocorrências já cadastradas; daí em
+    # diante os sinais de rpi/estatisticas.py mantêm as tabelas. Usa o
+    # próprio recálculo (modelos atuais): numa base nova não há ocorrências
+    # e nada é consultado além da data da primeira.
+    from rpi import estatisticas
+
+    estatisticas.reconstruir()
+
+
+def limpar_resumos(apps, schema_editor):
+    for nome in ("ResumoDiarioOcorrencias", "ResumoDiarioEnvolvidos", "ResumoDiarioApreensoes"):
+        apps.get_model("rpi", nome).objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rpi", "0013_resumos_diarios"),
+    ]
+
+    operations = [
+        migrations.RunPython(carregar_resumos, reverse_code=limpar_resumos, elidable=True),
+    ]
@@ -1,8 +1,10 @@
+import uuid
 from datetime import datetime
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from simple_history.models import HistoricalRecords
+
+from .historico import HistoricoSemRepeticao
 
 User = get_user_model()
 
@@ -71,7 +73,7 @@ class NaturezaOcorrencia(models.Model):
         verbose_name="Tags de Busca (Opcional)",
         help_text="Termos alternativos para pesquisa, separados por vírgula.",
     )
-    history = HistoricalRecords()
+    history = HistoricoSemRepeticao()
 
     def __str__(self):
         return self.nome
@@ -85,7 +87,7 @@ class Municipio(models.Model):
     nome = models.CharField(
         max_length=100, unique=True, verbose_name="Nome do Município"
     )
-    history = HistoricalRecords()
+    history = HistoricoSemRepeticao()
 
     def __str__(self):
         return self.nome
@@ -104,7 +106,7 @@ class OPM(models.Model):
         Municipio, related_name="opms", verbose_name="Municípios Atendidos"
     )
 
-    history = HistoricalRecords()
+    history = HistoricoSemRepeticao()
 
     def __str__(self):
         # Como agora são vários, o __str__ precisa mudar para não dar erro
@@ -132,14 +134,16 @@ class RelatorioDiario(models.Model):
     usuario_responsavel = models.ForeignKey(
         User, on_delete=models.PROTECT, related_name="relatorios_diarios"
     )
-    history = HistoricalRecords()
+    history = HistoricoSemRepeticao()
 
     @classmethod
     def obter_relatorio_atual(cls, usuario):
         # Verifica se o usuário é real antes de filtrar
         if not usuario or usuario.is_anonymous:
             return None
-        return cls.objects.filter(usuario_responsavel=usuario, finalizado=False).last()
+        from .relatorio_atual import aberto
+
+        return aberto(usuario=usuario)
 
     class Meta:
         unique_together = ("nr_relatorio", "ano_criacao")
@@ -150,7 +154,26 @@ class RelatorioDiario(models.Model):
 # --- ENTIDADE PRINCIPAL E RELACIONADAS ---
 
 
-class OcorrenciaImagem(models.Model):
+class ItemVersionado(models.Model):
+    """
+    Base dos itens de uma ocorrência (envolvidos, apreensões e imagens)
+    editáveis um a um. Cada gravação incrementa `versao`; quem edita envia a
+    versão que leu e a gravação é recusada se outro usuário alterou o item
+    nesse meio tempo (ver views.salvar_item_ocorrencia).
+    """
+
+    versao = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.versao += 1
+        super().save(*args, **kwargs)
+
+
+class OcorrenciaImagem(ItemVersionado):
     """
     Modelo para armazenar múltiplas imagens relacionadas a uma ocorrência.
     O relacionamento ForeignKey com Ocorrencia permite o 'Um-para-Muitos'.
@@ -187,7 +210,7 @@ class OcorrenciaImagem(models.Model):
 
 class Instrumento(models.Model):
     nome = models.CharField(max_length=100, unique=True)
-    history = HistoricalRecords()
+    history = HistoricoSemRepeticao()
 
     def __str__(self):
         return self.nome
@@ -250,7 +273,7 @@ class Ocorrencia(models.Model):
         max_length=100, verbose_name="Bairro", blank=True, null=True
     )
 
-    history = HistoricalRecords()
+    history = HistoricoSemRepeticao()
 
     def __str__(self):
         data_str = (
@@ -278,7 +301,7 @@ class Ocorrencia(models.Model):
         verbose_name_plural = "Ocorrências"
 
 
-class Envolvido(models.Model):
+class Envolvido(ItemVersionado):
     TIPO_PARTICIPANTE_CHOICES = [
         ("V", "Vítima"),
         ("A", "Autor"),
@@ -335,7 +358,7 @@ class Envolvido(models.Model):
         blank=True,
         verbose_name="Foto do Envolvido",
     )
-    history = HistoricalRecords()
+    history = HistoricoSemRepeticao()
 
     def __str__(self):
         return f"{self.nome} ({self.get_tipo_participante_display()})"
@@ -357,7 +380,7 @@ class MaterialApreendidoTipo(models.Model):
     nome = models.CharField(
         max_length=255, unique=True, verbose_name="Tipo de Material"
     )
-    history = HistoricalRecords()
+    history = HistoricoSemRepeticao()
 
     def __str__(self):
         return self.nome
@@ -369,7 +392,7 @@ class MaterialApreendidoTipo(models.Model):
 
 
 # --- ENTIDADE DE RELACIONAMENTO (APREENSÃO) ---
-class Apreensao(models.Model):
+class Apreensao(ItemVersionado):
     TIPO_MEDIDA = [
         ("un", "un"),
         ("kg", "kg"),
@@ -402,7 +425,7 @@ class Apreensao(models.Model):
     descricao_adicional = models.CharField(
         max_length=255, blank=True, null=True, verbose_name="Descrição Adicional"
     )
-    history = HistoricalRecords()
+    history = HistoricoSemRepeticao()
 
     def __str__(self):
         return f"{self.quantidade} {self.unidade_medida} de {self.material_tipo.nome}"
@@ -424,3 +447,212 @@ class AuditCleanupLog(models.Model):
 
     def __str__(self):
         return f"Limpeza em {self.executed_at} - {self.records_deleted} removidos"
+
+
+class ConsultaLenta(models.Model):
+    """
+    Buffer circular das consultas SQL que passaram do limite configurado em
+    CONSULTAS_LENTAS_LIMITE_MS (ver rpi.consultas_lentas). Só os últimos
+    CONSULTAS_LENTAS_MAX_REGISTROS registros são mantidos.
+    """
+
+    registrado_em = models.DateTimeField(auto_now_add=True)
+    impressao_digital = models.CharField(max_length=40, db_index=True)
+    sql_normalizado = models.TextField()
+    formato_parametros = models.CharField(max_length=255, blank=True)
+    view = models.CharField(max_length=255, blank=True)
+    origem = models.CharField(max_length=255, blank=True, verbose_name="Chamada em")
+    duracao_ms = models.FloatField(verbose_name="Duração (ms)")
+    plano_execucao = models.TextField(blank=True, verbose_name="Plano de execução")
+
+    class Meta:
+        verbose_name = "Consulta Lenta"
+        verbose_name_plural = "Consultas Lentas"
+        ordering = ["-registrado_em"]
+
+    def __str__(self):
+        return f"{self.duracao_ms:.0f} ms em {self.view or self.origem}"
+
+
+class UploadTemporario(models.Model):
+    """
+    Arquivo enviado em partes (ver rpi.uploads), guardado na área temporária
+    (UPLOAD_TEMPORARIO_DIR) até ser anexado a uma imagem da ocorrência ou à
+    foto de um envolvido pelo token. Envios não anexados expiram (comando
+    limpar_uploads_temporarios).
+    """
+
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    usuario = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="uploads_temporarios"
+    )
+    nome_original = models.CharField(max_length=255)
+    tamanho = models.PositiveBigIntegerField(verbose_name="Tamanho (bytes)")
+    sha256 = models.CharField(max_length=64, verbose_name="SHA-256 esperado")
+    recebido = models.PositiveBigIntegerField(default=0, verbose_name="Bytes recebidos")
+    concluido = models.BooleanField(default=False)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Upload Temporário"
+        verbose_name_plural = "Uploads Temporários"
+        ordering = ["-criado_em"]
+
+    def __str__(self):
+        return f"{self.nome_original} ({self.recebido}/{self.tamanho} bytes)"
+
+
+class AssinaturaImagem(models.Model):
+    """
+    Hash perceptual (dHash, 64 bits) de uma imagem da ocorrência ou da foto
+    de um envolvido, para encontrar a mesma foto em outras ocorrências mesmo
+    recomprimida ou redimensionada (ver rpi.assinaturas).
+
+    O hash também é gravado em 4 segmentos de 16 bits indexados: duas fotos
+    a até 7 bits de distância têm algum segmento igual ou a 1 bit de
+    distância, então a busca consulta só os índices em vez da tabela toda.
+    """
+
+    imagem = models.OneToOneField(
+        OcorrenciaImagem,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="assinatura",
+    )
+    envolvido = models.OneToOneField(
+        Envolvido,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="assinatura",
+    )
+    ocorrencia = models.ForeignKey(
+        Ocorrencia, on_delete=models.CASCADE, related_name="assinaturas_imagens"
+    )
+    arquivo = models.CharField(max_length=255, verbose_name="Arquivo assinado")
+    # Com sinal (BigIntegerField): os 64 bits gravados em complemento de dois
+    dhash = models.BigIntegerField()
+    segmento_0 = models.PositiveIntegerField(db_index=True)
+    segmento_1 = models.PositiveIntegerField(db_index=True)
+    segmento_2 = models.PositiveIntegerField(db_index=True)
+    segmento_3 = models.PositiveIntegerField(db_index=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Assinatura de Imagem"
+        verbose_name_plural = "Assinaturas de Imagens"
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(imagem__isnull=False) | models.Q(envolvido__isnull=False),
+                name="assinatura_imagem_com_origem",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.arquivo} ({self.dhash & (2**64 - 1):016x})"
+
+
+class MidiaArquivada(models.Model):
+    """
+    Índice da camada fria de mídia: cada arquivo (pelo nome gravado no
+    FileField) movido do MEDIA_ROOT para o pacote .zip do seu relatório em
+    MIDIA_ARQUIVO_DIR (comando arquivar_midia_antiga). O storage padrão
+    consulta este índice quando o arquivo não está no disco e extrai só ele
+    (ver rpi.arquivo_midia).
+    """
+
+    nome = models.CharField(max_length=255, unique=True)
+    relatorio = models.ForeignKey(
+        RelatorioDiario, on_delete=models.CASCADE, related_name="midias_arquivadas"
+    )
+    pacote = models.CharField(
+        max_length=255, verbose_name="Pacote (relativo a MIDIA_ARQUIVO_DIR)"
+    )
+    tamanho = models.PositiveBigIntegerField(verbose_name="Tamanho (bytes)")
+    arquivado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Mídia Arquivada"
+        verbose_name_plural = "Mídias Arquivadas"
+
+    def __str__(self):
+        return f"{self.nome} ({self.pacote})"
+
+
+# --- ESTATÍSTICAS CONSOLIDADAS (ver rpi.estatisticas) ---
+
+
+class ResumoDiario(models.Model):
+    """
+    Base das tabelas de totais por dia de plantão (07:00 às 06:59 do dia
+    seguinte), OPM, município e natureza. São dados derivados: mantidos pelos
+    sinais de gravação das ocorrências e refeitos pelo comando
+    reconstruir_estatisticas.
+    """
+
+    dia = models.DateField(verbose_name="Dia do plantão")
+    opm = models.ForeignKey(OPM, on_delete=models.CASCADE, related_name="+")
+    municipio = models.ForeignKey(Municipio, on_delete=models.CASCADE, related_name="+")
+    natureza = models.ForeignKey(
+        NaturezaOcorrencia, on_delete=models.CASCADE, related_name="+"
+    )
+    tipo_impacto = models.CharField(
+        max_length=1, choices=NaturezaOcorrencia.IMPACTO_CHOICES, verbose_name="Aspecto"
+    )
+
+    class Meta:
+        abstract = True
+
+
+class ResumoDiarioOcorrencias(ResumoDiario):
+    total = models.PositiveIntegerField(verbose_name="Ocorrências")
+
+    class Meta:
+        verbose_name = "Resumo Diário de Ocorrências"
+        verbose_name_plural = "Resumos Diários de Ocorrências"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dia", "opm", "municipio", "natureza"],
+                name="resumo_ocorrencias_unico",
+            )
+        ]
+
+
+class ResumoDiarioEnvolvidos(ResumoDiario):
+    tipo_participante = models.CharField(
+        max_length=1, choices=Envolvido.TIPO_PARTICIPANTE_CHOICES, verbose_name="Tipo"
+    )
+    total = models.PositiveIntegerField(verbose_name="Envolvidos")
+
+    class Meta:
+        verbose_name = "Resumo Diário de Envolvidos"
+        verbose_name_plural = "Resumos Diários de Envolvidos"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dia", "opm", "municipio", "natureza", "tipo_participante"],
+                name="resumo_envolvidos_unico",
+            )
+        ]
+
+
+class ResumoDiarioApreensoes(ResumoDiario):
+    material_tipo = models.ForeignKey(
+        MaterialApreendidoTipo, on_delete=models.CASCADE, related_name="+"
+    )
+    unidade_medida = models.CharField(
+        max_length=3, blank=True, choices=Apreensao.TIPO_MEDIDA, verbose_name="Unidade de Medida"
+    )
+    quantidade = models.DecimalField(max_digits=14, decimal_places=2)
+    total = models.PositiveIntegerField(verbose_name="Apreensões")
+
+    class Meta:
+        verbose_name = "Resumo Diário de Apreensões"
+        verbose_name_plural = "Resumos Diários de Apreensões"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dia", "opm", "municipio", "natureza", "material_tipo", "unidade_medida"],
+                name="resumo_apreensoes_unico",
+            )
+        ]
@@ -0,0 +1,167 @@
+"""
+Geração do PDF do relatório diário.
+
+Fica fora de views.py para que o WeasyPrint só seja importado na primeira
+geração de PDF, e não na carga do URLconf (workers, comandos, testes).
+"""
+
+from collections import Counter
+from pathlib import Path
+
+from django.contrib.staticfiles.finders import find
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+
+def gerar_pdf_relatorio_weasyprint(relatorio_diario, request):
+    """
+    Gera o PDF do relatório diário utilizando WeasyPrint com suporte a fotos de envolvidos
+    """
+
+    def formatar_data_militar(data):
+        if not data:
+            return ""
+        meses = {
+            1: "JAN",
+            2: "FEV",
+            3: "MAR",
+            4: "ABR",
+            5: "MAI",
+            6: "JUN",
+            7: "JUL",
+            8: "AGO",
+            9: "SET",
+            10: "OUT",
+            11: "NOV",
+            12: "DEZ",
+        }
+        return f"{data.strftime('%d%H%M')}{meses[data.month]}{data.strftime('%y')}"
+
+    CRIMES_CVLI = [
+        "HOMICÍDIO DECORRENTE DE OPOSIÇÃO A INTERVENÇÃO POLICIAL",
+        "HOMICÍDIO DOLOSO",
+        "HOMICÍDIO DOLOSO NA DIREÇÃO DE VEÍCULO AUTOMOTOR",
+        "INDUZIMENTO, INSTIGAÇÃO OU AUXÍLIO AO SUICÍDIO OU A AUTOMUTILAÇÃO",
+        "FEMINICÍDIO",
+        "ABORTO",
+        "LESÃO CORPORAL SEGUIDA DE MORTE",
+        "ROUBO A PEDESTRE COM MORTE",
+        "ROUBO A RESIDÊNCIA COM MORTE",
+        "ROUBO A COMÉRCIO COM MORTE",
+        "ROUBO A MOTORISTA COM MORTE",
+        "ROUBO DE ARMA COM MORTE",
+        "ROUBO DE VEÍCULO COM MORTE",
+        "ROUBO A ESTABELECIMENTO BANCÁRIO COM MORTE",
+        "ROUBO COM MORTE",
+    ]
+
+    ocorrencias_qs = (
+        relatorio_diario.ocorrencias.select_related("natureza", "opm", "municipio")
+        .prefetch_related("envolvidos", "apreensoes", "imagens")
+        .order_by("data_hora_fato")
+    )
+
+    ocorrencias_normais = []
+    ocorrencias_cvli = []
+
+    for ocorrencia in ocorrencias_qs:
+        natureza_nome = ocorrencia.natureza.nome.upper()
+
+        # --- PROCESSAMENTO DE IMAGENS DA OCORRÊNCIA ---
+        imagens_list = []
+        for img in ocorrencia.imagens.all():
+            if img.imagem and hasattr(img.imagem, "path"):
+                try:
+                    imagens_list.append(
+                        {
+                            "uri": Path(img.imagem.path).as_uri(),
+                            "legenda": img.legenda,
+                        }
+                    )
+                except:
+                    continue
+
+        # --- NOVO: PROCESSAMENTO DE FOTOS DOS ENVOLVIDOS ---
+        # Criamos uma lista de envolvidos com a URI da foto já pronta para o WeasyPrint
+        envolvidos_processados = []
+        for env in ocorrencia.envolvidos.all():
+            foto_uri = None
+            if env.foto and hasattr(env.foto, "path"):
+                try:
+                    foto_uri = Path(env.foto.path).as_uri()
+                except:
+                    foto_uri = None
+
+            envolvidos_processados.append({"obj": env, "foto_uri": foto_uri})
+
+        item = {
+            "ocorrencia": ocorrencia,
+            "sigla_opm_limpa": (
+                ocorrencia.opm.sigla.split(" - ")[0] if ocorrencia.opm else ""
+            ),
+            "imagens": imagens_list,
+            "envolvidos_com_foto": envolvidos_processados,  # Passamos a nova lista processada
+        }
+
+        if natureza_nome in CRIMES_CVLI:
+            ocorrencias_cvli.append(item)
+        else:
+            ocorrencias_normais.append(item)
+
+    # Numeração e Letras
+    numero_cvli = len(ocorrencias_normais) + 1
+    letras = "abcdefghijklmnopqrstuvwxyz"
+    for idx, item in enumerate(ocorrencias_cvli):
+        item["letra"] = letras[idx]
+
+    # Tabela Resumo CVLI
+    tabela_cvli = []
+    contador_opm = Counter()
+    for item in ocorrencias_cvli:
+        oc = item["ocorrencia"]
+        sigla = item["sigla_opm_limpa"]
+        n_vitimas = oc.envolvidos.filter(tipo_participante="V").count() or 1
+        contador_opm[sigla] += n_vitimas
+        tabela_cvli.append(
+            {
+                "municipio": oc.municipio.nome if oc.municipio else "",
+                "opm": sigla,
+                "vitimas": n_vitimas,
+                "instrumento": (
+                    oc.instrumento.nome if oc.instrumento else "NÃO INFORMADO"
+                ),
+            }
+        )
+
+    total_cvli = sum(contador_opm.values())
+    cvli_resumo_opm = ", ".join(f"{qtd} - {opm}" for opm, qtd in contador_opm.items())
+
+    # Logo e CSS
+    logo_path = find("rpi/img/logo.png")
+    logo_uri = Path(logo_path).as_uri() if logo_path else ""
+    css_path = find("rpi/css/rpi.css")
+    css_uri = Path(css_path).as_uri() if css_path else ""
+
+    context = {
+        "relatorio": relatorio_diario,
+        "ocorrencias": ocorrencias_normais,
+        "ocorrencias_cvli": ocorrencias_cvli,
+        "numero_cvli": numero_cvli,
+        "tabela_cvli": tabela_cvli,
+        "total_cvli": total_cvli,
+        "cvli_resumo_opm": cvli_resumo_opm,
+        "logo_uri": logo_uri,
+        "css_uri": css_uri,
+    }
+
+    html_string = render_to_string("rpi/relatorio_pdf.html", context)
+
+    # Importado aqui: carregar o WeasyPrint (Pango, cairo, fontes) custa caro e
+    # só é necessário quando um PDF é de fato gerado
+    from weasyprint import HTML
+
+    pdf = HTML(string=html_string, base_url=request.build_absolute_uri("/")).write_pdf()
+
+    response = HttpResponse(pdf, content_type="application/pdf")
+    response["Content-Disposition"] = "inline; filename=relatorio.pdf"
+    return response
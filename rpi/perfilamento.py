@@ -0,0 +1,87 @@
+"""
+Perfis cProfile gravados sob demanda pelo `PerfilamentoMiddleware`.
+
+Cada perfil gera dois arquivos em PERFILAMENTO_DIR:
+- `<nome>.prof`: estatísticas brutas (abrir com snakeviz, pstats, etc.);
+- `<nome>.json`: metadados e resumo em texto exibidos na página de perfis.
+"""
+
+import io
+import json
+import pstats
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.text import slugify
+
+RE_NOME_PERFIL = re.compile(r"^[\w-]+$")
+
+
+def diretorio_perfis():
+    return Path(getattr(settings, "PERFILAMENTO_DIR", Path(settings.BASE_DIR) / "perfis"))
+
+
+def resumo_texto(profiler, limite=30):
+    saida = io.StringIO()
+    stats = pstats.Stats(profiler, stream=saida)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(limite)
+    return saida.getvalue()
+
+
+def salvar_perfil(profiler, request, response, duracao):
+    """Grava o .prof e o .json do perfil e devolve o nome base dos arquivos."""
+    pasta = diretorio_perfis()
+    pasta.mkdir(parents=True, exist_ok=True)
+
+    agora = timezone.now()
+    match = getattr(request, "resolver_match", None)
+    view = match.view_name if match else ""
+    nome = f"{agora:%Y%m%d-%H%M%S-%f}-{slugify(view or request.path)[:60]}"
+
+    profiler.dump_stats(pasta / f"{nome}.prof")
+    metadados = {
+        "nome": nome,
+        "criado_em": agora.isoformat(),
+        "metodo": request.method,
+        "caminho": request.get_full_path(),
+        "view": view,
+        "usuario": request.user.get_username(),
+        "status": response.status_code,
+        "duracao_ms": round(duracao * 1000, 1),
+        "resumo": resumo_texto(profiler),
+    }
+    (pasta / f"{nome}.json").write_text(json.dumps(metadados, ensure_ascii=False))
+
+    _descartar_antigos(pasta)
+    return nome
+
+
+def _descartar_antigos(pasta):
+    maximo = getattr(settings, "PERFILAMENTO_MAX_ARQUIVOS", 50)
+    for antigo in sorted(pasta.glob("*.json"), reverse=True)[maximo:]:
+        antigo.unlink(missing_ok=True)
+        antigo.with_suffix(".prof").unlink(missing_ok=True)
+
+
+def listar_perfis():
+    """Metadados dos perfis gravados, do mais recente ao mais antigo."""
+    pasta = diretorio_perfis()
+    if not pasta.exists():
+        return []
+    perfis = []
+    for arquivo in sorted(pasta.glob("*.json"), reverse=True):
+        try:
+            perfis.append(json.loads(arquivo.read_text()))
+        except (OSError, ValueError):
+            continue
+    return perfis
+
+
+def caminho_perfil(nome):
+    """Caminho do .prof validado (None se o nome for inválido ou não existir)."""
+    if not RE_NOME_PERFIL.match(nome):
+        return None
+    caminho = diretorio_perfis() / f"{nome}.prof"
+    return caminho if caminho.exists() else None
@@ -0,0 +1,229 @@
+"""
+Cache dos dados de referência (OPMs/municípios, naturezas, instrumentos e
+materiais).
+
+São tabelas pequenas, lidas a cada tela do formulário e alteradas raramente.
+As chaves levam um número de versão guardado no próprio cache: qualquer
+gravação nessas tabelas troca a versão (após o commit), invalidando todas as
+entradas de uma vez em todos os workers que compartilham o cache (ver
+CACHES no settings).
+
+Cada tabela é um "catálogo" (ver CATALOGOS): uma lista de dicionários com
+pelo menos "id" e o texto exibido. A partir dela são atendidos:
+- o pacote completo baixado pelo formulário (`pacote_json`, view
+  `referencias_json`, com ETag igual à versão);
+- as buscas paginadas dos selects sob demanda (`abuscar`, ver rpi/campos.py);
+- as views AJAX de municípios da OPM e de busca de naturezas.
+"""
+
+import json
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import (
+    OPM,
+    Instrumento,
+    MaterialApreendidoTipo,
+    Municipio,
+    NaturezaOcorrencia,
+)
+
+CHAVE_VERSAO = "rpi:referencias:versao"
+TEMPO_CACHE = 60 * 60 * 24  # segundos; a invalidação é explícita
+ITENS_POR_PAGINA = 30
+
+
+# --- VERSÃO ---
+
+
+def versao():
+    atual = cache.get(CHAVE_VERSAO)
+    if atual is None:
+        atual = uuid.uuid4().hex[:12]
+        # add() não sobrescreve a versão criada por outro worker ao mesmo tempo
+        cache.add(CHAVE_VERSAO, atual, None)
+        atual = cache.get(CHAVE_VERSAO, atual)
+    return atual
+
+
+async def aversao():
+    atual = await cache.aget(CHAVE_VERSAO)
+    if atual is None:
+        atual = uuid.uuid4().hex[:12]
+        await cache.aadd(CHAVE_VERSAO, atual, None)
+        atual = await cache.aget(CHAVE_VERSAO, atual)
+    return atual
+
+
+def invalidar():
+    cache.set(CHAVE_VERSAO, uuid.uuid4().hex[:12], None)
+
+
+# --- CATÁLOGOS ---
+
+
+def _opms():
+    municipios_por_opm = {}
+    for opm_id, municipio_id in OPM.municipios.through.objects.values_list(
+        "opm_id", "municipio_id"
+    ):
+        municipios_por_opm.setdefault(opm_id, []).append(municipio_id)
+
+    return [
+        {
+            "id": id_,
+            "sigla": sigla,
+            "nome": nome,
+            "municipios": municipios_por_opm.get(id_, []),
+        }
+        for id_, sigla, nome in OPM.objects.order_by("sigla").values_list(
+            "id", "sigla", "nome"
+        )
+    ]
+
+
+def _nomes(modelo):
+    def consultar():
+        return [
+            {"id": id_, "nome": nome}
+            for id_, nome in modelo.objects.order_by("nome").values_list("id", "nome")
+        ]
+
+    return consultar
+
+
+def _naturezas():
+    return [
+        {"id": id_, "nome": nome, "tags": tags, "tipo_impacto": impacto}
+        for id_, nome, tags, impacto in NaturezaOcorrencia.objects.order_by(
+            "nome"
+        ).values_list("id", "nome", "tags_busca", "tipo_impacto")
+    ]
+
+
+# nome do catálogo -> (consulta, campo exibido, campos pesquisados)
+CATALOGOS = {
+    "opms": (_opms, "sigla", ("sigla", "nome")),
+    "municipios": (_nomes(Municipio), "nome", ("nome",)),
+    "naturezas": (_naturezas, "nome", ("nome", "tags")),
+    "instrumentos": (_nomes(Instrumento), "nome", ("nome",)),
+    "materiais": (_nomes(MaterialApreendidoTipo), "nome", ("nome",)),
+}
+
+
+def _chave(versao_atual, nome):
+    return f"rpi:referencias:{versao_atual}:{nome}"
+
+
+def lista(catalogo, versao_atual=None):
+    """Itens do catálogo na versão atual (do cache, ou consultados e guardados)."""
+    chave = _chave(versao_atual or versao(), catalogo)
+    dados = cache.get(chave)
+    if dados is None:
+        dados = CATALOGOS[catalogo][0]()
+        cache.set(chave, dados, TEMPO_CACHE)
+    return dados
+
+
+async def alista(catalogo):
+    chave = _chave(await aversao(), catalogo)
+    dados = await cache.aget(chave)
+    if dados is None:
+        dados = await sync_to_async(CATALOGOS[catalogo][0])()
+        await cache.aset(chave, dados, TEMPO_CACHE)
+    return dados
+
+
+def pacote_json(versao_atual=None):
+    """
+    JSON (já serializado) com todos os catálogos da versão atual. Montado uma
+    vez por versão e guardado no cache compartilhado.
+    """
+    versao_atual = versao_atual or versao()
+    chave = _chave(versao_atual, "pacote")
+    conteudo = cache.get(chave)
+    if conteudo is None:
+        pacote = {"versao": versao_atual}
+        for nome in CATALOGOS:
+            pacote[nome] = lista(nome, versao_atual)
+        conteudo = json.dumps(pacote, ensure_ascii=False, separators=(",", ":"))
+        cache.set(chave, conteudo, TEMPO_CACHE)
+    return conteudo
+
+
+# --- BUSCAS ---
+
+
+def filtrar(catalogo, itens, termo):
+    """Itens com o termo no texto ou nos demais campos pesquisados (sem distinção de caixa)."""
+    if not termo:
+        return itens
+    campos = CATALOGOS[catalogo][2]
+    termo = termo.casefold()
+    return [
+        item
+        for item in itens
+        if any(termo in (item.get(campo) or "").casefold() for campo in campos)
+    ]
+
+
+async def amunicipios_da_opm(opm_id):
+    """Municípios atendidos pela OPM ([{id, nome}], por nome) ou None se a OPM não existe."""
+    opm = next((o for o in await alista("opms") if o["id"] == opm_id), None)
+    if opm is None:
+        return None
+    atendidos = set(opm["municipios"])
+    return [m for m in await alista("municipios") if m["id"] in atendidos]
+
+
+async def abuscar(catalogo, termo="", pagina=1, opm=None):
+    """
+    Uma página da busca no formato do Select2: ([{"id", "text"}], há_mais).
+    Para municípios, `opm` restringe aos atendidos por aquela OPM.
+    """
+    if catalogo == "municipios" and opm:
+        itens = await amunicipios_da_opm(opm) or []
+    else:
+        itens = await alista(catalogo)
+    itens = filtrar(catalogo, itens, termo)
+
+    texto = CATALOGOS[catalogo][1]
+    inicio = (pagina - 1) * ITENS_POR_PAGINA
+    resultados = [
+        {"id": item["id"], "text": item[texto]}
+        for item in itens[inicio : inicio + ITENS_POR_PAGINA]
+    ]
+    return resultados, len(itens) > inicio + ITENS_POR_PAGINA
+
+
+# --- INVALIDAÇÃO ---
+
+MODELOS_REFERENCIA = (
+    OPM,
+    Municipio,
+    NaturezaOcorrencia,
+    Instrumento,
+    MaterialApreendidoTipo,
+)
+
+
+def _invalidar_ao_gravar(sender, **kwargs):
+    # Só depois do commit: antes disso outra requisição poderia recolocar no
+    # cache os dados antigos
+    transaction.on_commit(invalidar)
+
+
+for _modelo in MODELOS_REFERENCIA:
+    post_save.connect(_invalidar_ao_gravar, sender=_modelo)
+    post_delete.connect(_invalidar_ao_gravar, sender=_modelo)
+
+
+@receiver(m2m_changed, sender=OPM.municipios.through)
+def _invalidar_ao_alterar_municipios(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        transaction.on_commit(invalidar)
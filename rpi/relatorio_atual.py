@@ -0,0 +1,99 @@
+"""
+Relatório diário aberto ("atual").
+
+Quase toda tela precisa dele (lista e cadastro de ocorrências, iniciar dia,
+menu), e a consulta `filter(finalizado=False).last()` ordena a tabela de
+relatórios a cada chamada. `aberto()` resolve uma vez por requisição
+(guardado no request) e, entre requisições, guarda no cache compartilhado só
+o pk do relatório (0 = nenhum aberto); o objeto é relido pelo pk, sem
+ordenação.
+
+Como em rpi/referencias.py, as chaves levam um número de versão: criar,
+finalizar, reabrir ou excluir um relatório troca a versão (após o commit),
+invalidando de uma vez o relatório geral e os de cada usuário.
+
+O context processor `contexto` expõe `relatorio_aberto` aos templates (só
+consulta se o template usar).
+"""
+
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.functional import SimpleLazyObject
+
+from .models import RelatorioDiario
+
+CHAVE_VERSAO = "rpi:relatorio_atual:versao"
+TEMPO_CACHE = 60 * 60 * 24  # segundos; a invalidação é explícita
+NENHUM = 0
+
+
+def versao():
+    atual = cache.get(CHAVE_VERSAO)
+    if atual is None:
+        atual = uuid.uuid4().hex[:12]
+        # add() não sobrescreve a versão criada por outro worker ao mesmo tempo
+        cache.add(CHAVE_VERSAO, atual, None)
+        atual = cache.get(CHAVE_VERSAO, atual)
+    return atual
+
+
+def invalidar():
+    cache.set(CHAVE_VERSAO, uuid.uuid4().hex[:12], None)
+
+
+def _consultar(usuario_id):
+    relatorios = RelatorioDiario.objects.filter(finalizado=False)
+    if usuario_id is not None:
+        relatorios = relatorios.filter(usuario_responsavel_id=usuario_id)
+    return relatorios.last()
+
+
+def aberto(request=None, usuario=None):
+    """
+    O relatório aberto (o último, se houver mais de um) ou None. Com
+    `usuario`, só entre os relatórios dele.
+    """
+    usuario_id = usuario.pk if usuario is not None else None
+
+    # 1. Já resolvido nesta requisição
+    memoria = getattr(request, "_relatorios_abertos", None) if request else None
+    if memoria is not None and usuario_id in memoria:
+        return memoria[usuario_id]
+
+    # 2. Cache compartilhado: o pk (NENHUM também é guardado)
+    chave = f"rpi:relatorio_atual:{versao()}:{usuario_id or 'todos'}"
+    pk = cache.get(chave)
+    relatorio = None
+    if pk:
+        # Confere que continua aberto: uma entrada antiga não devolve um
+        # relatório já finalizado ou excluído
+        relatorio = RelatorioDiario.objects.filter(pk=pk, finalizado=False).first()
+    if relatorio is None and pk != NENHUM:
+        relatorio = _consultar(usuario_id)
+        cache.set(chave, relatorio.pk if relatorio else NENHUM, TEMPO_CACHE)
+
+    if request is not None:
+        if memoria is None:
+            memoria = request._relatorios_abertos = {}
+        memoria[usuario_id] = relatorio
+    return relatorio
+
+
+def contexto(request):
+    """Context processor: `relatorio_aberto` (avaliado só quando usado)."""
+    return {"relatorio_aberto": SimpleLazyObject(lambda: aberto(request))}
+
+
+# --- INVALIDAÇÃO ---
+
+
+@receiver(post_save, sender=RelatorioDiario)
+@receiver(post_delete, sender=RelatorioDiario)
+def _invalidar_ao_gravar(sender, **kwargs):
+    # Só depois do commit: antes disso outra requisição poderia recolocar no
+    # cache o relatório antigo
+    transaction.on_commit(invalidar)
@@ -1,79 +1,165 @@
-/* ==========================================================
-   DOCUMENT READY
-========================================================== */
+/*
+ * Formulário de ocorrência (rpi/ocorrencia_form.html).
+ *
+ * Arquivo estático (com hash no nome após o collectstatic) para ficar em
+ * cache no navegador. As URLs das views AJAX chegam pelos atributos
+ * data-url-* da própria tag <script>.
+ *
+ * As listas de referência (OPMs/municípios, naturezas, instrumentos e
+ * materiais) vêm num pacote JSON versionado, baixado uma vez e guardado no
+ * cache do navegador; os filtros rodam localmente. Enquanto o pacote não
+ * chega (ou se falhar), as buscas vão ao servidor (data-busca-url de cada
+ * select sob demanda, ver rpi/campos.py).
+ */
+const URLS_FORM = {
+    naturezas: document.currentScript.dataset.urlNaturezas,
+    instrumento: document.currentScript.dataset.urlInstrumento,
+    material: document.currentScript.dataset.urlMaterial,
+    referencias: document.currentScript.dataset.urlReferencias,
+    uploads: document.currentScript.dataset.urlUploads,
+    // Só na edição: base das rotas de item (TIPO = envolvidos, apreensoes ou imagens)
+    itens: document.currentScript.dataset.urlItens,
+};
+
+// Pacote de referências ({opms, municipios, naturezas, instrumentos, materiais})
+let REFERENCIAS = null;
+
+function carregarReferencias() {
+    if (!URLS_FORM.referencias) return;
+    fetch(URLS_FORM.referencias, { credentials: 'same-origin' })
+        .then(r => (r.ok ? r.json() : null))
+        .then(dados => {
+            if (!dados) return;
+            // Índices por id para os filtros locais
+            dados.opmsPorId = new Map(dados.opms.map(o => [String(o.id), o]));
+            REFERENCIAS = dados;
+        })
+        .catch(() => { /* segue com as chamadas AJAX */ });
+}
+
+// Mesmas regras da busca do servidor (rpi/referencias.py: CATALOGOS e abuscar)
+const CATALOGOS = {
+    opms: { texto: 'sigla', campos: ['sigla', 'nome'] },
+    municipios: { texto: 'nome', campos: ['nome'] },
+    naturezas: { texto: 'nome', campos: ['nome', 'tags'] },
+    instrumentos: { texto: 'nome', campos: ['nome'] },
+    materiais: { texto: 'nome', campos: ['nome'] },
+};
+const ITENS_POR_PAGINA = 30;
+
+function municipiosDaOpmLocal(opmId) {
+    const opm = REFERENCIAS.opmsPorId.get(String(opmId));
+    if (!opm) return [];
+    const atendidos = new Set(opm.municipios);
+    return REFERENCIAS.municipios.filter(m => atendidos.has(m.id));
+}
+
+function buscarLocal(catalogo, termo, pagina = 1, opmId = null) {
+    const config = CATALOGOS[catalogo];
+    let itens = (catalogo === 'municipios' && opmId) ? municipiosDaOpmLocal(opmId) : REFERENCIAS[catalogo];
+    const t = (termo || '').toLocaleLowerCase();
+    if (t) {
+        itens = itens.filter(item => config.campos.some(c => (item[c] || '').toLocaleLowerCase().includes(t)));
+    }
+    const inicio = (pagina - 1) * ITENS_POR_PAGINA;
+    return {
+        results: itens.slice(inicio, inicio + ITENS_POR_PAGINA).map(item => ({ id: item.id, text: item[config.texto] })),
+        pagination: { more: itens.length > inicio + ITENS_POR_PAGINA },
+    };
+}
+
+// Transporte do Select2: busca no pacote local quando já carregado, senão no servidor
+function transporteCatalogo(catalogo) {
+    return function (params, success, failure) {
+        if (REFERENCIAS && REFERENCIAS[catalogo]) {
+            const d = params.data;
+            success(buscarLocal(catalogo, d.q, d.page || 1, d.opm));
+            return { abort: () => {} };
+        }
+        const $request = $.ajax(params);
+        $request.then(success);
+        $request.fail(failure);
+        return $request;
+    };
+}
+
+// Acrescenta ao pacote local um item recém-cadastrado pelos modais
+function registrarReferencia(lista, item) {
+    if (REFERENCIAS && REFERENCIAS[lista] && !REFERENCIAS[lista].some(x => x.id === item.id)) {
+        REFERENCIAS[lista].push(item);
+    }
+}
+
+carregarReferencias();
+
 $(document).ready(function () {
-    /* ---------- 1. SELECT2 ---------- */ function inicializarSelects() {
+
+    /* ---------- 1. INICIALIZAÇÃO SELECT2 ---------- */
+    function inicializarSelects(container = document) {
         if (!$.fn.select2) return;
 
+        // Natureza com busca AJAX
         $('#id_natureza').select2({
             theme: 'bootstrap-5',
-            placeholder: '🔍 Digite o nome (ou alias) do crime...',
+            placeholder: '🔍 Digite o nome do crime...',
             allowClear: true,
             width: '100%',
             dropdownParent: $('#fato'),
             language: {
                 noResults: () => 'Nenhuma natureza encontrada',
                 searching: () => 'Buscando...',
-            }, // ---- CÓDIGO AJAX (Mantido) ----
-            minimumInputLength: 3, // Começa a buscar após 3 caracteres
+            },
+            minimumInputLength: 3,
             ajax: {
-                // Use o nome da rota URL do Django. Crie essa rota em urls.py!
-                url: "{% url 'buscar_naturezas_ajax' %}",
+                url: URLS_FORM.naturezas,
                 dataType: 'json',
-                delay: 250, // Espera 250ms após a digitação
-                data: function (params) {
-                    return {
-                        q: params.term, // 'q' é o termo enviado para a view Python
-                    };
-                },
-                processResults: function (data) {
-                    // A View Python já formatou como Select2 espera, então só retornamos
-                    return {
-                        results: data.results,
-                    };
-                },
+                delay: 250,
+                data: params => ({ q: params.term }),
+                processResults: data => ({ results: data.results }),
                 cache: true,
-            }, // -------------------------
+                // Com o pacote carregado a busca é local, sem ir ao servidor
+                transport: transporteCatalogo('naturezas'),
+            },
         });
 
-        $('#id_opm').select2({
-            theme: 'bootstrap-5',
-            width: '100%',
+        // Selects sob demanda (OPM, Município, Instrumento, Materiais): o HTML
+        // traz só a opção selecionada; as demais vêm da busca paginada
+        $(container).find('select[data-busca-url]:not(#id_natureza)').each(function() {
+            const catalogo = this.dataset.catalogo;
+            $(this).select2({
+                theme: 'bootstrap-5',
+                width: '100%',
+                allowClear: true,
+                placeholder: $(this).find('option[value=""]').text() || 'Selecione uma opção',
+                ajax: {
+                    url: this.dataset.buscaUrl,
+                    dataType: 'json',
+                    delay: 250,
+                    data: params => ({
+                        q: params.term,
+                        page: params.page || 1,
+                        // Municípios: só os atendidos pela OPM escolhida
+                        opm: catalogo === 'municipios' ? $('#id_opm').val() : undefined,
+                    }),
+                    cache: true,
+                    transport: transporteCatalogo(catalogo),
+                },
+            });
         });
-    }
-    inicializarSelects();
-
-    /* ------------------------------------------------------------------
-     * HANDLER PARA CADASTRO RÁPIDO DE NATUREZA (Chamada de Modal)
-     * Deve ser colocado aqui para que o botão seja funcional
-     * ------------------------------------------------------------------
-     */
-    $('#btn-add-natureza').on('click', function (e) {
-        e.preventDefault();
-        abrirModalNatureza();
-    });
 
-    // Handler para submissão do formulário dentro do modal
-    // Exemplo de código jQuery para submeter o modal
-    $('#form-add-natureza').on('submit', function (e) {
-        e.preventDefault(); // CRÍTICO: Previne a submissão padrão para /nova/
-
-        // Certifique-se de que a URL de destino está correta no AJAX
-        let url_destino = $(this).attr('action'); // Pega a URL definida no 'action' do form (correto)
-
-        // OU, se você definiu a URL diretamente no JS, certifique-se que é:
-        // let url_destino = "/naturezas/novo/";
-
-        $.ajax({
-            type: 'POST',
-            url: url_destino, // Usa a URL correta
-            data: $(this).serialize(),
-            // ... (código de sucesso/erro) ...
+        // Demais selects (participantes, unidades...) com a lista completa
+        $(container).find('select:not(#id_natureza):not([data-busca-url])').each(function() {
+            $(this).select2({
+                theme: 'bootstrap-5',
+                width: '100%',
+                placeholder: $(this).attr('placeholder') || 'Selecione uma opção'
+            });
         });
-    }); /* ---------- 2. NAVEGAÇÃO ENTRE ABAS ---------- */
-    /* ------------------------------------------------------------------ */
+    }
 
-    // ... (Mantido)
+    inicializarSelects();
+
+    /* ---------- 2. NAVEGAÇÃO ENTRE ABAS ---------- */
     $('.next-tab').on('click', function () {
         const next = $('.nav-pills .active').parent().next().find('button');
         if (next.length) new bootstrap.Tab(next[0]).show();
@@ -84,60 +170,48 @@ $(document).ready(function () {
         const prev = $('.nav-pills .active').parent().prev().find('button');
         if (prev.length) new bootstrap.Tab(prev[0]).show();
         window.scrollTo(0, 0);
-    }); /* ---------- 3. LÓGICA CVLI ---------- */
+    });
 
-    // ... (Mantido)
-    function verificarCVLI() {
-        const crimes = [
-            'HOMICÍDIO DOLOSO',
-            'FEMINICÍDIO',
-            'ABORTO',
-            'LESÃO CORPORAL SEGUIDA DE MORTE',
-            'ROUBO COM MORTE',
-            'LATROCÍNIO',
-            'ROUBO A PEDESTRE COM MORTE',
-            'ROUBO A RESIDÊNCIA COM MORTE',
-            'ROUBO A ESTABELECIMENTO COM MORTE',
-            'ROUBO A ESTABELECIMENTO BANCÁRIO COM MORTE',
-            'INSTIGAÇÃO AO SUICÍDIO',
-        ];
+    /* ---------- 3. FILTROS DINÂMICOS (OPM -> MUNICÍPIO) ---------- */
+    // A busca de municípios já filtra pela OPM escolhida; ao trocar a OPM,
+    // o município selecionado deixa de valer
+    $(document).on('change', '#id_opm', function () {
+        $('#id_municipio').val(null).trigger('change');
+    });
 
+    /* ---------- 4. LÓGICA CVLI ---------- */
+    function verificarCVLI() {
+        const crimes = ['HOMICÍDIO DOLOSO', 'FEMINICÍDIO', 'ABORTO', 'LESÃO CORPORAL SEGUIDA DE MORTE', 'ROUBO COM MORTE', 'LATROCÍNIO'];
         const texto = $('#id_natureza option:selected').text().toUpperCase();
-        const div = $('#div_instrumento');
-
-        crimes.some((c) => texto.includes(c)) ? div.show() : div.hide();
+        $('#div_instrumento').toggle(crimes.some(c => texto.includes(c)));
     }
-
     $('#id_natureza').on('change', verificarCVLI);
-    verificarCVLI(); /* ---------- 4. FORMSETS ---------- */
+    verificarCVLI();
 
-    // ... (Mantido)
+    /* ---------- 5. FORMSETS (ADICIONAR / REMOVER) ---------- */
     function addRow(prefix) {
         const totalForms = $(`#id_${prefix}-TOTAL_FORMS`);
         const index = parseInt(totalForms.val());
-
-        const templateId = {
-            envolvidos: 'envolvido-template',
-            apreensoes: 'apreensao-template',
-            imagens: 'imagem-template',
+        
+        const templateId = { 
+            envolvidos: 'envolvido-template', 
+            apreensoes: 'apreensao-template', 
+            imagens: 'imagem-template' 
         }[prefix];
 
-        let html = $(`#${templateId}`)
-            .html()
-            .replace(/__prefix__/g, index);
-
-        const container = {
-            envolvidos: '#envolvidos-container',
-            apreensoes: '#apreensoes-formset-container',
-            imagens: '#imagens-container',
+        const containerId = { 
+            envolvidos: '#envolvidos-container', 
+            apreensoes: '#apreensoes-formset-container', 
+            imagens: '#imagens-container' 
         }[prefix];
 
-        $(container).append(html);
+        let rawHtml = $(`#${templateId}`).html().replace(/__prefix__/g, index);
+        let $newRow = $(rawHtml);
+
+        $(containerId).append($newRow);
         totalForms.val(index + 1);
 
-        if (prefix !== 'imagens' && $.fn.select2) {
-            $(container).find('select').select2({ theme: 'bootstrap-5', width: '100%' });
-        }
+        inicializarSelects($newRow);
     }
 
     $('#add-envolvido-btn').click(() => addRow('envolvidos'));
@@ -145,98 +219,175 @@ $(document).ready(function () {
     $('#add-imagem-btn').click(() => addRow('imagens'));
 
     $(document).on('click', '.remove-formset-row', function () {
-        const row = $(this).closest('.envolvido-form, .form-apreensao-item, .imagem-form-bloco');
-        const idField = row.find('input[name$="-id"]');
+    const $btn = $(this);
+    const prefix = $btn.data('prefix'); 
+    
+    // Agora o código 'enxerga' os três tipos de blocos que você tem no HTML
+    const row = $btn.closest('.envolvido-form, .form-apreensao-item, .imagem-form-bloco');
+
+    // Na edição, o item já gravado é excluído na hora (seção 8)
+    if (URLS_FORM.itens && row.data('itemId')) {
+        if (confirm('Excluir este item agora?')) {
+            excluirItemOcorrencia(row[0], prefix).catch(() => alert('Erro no servidor. Verifique o console.'));
+        }
+        return;
+    }
+    
+    const idField = row.find('input[name$="-id"]');
+    const deleteCheckbox = row.find('input[name$="-DELETE"]');
+    const totalForms = $(`#id_${prefix}-TOTAL_FORMS`);
+
+    if (idField.length && idField.val()) {
+        // Se já existe no banco (tem ID), marca o checkbox DELETE do Django
+        deleteCheckbox.prop('checked', true).val('on');
+        row.hide(); 
+    } else {
+        // Se for linha recém-criada, remove do DOM
+        row.remove();
+        
+        // Atualiza o contador de formulários específico daquela aba
+        const novoTotal = parseInt(totalForms.val()) - 1;
+        if (!isNaN(novoTotal) && novoTotal >= 0) {
+            totalForms.val(novoTotal);
+        }
 
-        if (idField.val()) {
-            row.find('input[name$="-DELETE"]').val('on');
-            row.hide();
-        } else {
-            row.remove();
+        // Função para organizar os índices [0], [1], [2]...
+        reindexarFormset(prefix);
+    }
+});
+
+// Função auxiliar para garantir que os índices fiquem em ordem após remover uma linha nova
+function reindexarFormset(prefix) {
+    const containerId = { 
+        envolvidos: '#envolvidos-container', 
+        apreensoes: '#apreensoes-formset-container', 
+        imagens: '#imagens-container' 
+    }[prefix];
+
+    $(containerId).children().each(function(index) {
+        $(this).find('input, select, textarea').each(function() {
+            let name = $(this).attr('name');
+            if (name) {
+                let newName = name.replace(/-\d+-/, `-${index}-`);
+                $(this).attr('name', newName);
+            }
+            let id = $(this).attr('id');
+            if (id) {
+                let newId = id.replace(/-\d+-/, `-${index}-`);
+                $(this).attr('id', newId);
+            }
+        });
+    });
+}
+
+    /* ---------- 6. PREVIEWS DE IMAGENS E FOTOS ---------- */
+    
+    // Foto de Envolvidos (Aba 2)
+    $(document).on('change', 'input[type="file"][name*="envolvidos-"]', function() {
+        const input = this;
+        const row = $(input).closest('.envolvido-form');
+        const previewContainer = row.find('.foto-preview-container');
+        const textDisplay = row.find('.filename-display');
+
+        if (input.files && input.files[0]) {
+            const reader = new FileReader();
+            reader.onload = e => {
+                previewContainer.html(`<img src="${e.target.result}" class="img-envolvido-preview" style="width:100%; height:100%; object-fit:cover;">`);
+                textDisplay.html(`<i class="fas fa-check text-success"></i> ${input.files[0].name}`);
+            };
+            reader.readAsDataURL(input.files[0]);
+        }
+    });
+
+    // Imagens da Ocorrência (Aba 4)
+    $(document).on('change', 'input[type="file"][name*="imagens-"]', function() {
+        const input = this;
+        const bloco = $(input).closest('.imagem-form-bloco');
+        const previewImg = bloco.find('.img-preview');
+        const previewIcon = bloco.find('.preview-icon');
+        const textDisplay = bloco.find('.filename-display');
+
+        if (input.files && input.files[0]) {
+            const reader = new FileReader();
+            reader.onload = e => {
+                previewImg.attr('src', e.target.result).removeClass('d-none');
+                previewIcon.addClass('d-none');
+                textDisplay.html(`<i class="fas fa-check text-primary"></i> ${input.files[0].name}`);
+            };
+            reader.readAsDataURL(input.files[0]);
         }
     });
 });
 
-/* ==========================================================
-   NATUREZA (AJAX) ⭐️ NOVO BLOCO ⭐️
-========================================================== */
+/* ---------- 7. FUNÇÕES DOS MODAIS AJAX (ESCOPO GLOBAL) ---------- */
+
+// NATUREZA
 function abrirModalNatureza() {
-    // Inicializa e mostra o modal do Bootstrap
-    const modalNatureza = new bootstrap.Modal(document.getElementById('modalNatureza'));
-    modalNatureza.show();
-    $('#id_natureza_nome_modal').focus();
+    new bootstrap.Modal(document.getElementById('modalNatureza')).show();
 }
 
-function fecharModalNatureza() {
-    // Fecha e limpa o modal
-    const modalInstance = bootstrap.Modal.getInstance(document.getElementById('modalNatureza'));
-    if (modalInstance) modalInstance.hide();
-    $('#form-add-natureza')[0].reset();
-    $('#natureza-modal-errors').html('');
-}
 
 function salvarNaturezaRapida() {
-    var $form = $('#form-add-natureza');
-
-    // Pega a URL: prioriza o 'action' do form, senão usa o data-url do botão.
-    var url = $form.attr('action') || $('#btn-salvar-natureza').data('url');
-
-    // Token CSRF é coletado
-    var csrfToken = $('[name="csrfmiddlewaretoken"]').val();
-
-    // Cria o objeto de dados a ser enviado (garantindo os campos obrigatórios)
-    var dados_para_enviar = {
-        csrfmiddlewaretoken: csrfToken,
-        nome: $('#id_natureza_nome_modal').val(),
-        tipo_impacto: $('#id_natureza_aspecto_modal').val(),
-    };
+    // 1. Pegar o botão e a URL que está nele
+    const btn = document.getElementById('btn-salvar-natureza');
+    const urlDestino = btn.getAttribute('data-url');
+    
+    // 2. Pegar os valores dos campos manualmente
+    const nomeV = $('#id_natureza_nome_modal').val();
+    const impactoV = $('#id_natureza_aspecto_modal').val();
+    
+    // 3. Pegar o Token CSRF (essencial para evitar o erro 403)
+    const csrfToken = document.querySelector('[name=csrfmiddlewaretoken]').value;
+
+    if (!nomeV || !impactoV) {
+        alert("Por favor, preencha o nome e o aspecto.");
+        return;
+    }
 
-    // **DEBUG:** Mostra o que será enviado.
-    console.log('Dados a serem enviados:', dados_para_enviar);
+    console.log("Enviando para:", urlDestino);
 
-    // --- Requisição AJAX ---
     $.ajax({
         type: 'POST',
-        url: url,
-        data: dados_para_enviar, // <-- VÍRGULA CORRIGIDA AQUI!
-        headers: {
-            'X-CSRFToken': csrfToken,
+        url: urlDestino,
+        data: {
+            'nome': nomeV,
+            'tipo_impacto': impactoV,
+            'tags_busca': 'cadastro_rapido', // Preenche o campo que o seu Form exige
+            'csrfmiddlewaretoken': csrfToken
         },
         success: function (response) {
             if (response.success) {
-                // Sucesso: Adiciona a nova Natureza ao Select2
-                var newOption = new Option(response.text, response.id, true, true);
+                // Criar a nova opção e adicionar ao Select2 (#id_natureza)
+                const newOption = new Option(response.text || response.nome, response.id, true, true);
                 $('#id_natureza').append(newOption).trigger('change');
+                registrarReferencia('naturezas', { id: response.id, nome: response.text, tags: '', tipo_impacto: impactoV });
 
-                // Fecha o modal e limpa o formulário
-                $('#modalNatureza').modal('hide'); // Use o ID correto do modal: #modalNatureza
-                $form[0].reset();
+                // Fechar o modal
+                const modalElt = document.getElementById('modalNatureza');
+                const modalInst = bootstrap.Modal.getInstance(modalElt) || new bootstrap.Modal(modalElt);
+                modalInst.hide();
 
+                // Limpar campos
+                $('#id_natureza_nome_modal').val('');
+                
                 alert('Natureza cadastrada com sucesso!');
             } else {
-                // Falha de validação (retorno 400 OK na resposta success)
                 alert('Erro de validação: ' + JSON.stringify(response.errors));
-                // Opcional: Exibir erros no div #natureza-modal-errors
             }
         },
         error: function (xhr) {
-            // Falha de Servidor (400 ou 500)
-            var errors = JSON.parse(xhr.responseText).errors;
-
-            // Exibir erro no modal e no console
-            $('#natureza-modal-errors').html('Falha: ' + JSON.stringify(errors));
-            alert(
-                'Erro ao salvar Natureza. Verifique o console. Detalhes: ' + JSON.stringify(errors)
-            );
-            console.error('AJAX Error:', errors);
-        },
+            if (xhr.status === 403) {
+                alert("Erro 403: O Django bloqueou o envio (Falta de Token CSRF).");
+            } else {
+                console.error("Detalhes do erro:", xhr.responseText);
+                alert("Erro ao salvar: Status " + xhr.status);
+            }
+        }
     });
 }
 
-/* ==========================================================
-   INSTRUMENTO (AJAX)
-========================================================== */
-// ... (Mantido)
+
+// INSTRUMENTO
 function abrirModalInstrumento() {
     $('#modalInstrumento, #overlayInst').show();
 }
@@ -248,9 +399,9 @@ function fecharModalInstrumento() {
 
 function salvarInstrumentoRapido() {
     const nome = $('#novo_nome_instrumento').val().trim();
-    if (!nome) return alert('Digite o nome do instrumento.');
+    if (!nome) return alert('Digite o nome.');
 
-    fetch("{% url 'adicionar_instrumento_ajax' %}", {
+    fetch(URLS_FORM.instrumento, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/x-www-form-urlencoded',
@@ -258,22 +409,19 @@ function salvarInstrumentoRapido() {
         },
         body: 'nome=' + encodeURIComponent(nome),
     })
-        .then((r) => r.json())
-        .then((data) => {
-            const select = $('#id_instrumento');
-            select.append(new Option(data.nome, data.id, true, true)).trigger('change');
-            fecharModalInstrumento();
-        });
+    .then(r => r.json())
+    .then(data => {
+        $('#id_instrumento').append(new Option(data.nome, data.id, true, true)).trigger('change');
+        registrarReferencia('instrumentos', { id: data.id, nome: data.nome });
+        fecharModalInstrumento();
+    });
 }
 
-/* ==========================================================
-   MATERIAL APREENDIDO (AJAX)
-========================================================== */
-// ... (Mantido)
+// MATERIAL APREENDIDO
 let selectMaterialAtual = null;
 
 function abrirModalMaterial(botao) {
-    selectMaterialAtual = botao.closest('.input-group').querySelector('select');
+    selectMaterialAtual = $(botao).closest('.input-group').find('select')[0];
     $('#modalMaterial, #overlayMaterial').show();
     $('#novo_nome_material').focus();
 }
@@ -281,26 +429,13 @@ function abrirModalMaterial(botao) {
 function fecharModalMaterial() {
     $('#modalMaterial, #overlayMaterial').hide();
     $('#novo_nome_material').val('');
-    selectMaterialAtual = null;
 }
 
 function salvarMaterialRapido() {
     const nome = $('#novo_nome_material').val().trim();
-    if (!nome) {
-        alert('Informe o nome do material.');
-        return;
-    }
+    if (!nome) return alert('Informe o nome.');
 
-    const urlEl = document.querySelector('[data-url]');
-    if (!urlEl) {
-        console.error('data-url não encontrado no botão.');
-        alert('Erro interno de configuração.');
-        return;
-    }
-
-    const url = urlEl.getAttribute('data-url');
-
-    fetch(url, {
+    fetch(URLS_FORM.material, {
         method: 'POST',
         headers: {
             'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
@@ -308,51 +443,306 @@ function salvarMaterialRapido() {
         },
         body: 'nome=' + encodeURIComponent(nome),
     })
-        .then((response) => {
-            // Caso Django tenha redirecionado (login, APPEND_SLASH, etc.)
-            if (response.redirected) {
-                console.error('Redirect detectado:', response.url);
-                alert('Sua sessão expirou. Faça login novamente.');
-                window.location.href = response.url;
-                return null;
-            }
+    .then(r => r.json())
+    .then(data => {
+        if (data.id) {
+            $(selectMaterialAtual).append(new Option(data.nome, data.id, true, true)).trigger('change');
+            registrarReferencia('materiais', { id: data.id, nome: data.nome });
+            fecharModalMaterial();
+        } else {
+            alert(data.error || 'Erro ao salvar');
+        }
+    })
+    .catch(err => alert('Erro no servidor. Verifique o console.'));
+}
 
-            if (!response.ok) {
-                return response.text().then((text) => {
-                    console.error('Erro HTTP:', response.status, text);
-                    throw new Error('HTTP ' + response.status);
-                });
-            }
 
-            const contentType = response.headers.get('content-type');
-            if (!contentType || !contentType.includes('application/json')) {
-                return response.text().then((text) => {
-                    console.error('Resposta não é JSON:', text);
-                    throw new Error('Resposta inesperada do servidor');
-                });
-            }
+/* ---------- 8. GRAVAÇÃO ITEM A ITEM (EDIÇÃO) ---------- */
+// Grava um envolvido/apreensão/imagem sem reenviar o formulário inteiro.
+// A linha (.envolvido-form, .form-apreensao-item, .imagem-form-bloco) traz
+// data-item-id e data-versao; o servidor recusa (409) se a versão mudou.
+
+// Só os campos da linha que diferem do valor carregado, sem o prefixo do formset
+function camposAlterados(linha, prefix) {
+    const dados = new FormData();
+    const padrao = new RegExp('^' + prefix + '-\\d+-');
+    $(linha).find('input[name], select[name], textarea[name]').each(function () {
+        const campo = this.name.replace(padrao, '');
+        if (campo === this.name || campo === 'id' || campo === 'ocorrencia' || campo === 'DELETE') return;
+        if (this.type === 'file') {
+            if (this.files.length) dados.append(campo, this.files[0]);
+        } else if (this.type === 'checkbox' || this.type === 'radio') {
+            if (this.checked !== this.defaultChecked) dados.append(campo, this.checked ? this.value : '');
+        } else if (this.tagName === 'SELECT') {
+            const alterado = Array.from(this.options).some(o => o.selected !== o.defaultSelected);
+            if (alterado) dados.append(campo, $(this).val() || '');
+        } else if (this.value !== this.defaultValue) {
+            dados.append(campo, this.value);
+        }
+    });
+    return dados;
+}
+
+// Depois de gravar, os valores atuais passam a ser a referência dos próximos envios
+function marcarComoSalvo(linha) {
+    $(linha).find('input[name], select[name], textarea[name]').each(function () {
+        if (this.type === 'file') return;
+        if (this.type === 'checkbox' || this.type === 'radio') this.defaultChecked = this.checked;
+        else if (this.tagName === 'SELECT') Array.from(this.options).forEach(o => { o.defaultSelected = o.selected; });
+        else this.defaultValue = this.value;
+    });
+}
+
+function urlItem(tipo, id, sufixo = '') {
+    return URLS_FORM.itens.replace('TIPO', tipo) + (id ? id + '/' : '') + sufixo;
+}
+
+function enviarItem(url, dados) {
+    return fetch(url, {
+        method: 'POST',
+        headers: { 'X-CSRFToken': $('[name=csrfmiddlewaretoken]').val() },
+        body: dados,
+        credentials: 'same-origin',
+    }).then(r => r.json().then(corpo => ({ status: r.status, corpo })));
+}
+
+// Cria (linha nova) ou altera o item da linha; devolve a resposta do servidor
+function salvarItemOcorrencia(linha, tipo) {
+    const id = linha.dataset.itemId;
+    const dados = camposAlterados(linha, tipo);
+    if (id) dados.append('versao', linha.dataset.versao);
+
+    return enviarItem(urlItem(tipo, id), dados).then(({ status, corpo }) => {
+        if (corpo.success) {
+            linha.dataset.itemId = corpo.id;
+            linha.dataset.versao = corpo.versao;
+            // A imagem enviada em partes já foi anexada: o token não vale mais
+            $(linha).find('input[name$="-upload_token"]').val('');
+            $(linha).find('input[type="file"]').val('');
+            marcarComoSalvo(linha);
+        } else if (status === 409) {
+            alert(corpo.error);
+        } else if (corpo.errors) {
+            alert(Object.entries(corpo.errors).map(([campo, erros]) => `${campo}: ${erros.join(' ')}`).join('\n'));
+        }
+        return corpo;
+    });
+}
+
+// A linha some da tela, mas continua no formset marcada para exclusão: o
+// envio do formulário inteiro depois disso não acusa o item que falta
+function excluirItemOcorrencia(linha, tipo) {
+    const dados = new FormData();
+    dados.append('versao', linha.dataset.versao);
+    return enviarItem(urlItem(tipo, linha.dataset.itemId, 'excluir/'), dados).then(({ corpo }) => {
+        if (corpo.success) {
+            $(linha).find('input[name$="-DELETE"]').prop('checked', true).val('on');
+            $(linha).hide();
+        } else {
+            alert(corpo.error || 'Erro ao excluir');
+        }
+        return corpo;
+    });
+}
 
-            return response.json();
+// Botão "salvar" das linhas já gravadas (só na edição)
+$(document).on('click', '.salvar-item-ocorrencia', function () {
+    const $btn = $(this);
+    const linha = $btn.closest('.envolvido-form, .form-apreensao-item, .imagem-form-bloco')[0];
+    const icone = $btn.find('i');
+
+    $btn.prop('disabled', true);
+    salvarItemOcorrencia(linha, $btn.data('prefix'))
+        .then(corpo => {
+            if (!corpo.success) return;
+            icone.removeClass('fa-save').addClass('fa-check');
+            setTimeout(() => icone.removeClass('fa-check').addClass('fa-save'), 1500);
         })
-        .then((data) => {
-            if (!data.id) {
-                alert(data.error || 'Erro ao salvar material');
-                return;
-            }
+        .catch(() => alert('Erro no servidor. Verifique o console.'))
+        .finally(() => $btn.prop('disabled', false));
+});
 
-            const option = new Option(data.nome, data.id, true, true);
-            selectMaterialAtual.append(option);
-            $(selectMaterialAtual).trigger('change');
 
-            if (!data.created) {
-                alert('Material já existia e foi selecionado.');
-            }
+/* ---------- 9. REDUÇÃO DAS FOTOS NO NAVEGADOR ---------- */
+// Fotos da câmera (8–12 MB) viram JPEG de no máximo N px no maior lado
+// antes de qualquer envio (em partes ou junto com o formulário). Limites
+// vindos do settings (IMAGEM_*) pelos atributos data-imagem-* do <script>.
+const CONFIG_IMAGENS = {
+    dimensaoMaxima: parseInt(document.currentScript.dataset.imagemDimensaoMaxima, 10) || 1600,
+    qualidade: (parseInt(document.currentScript.dataset.imagemQualidade, 10) || 80) / 100,
+    tamanhoMaximo: parseInt(document.currentScript.dataset.imagemTamanhoMaximo, 10) || 0,
+    manterOriginal: document.currentScript.dataset.imagemManterOriginal === '1',
+};
+const SELETOR_FOTOS = 'input[type="file"][name$="-foto"], input[type="file"][name$="-imagem"]';
+
+async function reduzirImagem(arquivo) {
+    if (!arquivo.type.startsWith('image/') || !window.createImageBitmap) return arquivo;
+
+    const bitmap = await createImageBitmap(arquivo, { imageOrientation: 'from-image' });
+    const escala = Math.min(1, CONFIG_IMAGENS.dimensaoMaxima / Math.max(bitmap.width, bitmap.height));
+    if (escala === 1 && (!CONFIG_IMAGENS.tamanhoMaximo || arquivo.size <= CONFIG_IMAGENS.tamanhoMaximo)) {
+        bitmap.close();
+        return arquivo;
+    }
 
-            fecharModalMaterial();
+    const canvas = document.createElement('canvas');
+    canvas.width = Math.round(bitmap.width * escala);
+    canvas.height = Math.round(bitmap.height * escala);
+    const ctx = canvas.getContext('2d');
+    ctx.fillStyle = '#fff';  // PNG com transparência: fundo branco no JPEG
+    ctx.fillRect(0, 0, canvas.width, canvas.height);
+    ctx.drawImage(bitmap, 0, 0, canvas.width, canvas.height);
+    bitmap.close();
+
+    const blob = await new Promise(resolve => canvas.toBlob(resolve, 'image/jpeg', CONFIG_IMAGENS.qualidade));
+    if (!blob || blob.size >= arquivo.size) return arquivo;
+    const nome = arquivo.name.replace(/\.[^.]+$/, '') + '.jpg';
+    return new File([blob], nome, { type: 'image/jpeg', lastModified: arquivo.lastModified });
+}
+
+// Registrado antes das prévias e do envio em partes: segura o evento, troca
+// o arquivo do input pelo reduzido e dispara o change de novo
+$(document).on('change', SELETOR_FOTOS, function (e) {
+    const input = this;
+    if (input.dataset.fotoReduzida === '1') {
+        delete input.dataset.fotoReduzida;
+        return;
+    }
+    if (CONFIG_IMAGENS.manterOriginal || !input.files.length || !window.DataTransfer) return;
+
+    e.stopImmediatePropagation();
+    reduzirImagem(input.files[0])
+        .then(reduzido => {
+            if (reduzido !== input.files[0]) {
+                const transferencia = new DataTransfer();
+                transferencia.items.add(reduzido);
+                input.files = transferencia.files;
+            }
         })
+        .catch(erro => console.error('Redução da imagem:', erro))
+        .finally(() => {
+            input.dataset.fotoReduzida = '1';
+            $(input).trigger('change');
+        });
+});
+
+/* ---------- 10. ENVIO DE IMAGENS EM PARTES (rpi/uploads.py) ---------- */
+// A foto é enviada assim que escolhida, em partes, e o formulário leva só o
+// token (campo oculto upload_token). Se a conexão cair, o envio continua de
+// onde parou (o token fica no localStorage). Sem crypto.subtle (página sem
+// HTTPS) ou em caso de erro, o arquivo segue junto com o formulário.
+const UPLOADS_PENDENTES = new Set();
+const TENTATIVAS_POR_PARTE = 5;
+
+async function sha256Hex(blob) {
+    const resumo = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+    return Array.from(new Uint8Array(resumo), b => b.toString(16).padStart(2, '0')).join('');
+}
+
+function esperar(ms) {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
+
+async function enviarEmPartes(arquivo, aoProgredir) {
+    const csrf = $('[name=csrfmiddlewaretoken]').val();
+    const chave = 'rpi-upload:' + [arquivo.name, arquivo.size, arquivo.lastModified].join(':');
+    let estado = null;
+
+    // 1. Retoma um envio anterior do mesmo arquivo, se o servidor ainda o tiver
+    const tokenSalvo = localStorage.getItem(chave);
+    if (tokenSalvo) {
+        const r = await fetch(URLS_FORM.uploads + tokenSalvo + '/', { credentials: 'same-origin' });
+        if (r.ok) estado = await r.json();
+    }
 
-        .catch((err) => {
-            console.error('Falha AJAX Material:', err);
-            alert('Erro ao salvar material.');
+    // 2. Ou começa um novo
+    if (!estado) {
+        const dados = new FormData();
+        dados.append('nome', arquivo.name);
+        dados.append('tamanho', arquivo.size);
+        dados.append('sha256', await sha256Hex(arquivo));
+        const r = await fetch(URLS_FORM.uploads, {
+            method: 'POST',
+            headers: { 'X-CSRFToken': csrf },
+            body: dados,
+            credentials: 'same-origin',
         });
+        estado = await r.json();
+        if (!r.ok) throw new Error(estado.error);
+        localStorage.setItem(chave, estado.token);
+    }
+
+    // 3. Envia as partes que faltam; em falha de rede tenta de novo com espera crescente
+    let tentativas = 0;
+    while (!estado.concluido) {
+        const inicio = estado.recebido;
+        const parte = arquivo.slice(inicio, inicio + estado.tamanho_parte);
+        let r = null;
+        try {
+            r = await fetch(URLS_FORM.uploads + estado.token + '/', {
+                method: 'POST',
+                headers: {
+                    'X-CSRFToken': csrf,
+                    'Content-Type': 'application/octet-stream',
+                    'Content-Range': `bytes ${inicio}-${inicio + parte.size - 1}/${arquivo.size}`,
+                },
+                body: parte,
+                credentials: 'same-origin',
+            });
+        } catch (erroDeRede) {
+            r = null;
+        }
+
+        if (r && r.ok) {
+            estado = await r.json();
+            tentativas = 0;
+            aoProgredir(estado.recebido / arquivo.size);
+            continue;
+        }
+        if (r && r.status === 400) {
+            // Envio descartado pelo servidor (ex.: SHA-256 não confere)
+            localStorage.removeItem(chave);
+            throw new Error((await r.json()).error);
+        }
+        if (r && r.status === 409) {
+            estado.recebido = (await r.json()).recebido;
+        }
+        if (++tentativas > TENTATIVAS_POR_PARTE) throw new Error('Falha de conexão no envio da imagem.');
+        await esperar(1000 * 2 ** tentativas);
+    }
+
+    localStorage.removeItem(chave);
+    return estado.token;
 }
+
+$(document).on('change', SELETOR_FOTOS, function () {
+    if (!URLS_FORM.uploads || !(window.crypto && crypto.subtle) || !this.files.length) return;
+
+    const input = this;
+    const linha = $(input).closest('.envolvido-form, .imagem-form-bloco');
+    const campoToken = linha.find('input[name$="-upload_token"]');
+    if (!campoToken.length) return;
+
+    const arquivo = input.files[0];
+    const textDisplay = linha.find('.filename-display');
+    const envio = enviarEmPartes(arquivo, p => textDisplay.text(`Enviando ${Math.round(p * 100)}%...`))
+        .then(token => {
+            // O arquivo já está no servidor: o formulário leva só o token
+            campoToken.val(token);
+            input.value = '';
+            textDisplay.html(`<i class="fas fa-check text-success"></i> ${arquivo.name}`);
+        })
+        .catch(erro => {
+            console.error('Envio em partes:', erro);
+            textDisplay.text(`${arquivo.name} (será enviado junto com o formulário)`);
+        })
+        .finally(() => UPLOADS_PENDENTES.delete(envio));
+    UPLOADS_PENDENTES.add(envio);
+});
+
+$(document).on('submit', 'form', function (e) {
+    if (UPLOADS_PENDENTES.size) {
+        e.preventDefault();
+        alert('Aguarde o envio das imagens terminar.');
+    }
+});
@@ -0,0 +1,231 @@
+"""
+Backends de armazenamento do projeto.
+
+`ManifestPrecomprimidoStorage` (STORAGES["staticfiles"] em produção) gera no
+collectstatic os nomes com hash do conteúdo (`geral.3f1c0a9b2d4e.css`) e, ao
+lado de cada arquivo de texto, as versões `.gz` e `.br` já comprimidas. O nginx
+entrega essas versões direto (gzip_static/brotli_static) com cache imutável,
+sem comprimir nada por requisição.
+
+`ArmazenamentoDeduplicado` (STORAGES["default"]) guarda cada conteúdo uma única
+vez em MEDIA_ROOT/blobs/ab/cd/<sha256>; o nome gravado no banco
+(ex.: ocorrencias/imagens/3f/foto.jpg) é um hard link para esse blob. A mesma
+foto anexada a várias ocorrências ocupa o disco uma vez só, e o número de
+links do blob é a contagem de referências: o blob some junto com o último
+nome que aponta para ele.
+
+`ArmazenamentoComArquivo` (o padrão) acrescenta a leitura da camada fria:
+um nome que não está no MEDIA_ROOT mas consta do índice de mídia arquivada
+é extraído do pacote do relatório (ver rpi/arquivo_midia.py).
+"""
+
+import gzip
+import hashlib
+import os
+import posixpath
+import secrets
+import shutil
+import tempfile
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele só o .gz é gerado
+    brotli = None
+
+# Binários (png, jpg, woff2...) já são comprimidos
+EXTENSOES_COMPRIMIVEIS = (".css", ".js", ".svg", ".json", ".txt", ".map", ".ico", ".html")
+TAMANHO_MINIMO = 512  # bytes; abaixo disso o cabeçalho extra não compensa
+
+
+def _gzip(conteudo):
+    # mtime fixo: o mesmo arquivo gera sempre o mesmo .gz
+    return gzip.compress(conteudo, compresslevel=9, mtime=0)
+
+
+def _brotli(conteudo):
+    return brotli.compress(conteudo, quality=11)
+
+
+class ManifestPrecomprimidoStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        processados = []
+        for nome, nome_hash, processado in super().post_process(paths, dry_run, **options):
+            if nome_hash and not isinstance(processado, Exception):
+                processados.append(nome_hash)
+            yield nome, nome_hash, processado
+
+        if not dry_run:
+            for nome_hash in processados:
+                self._precomprimir(nome_hash)
+
+    def _precomprimir(self, nome):
+        if not nome.lower().endswith(EXTENSOES_COMPRIMIVEIS):
+            return
+        with self.open(nome) as arquivo:
+            conteudo = arquivo.read()
+        if len(conteudo) < TAMANHO_MINIMO:
+            return
+
+        compressores = [(".gz", _gzip)]
+        if brotli is not None:
+            compressores.append((".br", _brotli))
+
+        for sufixo, comprimir in compressores:
+            comprimido = comprimir(conteudo)
+            # Só grava se realmente ficou menor
+            if len(comprimido) < len(conteudo):
+                caminho = self.path(nome + sufixo)
+                with open(caminho, "wb") as destino:
+                    destino.write(comprimido)
+
+
+def sha256_arquivo(caminho):
+    resumo = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b""):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+class ArmazenamentoDeduplicado(FileSystemStorage):
+    pasta_blobs = "blobs"
+
+    def caminho_blob(self, sha256):
+        return os.path.join(self.location, self.pasta_blobs, sha256[:2], sha256[2:4], sha256)
+
+    def caminho_local(self, name):
+        """Caminho no MEDIA_ROOT (sem procurar na camada fria, ver subclasse)."""
+        return FileSystemStorage.path(self, name)
+
+    def generate_filename(self, filename):
+        # Subpasta aleatória (256 possíveis) para nenhuma pasta crescer sem
+        # limite, ex.: ocorrencias/imagens/3f/foto.jpg
+        pasta, nome = posixpath.split(super().generate_filename(filename))
+        return posixpath.join(pasta, secrets.token_hex(1), nome)
+
+    def _save(self, name, content):
+        # 1. Copia o conteúdo para um temporário da pasta de blobs (mesmo
+        # sistema de arquivos, para o hard link) calculando o SHA-256
+        pasta_tmp = os.path.join(self.location, self.pasta_blobs, "tmp")
+        os.makedirs(pasta_tmp, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=pasta_tmp)
+        try:
+            resumo = hashlib.sha256()
+            with os.fdopen(descritor, "wb") as destino:
+                for bloco in content.chunks():
+                    resumo.update(bloco)
+                    destino.write(bloco)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporario, self.file_permissions_mode)
+
+            # 2. Conteúdo inédito vira blob; repetido, reaproveita o existente.
+            # O temporário fica até o nome estar gravado: se o blob sumir
+            # antes disso, é recriado a partir dele
+            blob = self.caminho_blob(resumo.hexdigest())
+            if not os.path.exists(blob):
+                self._publicar_blob(temporario, blob)
+
+            # 3. O nome pedido vira um hard link para o blob
+            while True:
+                caminho = self.caminho_local(name)
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                try:
+                    os.link(blob, caminho)
+                except FileExistsError:
+                    # Outro envio ocupou o nome nesse meio tempo
+                    name = self.get_available_name(name)
+                    continue
+                except FileNotFoundError:
+                    # A última referência ao blob foi apagada nesse meio tempo
+                    self._publicar_blob(temporario, blob)
+                    continue
+                except OSError:
+                    # Sistema de arquivos sem hard link: cópia comum
+                    shutil.copyfile(blob, caminho)
+                break
+        finally:
+            os.unlink(temporario)
+        return name.replace("\\", "/")
+
+    def _publicar_blob(self, temporario, blob):
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        try:
+            os.link(temporario, blob)
+        except FileExistsError:
+            # Outro envio do mesmo conteúdo criou o blob nesse meio tempo
+            pass
+        except OSError:
+            shutil.copyfile(temporario, blob)
+
+    def delete(self, name):
+        caminho = self.path(name)
+        try:
+            info = os.stat(caminho)
+        except FileNotFoundError:
+            return
+        # Dois links (este nome + o blob): é a última referência ao conteúdo
+        blob = self.caminho_blob(sha256_arquivo(caminho)) if info.st_nlink == 2 else None
+        super().delete(name)
+        if blob:
+            try:
+                info_blob = os.stat(blob)
+            except FileNotFoundError:
+                return
+            if info_blob.st_ino == info.st_ino and info_blob.st_nlink == 1:
+                os.unlink(blob)
+
+    def remover_blobs_orfaos(self, simular=False):
+        """
+        Apaga os blobs sem nenhum nome apontando para eles (só o próprio
+        link). Devolve (quantidade, bytes).
+        """
+        pasta = os.path.join(self.location, self.pasta_blobs)
+        quantidade = tamanho = 0
+        for raiz, pastas, nomes in os.walk(pasta):
+            if raiz == pasta:
+                # blobs/tmp/ tem envios em andamento
+                pastas[:] = [p for p in pastas if p != "tmp"]
+            for nome in nomes:
+                caminho = os.path.join(raiz, nome)
+                info = os.stat(caminho)
+                if info.st_nlink == 1:
+                    quantidade += 1
+                    tamanho += info.st_size
+                    if not simular:
+                        os.unlink(caminho)
+        return quantidade, tamanho
+
+
+class ArmazenamentoComArquivo(ArmazenamentoDeduplicado):
+    def _arquivada(self, name):
+        from .models import MidiaArquivada
+
+        return MidiaArquivada.objects.filter(nome=name).first()
+
+    def path(self, name):
+        caminho = self.caminho_local(name)
+        if os.path.lexists(caminho):
+            return caminho
+        registro = self._arquivada(name)
+        if registro is None:
+            return caminho
+
+        from . import arquivo_midia
+
+        return arquivo_midia.extrair(registro)
+
+    def exists(self, name):
+        return os.path.lexists(self.caminho_local(name)) or self._arquivada(name) is not None
+
+    def delete(self, name):
+        if os.path.lexists(self.caminho_local(name)):
+            return super().delete(name)
+        # Arquivado: sai do índice e do cache (o pacote não é reescrito)
+        from . import arquivo_midia
+        from .models import MidiaArquivada
+
+        MidiaArquivada.objects.filter(nome=name).delete()
+        arquivo_midia.caminho_cache(name).unlink(missing_ok=True)
@@ -0,0 +1,45 @@
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+def _ler_estatico(caminho):
+    """Conteúdo de um arquivo estático (STATIC_ROOT após o collectstatic, ou app)."""
+    try:
+        if staticfiles_storage.exists(caminho):
+            with staticfiles_storage.open(caminho) as arquivo:
+                return arquivo.read().decode("utf-8")
+    except NotImplementedError:  # storage remoto sem acesso local
+        pass
+    encontrado = finders.find(caminho)
+    if not encontrado:
+        raise template.TemplateSyntaxError(f"Arquivo estático '{caminho}' não encontrado.")
+    with open(encontrado, encoding="utf-8") as arquivo:
+        return arquivo.read()
+
+
+@lru_cache(maxsize=None)
+def _ler_estatico_em_cache(caminho):
+    return _ler_estatico(caminho)
+
+
+@register.simple_tag
+def css_inline(caminho):
+    """
+    Insere o CSS crítico direto no <head> (<style>), economizando uma
+    requisição antes da primeira pintura da página. Use só para folhas
+    pequenas; as demais continuam em <link> com hash e cache longo.
+
+    Exemplo: {% css_inline 'rpi/css/geral.css' %}
+    """
+    # Em desenvolvimento relê a cada página para refletir as edições
+    conteudo = _ler_estatico(caminho) if settings.DEBUG else _ler_estatico_em_cache(caminho)
+    # Impede que o conteúdo feche a tag <style> antes da hora
+    conteudo = conteudo.replace("</", "<\\/")
+    return mark_safe(f"<style>{conteudo}</style>")
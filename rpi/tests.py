@@ -1,3 +1,635 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import midia, referencias, relatorio_atual
+from .forms import ApreensaoFormSet, OcorrenciaImagemForm
+from .management.commands.limpar_midia_orfa import FORMATO_PASTA
+from .models import (
+    OPM,
+    Apreensao,
+    Envolvido,
+    MaterialApreendidoTipo,
+    MidiaArquivada,
+    Municipio,
+    NaturezaOcorrencia,
+    Ocorrencia,
+    OcorrenciaImagem,
+    RelatorioDiario,
+    ResumoDiarioEnvolvidos,
+    ResumoDiarioOcorrencias,
+    UploadTemporario,
+)
+from .storage import ArmazenamentoDeduplicado
+from .utils import _codificar_cursor, paginar_por_cursor
+
+
+class CadastroOcorrenciaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = get_user_model().objects.create_user(
+            username="plantonista", password="senha"
+        )
+        cls.municipio = Municipio.objects.create(nome="PORTO ALEGRE")
+        cls.opm = OPM.objects.create(nome="1º BPM", sigla="1BPM")
+        cls.natureza = NaturezaOcorrencia.objects.create(
+            nome="ROUBO A PEDESTRE", tipo_impacto="N"
+        )
+        cls.material = MaterialApreendidoTipo.objects.create(nome="PISTOLA")
+        agora = timezone.now()
+        RelatorioDiario.objects.create(
+            nr_relatorio=1,
+            ano_criacao=agora.year,
+            data_inicio=agora,
+            usuario_responsavel=cls.usuario,
+        )
+
+    def setUp(self):
+        # invalidar() roda no on_commit, que não dispara dentro do TestCase
+        cache.clear()
+
+    def test_criar_pela_data_bruta_atualiza_estatisticas(self):
+        # data_hora_bruta vira um datetime sem fuso em Ocorrencia.save()
+        self.client.force_login(self.usuario)
+        dados = {
+            "data_hora_bruta": "151435DEZ25",
+            "natureza": self.natureza.pk,
+            "tipo_acao": "C",
+            "opm": self.opm.pk,
+            "municipio": self.municipio.pk,
+            "rua": "RUA DOS ANDRADAS",
+            "numero": "100",
+            "bairro": "CENTRO",
+            "resumo_cabecalho": "ROUBO",
+            "relato_historico": "relato",
+            "envolvidos-TOTAL_FORMS": 1,
+            "envolvidos-INITIAL_FORMS": 0,
+            "envolvidos-0-nome": "FULANO",
+            "envolvidos-0-tipo_participante": "P",
+            "envolvidos-0-antecedentes": "N",
+            "apreensoes-TOTAL_FORMS": 0,
+            "apreensoes-INITIAL_FORMS": 0,
+            "imagens-TOTAL_FORMS": 0,
+            "imagens-INITIAL_FORMS": 0,
+        }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.post(reverse("ocorrencia_create"), dados)
+
+        self.assertRedirects(resposta, reverse("ocorrencia_list"), fetch_redirect_response=False)
+        ocorrencia = Ocorrencia.objects.get()
+        self.assertEqual(timezone.localtime(ocorrencia.data_hora_fato).hour, 14)
+        self.assertEqual(
+            ResumoDiarioOcorrencias.objects.get(dia=date(2025, 12, 15)).total, 1
+        )
+        self.assertEqual(
+            ResumoDiarioEnvolvidos.objects.get(
+                dia=date(2025, 12, 15), tipo_participante="P"
+            ).total,
+            1,
+        )
+
+
+class UploadPorTokenTests(TestCase):
+    def test_recusa_token_de_outro_usuario(self):
+        dono, outro = (
+            get_user_model().objects.create_user(username=nome, password="senha")
+            for nome in ("dono", "outro")
+        )
+        upload = UploadTemporario.objects.create(
+            usuario=dono, nome_original="foto.jpg", tamanho=10, sha256="0" * 64, concluido=True
+        )
+
+        form = OcorrenciaImagemForm(
+            {"upload_token": upload.token}, instance=OcorrenciaImagem(), usuario=outro
+        )
+
+        self.assertFalse(form.is_valid())
+        self.assertIn("upload_token", form.errors)
+        self.assertIsNone(form.upload)
+
+
+class RelatorioAtualTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = get_user_model().objects.create_user(
+            username="plantonista", password="senha"
+        )
+        agora = timezone.now()
+        self.relatorio = RelatorioDiario.objects.create(
+            nr_relatorio=1,
+            ano_criacao=agora.year,
+            data_inicio=agora,
+            usuario_responsavel=self.usuario,
+        )
+
+    def _chave(self):
+        return f"rpi:relatorio_atual:{relatorio_atual.versao()}:todos"
+
+    def test_guarda_so_o_pk_no_cache(self):
+        self.assertEqual(relatorio_atual.aberto(), self.relatorio)
+        self.assertEqual(cache.get(self._chave()), self.relatorio.pk)
+
+    def test_guarda_nenhum_quando_nao_ha_aberto(self):
+        RelatorioDiario.objects.update(finalizado=True)
+        self.assertIsNone(relatorio_atual.aberto())
+        self.assertEqual(cache.get(self._chave()), relatorio_atual.NENHUM)
+
+    def test_pk_de_relatorio_finalizado_no_cache_e_reconsultado(self):
+        relatorio_atual.aberto()
+        # Finalizado sem passar pela invalidação (on_commit)
+        RelatorioDiario.objects.update(finalizado=True)
+        self.assertIsNone(relatorio_atual.aberto())
+        self.assertEqual(cache.get(self._chave()), relatorio_atual.NENHUM)
+
+
+class ListagensExigemLoginTests(TestCase):
+    def test_anonimo_vai_para_o_login(self):
+        for nome in (
+            "listar_prisoes",
+            "listar_materiais_apreendidos",
+            "lista_cvli",
+            "listar_prisoes_por_opm",
+        ):
+            with self.subTest(nome):
+                resposta = self.client.get(reverse(nome), {"formato": "csv"})
+                self.assertEqual(resposta.status_code, 302)
+                self.assertIn(settings.LOGIN_URL, resposta["Location"])
+
+
+def _sha256(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+class ArmazenamentoDeduplicadoTests(TestCase):
+    def setUp(self):
+        self.pasta = self.enterContext(tempfile.TemporaryDirectory())
+        self.storage = ArmazenamentoDeduplicado(location=self.pasta)
+        self.blob = self.storage.caminho_blob(_sha256(b"foto"))
+
+    def test_conteudo_repetido_vira_link_para_o_mesmo_blob(self):
+        a = self.storage.save("fotos/a.jpg", ContentFile(b"foto"))
+        b = self.storage.save("fotos/b.jpg", ContentFile(b"foto"))
+        outro = self.storage.save("fotos/c.jpg", ContentFile(b"outra foto"))
+
+        self.assertTrue(os.path.samefile(self.storage.path(a), self.blob))
+        self.assertTrue(os.path.samefile(self.storage.path(b), self.blob))
+        self.assertFalse(os.path.samefile(self.storage.path(outro), self.blob))
+        # Os dois nomes + o próprio blob
+        self.assertEqual(os.stat(self.blob).st_nlink, 3)
+        self.assertEqual(os.listdir(os.path.join(self.pasta, "blobs", "tmp")), [])
+
+    def test_blob_sai_com_o_ultimo_nome(self):
+        a = self.storage.save("fotos/a.jpg", ContentFile(b"foto"))
+        b = self.storage.save("fotos/b.jpg", ContentFile(b"foto"))
+
+        self.storage.delete(a)
+        self.assertEqual(os.stat(self.blob).st_nlink, 2)
+        self.storage.delete(b)
+        self.assertFalse(os.path.exists(self.blob))
+
+    def test_blob_apagado_antes_do_link_e_recriado(self):
+        self.storage.save("fotos/a.jpg", ContentFile(b"foto"))
+        link = os.link
+        apagado = []
+
+        def blob_some_no_meio(origem, destino):
+            # Outra requisição apaga a última referência ao blob (uma vez)
+            if origem == self.blob and not apagado:
+                apagado.append(origem)
+                os.unlink(origem)
+            return link(origem, destino)
+
+        with mock.patch("rpi.storage.os.link", side_effect=blob_some_no_meio):
+            nome = self.storage.save("fotos/b.jpg", ContentFile(b"foto"))
+
+        with self.storage.open(nome) as arquivo:
+            self.assertEqual(arquivo.read(), b"foto")
+        self.assertTrue(os.path.samefile(self.storage.path(nome), self.blob))
+        self.assertEqual(os.listdir(os.path.join(self.pasta, "blobs", "tmp")), [])
+
+    def test_remover_blobs_orfaos(self):
+        nome = self.storage.save("fotos/a.jpg", ContentFile(b"foto"))
+        # Sem passar pelo delete() do storage (ex.: arquivo movido à mão)
+        os.unlink(self.storage.path(nome))
+
+        self.assertEqual(self.storage.remover_blobs_orfaos(simular=True), (1, 4))
+        self.assertTrue(os.path.exists(self.blob))
+        self.assertEqual(self.storage.remover_blobs_orfaos(), (1, 4))
+        self.assertFalse(os.path.exists(self.blob))
+
+
+class DeduplicarMidiaTests(TestCase):
+    def setUp(self):
+        self.pasta = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=self.pasta))
+        os.makedirs(os.path.join(self.pasta, "fotos"))
+        for nome, conteudo in (("a.jpg", b"foto"), ("b.jpg", b"foto"), ("c.jpg", b"outra")):
+            with open(self._caminho(nome), "wb") as arquivo:
+                arquivo.write(conteudo)
+
+    def _caminho(self, nome):
+        return os.path.join(self.pasta, "fotos", nome)
+
+    def _executar(self, *args):
+        saida = io.StringIO()
+        call_command("deduplicar_midia", *args, stdout=saida)
+        return saida.getvalue()
+
+    def test_dry_run_nao_altera_arquivos(self):
+        saida = self._executar("--dry-run")
+
+        self.assertIn("3 arquivos verificados, 1 repetidos", saida)
+        self.assertIn("4 bytes", saida)
+        self.assertFalse(os.path.samefile(self._caminho("a.jpg"), self._caminho("b.jpg")))
+        self.assertFalse(os.path.exists(os.path.join(self.pasta, "blobs")))
+
+    def test_troca_repetidos_por_links(self):
+        saida = self._executar()
+
+        self.assertIn("3 arquivos verificados, 1 repetidos", saida)
+        self.assertTrue(os.path.samefile(self._caminho("a.jpg"), self._caminho("b.jpg")))
+        self.assertFalse(os.path.samefile(self._caminho("a.jpg"), self._caminho("c.jpg")))
+        with open(self._caminho("b.jpg"), "rb") as arquivo:
+            self.assertEqual(arquivo.read(), b"foto")
+        # Segunda execução: nada mais a fazer
+        self.assertIn("0 repetidos", self._executar())
+
+
+class LimparMidiaOrfaTests(TestCase):
+    def setUp(self):
+        self.media = self.enterContext(tempfile.TemporaryDirectory())
+        self.quarentena = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(
+            override_settings(MEDIA_ROOT=self.media, MIDIA_QUARENTENA_DIR=self.quarentena)
+        )
+        usuario = get_user_model().objects.create_user(username="plantonista", password="senha")
+        agora = timezone.now()
+        self.ocorrencia = Ocorrencia.objects.create(
+            natureza=NaturezaOcorrencia.objects.create(nome="ROUBO", tipo_impacto="N"),
+            relatorio_diario=RelatorioDiario.objects.create(
+                nr_relatorio=1,
+                ano_criacao=agora.year,
+                data_inicio=agora,
+                usuario_responsavel=usuario,
+            ),
+            opm=OPM.objects.create(nome="1º BPM", sigla="1BPM"),
+            municipio=Municipio.objects.create(nome="PORTO ALEGRE"),
+            data_hora_fato=agora,
+        )
+
+    def _gravar(self, nome, conteudo=b"foto"):
+        caminho = os.path.join(self.media, *nome.split("/"))
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho, "wb") as arquivo:
+            arquivo.write(conteudo)
+        return caminho
+
+    def _envolvido(self, foto):
+        return Envolvido.objects.create(
+            ocorrencia=self.ocorrencia, nome="FULANO", tipo_participante="P", foto=foto
+        )
+
+    def _executar(self, *args):
+        call_command("limpar_midia_orfa", *args, stdout=io.StringIO())
+
+    def _em_quarentena(self, nome):
+        return [lote for lote in self.quarentena.iterdir() if (lote / nome).is_file()]
+
+    def test_orfao_vai_para_a_quarentena(self):
+        usado = self._gravar("envolvidos/fotos/usado.jpg")
+        solto = self._gravar("envolvidos/fotos/solto.jpg")
+        self._envolvido("envolvidos/fotos/usado.jpg")
+
+        self._executar("--horas", "0")
+
+        self.assertTrue(os.path.exists(usado))
+        self.assertFalse(os.path.exists(solto))
+        self.assertEqual(len(self._em_quarentena("envolvidos/fotos/solto.jpg")), 1)
+
+    def test_dry_run_nao_move(self):
+        solto = self._gravar("envolvidos/fotos/solto.jpg")
+
+        self._executar("--horas", "0", "--dry-run")
+
+        self.assertTrue(os.path.exists(solto))
+        self.assertEqual(self._em_quarentena("envolvidos/fotos/solto.jpg"), [])
+
+    def test_historico_retido_mantem_o_arquivo(self):
+        antigo = self._gravar("envolvidos/fotos/antigo.jpg")
+        self._envolvido("envolvidos/fotos/antigo.jpg").delete()
+
+        self._executar("--horas", "0")
+        self.assertTrue(os.path.exists(antigo))
+
+        # Fora de AUDIT_LOG_RETENTION_DAYS o histórico não segura mais
+        Envolvido.history.update(
+            history_date=timezone.now()
+            - timedelta(days=settings.AUDIT_LOG_RETENTION_DAYS + 1)
+        )
+        self._executar("--horas", "0")
+        self.assertFalse(os.path.exists(antigo))
+
+    def test_link_recente_para_blob_antigo_nao_e_orfao(self):
+        primeiro = default_storage.save("envolvidos/fotos/a.jpg", ContentFile(b"foto"))
+        blob = default_storage.caminho_blob(_sha256(b"foto"))
+        velho = (timezone.now() - timedelta(days=400)).timestamp()
+        os.utime(blob, (velho, velho))
+
+        # Mesmo conteúdo anexado agora: o novo nome herda o mtime do blob
+        novo = default_storage.save("envolvidos/fotos/b.jpg", ContentFile(b"foto"))
+        self.assertLess(os.stat(default_storage.path(novo)).st_mtime, velho + 1)
+
+        self._executar()
+
+        self.assertTrue(os.path.exists(default_storage.path(primeiro)))
+        self.assertTrue(os.path.exists(default_storage.path(novo)))
+
+    def test_purga_a_quarentena_vencida(self):
+        vencido = self.quarentena / (timezone.localtime() - timedelta(days=31)).strftime(
+            FORMATO_PASTA
+        )
+        recente = self.quarentena / timezone.localtime().strftime(FORMATO_PASTA)
+        for lote in (vencido, recente):
+            (lote / "envolvidos").mkdir(parents=True)
+
+        self._executar("--dias-quarentena", "30")
+
+        self.assertFalse(vencido.exists())
+        self.assertTrue(recente.exists())
+
+
+class IntervaloTests(SimpleTestCase):
+    def test_trechos(self):
+        casos = {
+            None: None,
+            "": None,
+            "bytes=0-4": (0, 4),
+            "bytes=5-": (5, 9),
+            "bytes=-3": (7, 9),
+            "bytes=-100": (0, 9),
+            "bytes=8-100": (8, 9),
+            "bytes=0-1,3-4": None,  # vários trechos: arquivo inteiro
+            "itens=0-4": None,
+            "bytes=5-2": None,  # inválido: ignorado (RFC 7233)
+            "bytes=10-": False,
+            "bytes=-0": False,
+        }
+        for cabecalho, esperado in casos.items():
+            with self.subTest(cabecalho):
+                self.assertEqual(midia.intervalo(cabecalho, 10), esperado)
+
+
+@override_settings(MIDIA_ENVIO="")
+class RespostaArquivoTests(SimpleTestCase):
+    def setUp(self):
+        pasta = self.enterContext(tempfile.TemporaryDirectory())
+        self.caminho = os.path.join(pasta, "foto.jpg")
+        with open(self.caminho, "wb") as arquivo:
+            arquivo.write(b"0123456789")
+        self.fabrica = RequestFactory()
+
+    def _resposta(self, **cabecalhos):
+        return midia.resposta_arquivo(self.fabrica.get("/", headers=cabecalhos), self.caminho)
+
+    def _corpo(self, resposta):
+        corpo = b"".join(resposta.streaming_content)
+        resposta.close()
+        return corpo
+
+    def test_arquivo_inteiro(self):
+        resposta = self._resposta()
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(self._corpo(resposta), b"0123456789")
+        self.assertEqual(resposta["Accept-Ranges"], "bytes")
+        self.assertEqual(resposta["Cache-Control"], midia.CACHE_CONTROL)
+
+    def test_trecho(self):
+        resposta = self._resposta(Range="bytes=2-4")
+        self.assertEqual(resposta.status_code, 206)
+        self.assertEqual(self._corpo(resposta), b"234")
+        self.assertEqual(resposta["Content-Range"], "bytes 2-4/10")
+        self.assertEqual(resposta["Content-Length"], "3")
+
+    def test_trecho_fora_do_arquivo(self):
+        resposta = self._resposta(Range="bytes=20-")
+        self.assertEqual(resposta.status_code, 416)
+        self.assertEqual(resposta["Content-Range"], "bytes */10")
+
+    def test_range_invalido_manda_o_arquivo_inteiro(self):
+        resposta = self._resposta(Range="bytes=5-2")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(self._corpo(resposta), b"0123456789")
+
+    def test_if_range(self):
+        ultima_alteracao = self._resposta()["Last-Modified"]
+
+        igual = self._resposta(Range="bytes=0-1", **{"If-Range": ultima_alteracao})
+        self.assertEqual(igual.status_code, 206)
+        self._corpo(igual)
+
+        # Versão diferente da que o navegador tinha: arquivo inteiro
+        mudou = self._resposta(Range="bytes=0-1", **{"If-Range": "Mon, 01 Jan 2001 00:00:00 GMT"})
+        self.assertEqual(mudou.status_code, 200)
+        self.assertEqual(self._corpo(mudou), b"0123456789")
+
+    def test_nao_modificado(self):
+        ultima_alteracao = self._resposta()["Last-Modified"]
+        resposta = self._resposta(**{"If-Modified-Since": ultima_alteracao})
+        self.assertEqual(resposta.status_code, 304)
+        self.assertEqual(resposta["Cache-Control"], midia.CACHE_CONTROL)
+
+    def test_x_accel_redirect(self):
+        pasta = os.path.dirname(self.caminho)
+        with override_settings(
+            MIDIA_ENVIO="x-accel-redirect", MIDIA_ACCEL_LOCAIS={pasta: "/_midia/"}
+        ):
+            resposta = self._resposta()
+        self.assertEqual(resposta["X-Accel-Redirect"], "/_midia/foto.jpg")
+        self.assertEqual(resposta.content, b"")
+
+
+class ServirMidiaTests(TestCase):
+    def test_pacote_danificado_responde_404(self):
+        arquivo = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(
+            override_settings(
+                MEDIA_ROOT=str(arquivo / "media"),
+                MIDIA_ARQUIVO_DIR=arquivo / "pacotes",
+                MIDIA_ARQUIVO_CACHE_DIR=arquivo / "cache",
+            )
+        )
+        (arquivo / "pacotes").mkdir()
+        (arquivo / "pacotes" / "rpi.zip").write_bytes(b"nao e um zip")
+        usuario = get_user_model().objects.create_user(username="plantonista", password="senha")
+        MidiaArquivada.objects.create(
+            nome="ocorrencias/imagens/3f/foto.jpg",
+            relatorio=RelatorioDiario.objects.create(
+                nr_relatorio=1,
+                ano_criacao=2025,
+                data_inicio=timezone.now(),
+                usuario_responsavel=usuario,
+            ),
+            pacote="rpi.zip",
+            tamanho=10,
+        )
+        self.client.force_login(usuario)
+
+        with self.assertLogs("rpi.midia", "ERROR"):
+            resposta = self.client.get(
+                reverse("servir_midia", args=["ocorrencias/imagens/3f/foto.jpg"])
+            )
+
+        self.assertEqual(resposta.status_code, 404)
+
+
+class PaginarPorCursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        usuario = get_user_model().objects.create_user(username="plantonista", password="senha")
+        comuns = {
+            "natureza": NaturezaOcorrencia.objects.create(nome="ROUBO", tipo_impacto="N"),
+            "relatorio_diario": RelatorioDiario.objects.create(
+                nr_relatorio=1,
+                ano_criacao=2025,
+                data_inicio=timezone.now(),
+                usuario_responsavel=usuario,
+            ),
+            "opm": OPM.objects.create(nome="1º BPM", sigla="1BPM"),
+            "municipio": Municipio.objects.create(nome="PORTO ALEGRE"),
+        }
+        dia = timezone.make_aware(datetime(2025, 12, 15, 14, 0))
+        # Empates na data, datas distintas e datas nulas
+        for data in (dia, None, dia, dia - timedelta(days=1), None, dia, dia + timedelta(days=1)):
+            Ocorrencia.objects.create(data_hora_fato=data, **comuns)
+
+    def _todas_as_paginas(self, ordem, por_pagina):
+        vistos, cursor = [], None
+        while True:
+            itens, cursor = paginar_por_cursor(Ocorrencia.objects.all(), ordem, cursor, por_pagina)
+            vistos.extend(item.pk for item in itens)
+            if cursor is None:
+                return vistos
+
+    def _esperado(self, decrescente):
+        ocorrencias = list(Ocorrencia.objects.all())
+        com_data = sorted(
+            (o for o in ocorrencias if o.data_hora_fato),
+            key=lambda o: (o.data_hora_fato, o.pk),
+            reverse=decrescente,
+        )
+        sem_data = sorted(
+            (o for o in ocorrencias if not o.data_hora_fato),
+            key=lambda o: o.pk,
+            reverse=decrescente,
+        )
+        return [o.pk for o in com_data + sem_data]
+
+    def test_percorre_tudo_sem_repetir_nem_pular(self):
+        for ordem, decrescente in ((("-data_hora_fato", "-pk"), True), (("data_hora_fato", "pk"), False)):
+            for por_pagina in (1, 2, 3, 7, 10):
+                with self.subTest(ordem=ordem, por_pagina=por_pagina):
+                    self.assertEqual(
+                        self._todas_as_paginas(ordem, por_pagina), self._esperado(decrescente)
+                    )
+
+    def test_ultima_pagina_sem_cursor(self):
+        itens, cursor = paginar_por_cursor(Ocorrencia.objects.all(), ("-data_hora_fato", "-pk"), None, 7)
+        self.assertEqual(len(itens), 7)
+        self.assertIsNone(cursor)
+
+    def test_cursor_invalido_volta_para_a_primeira_pagina(self):
+        ordem = ("-data_hora_fato", "-pk")
+        primeira, _ = paginar_por_cursor(Ocorrencia.objects.all(), ordem, None, 3)
+        for cursor in (
+            "%%%",
+            "bm9uLWpzb24",  # "non-json"
+            _codificar_cursor({"a": 1}),
+            _codificar_cursor([1]),  # tamanho diferente da ordem
+            _codificar_cursor(["não é data", "x"]),
+        ):
+            with self.subTest(cursor=cursor):
+                itens, _ = paginar_por_cursor(Ocorrencia.objects.all(), ordem, cursor, 3)
+                self.assertEqual(itens, primeira)
+
+
+class ReferenciasJsonTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(
+            get_user_model().objects.create_user(username="plantonista", password="senha")
+        )
+        self.url = reverse("referencias_json")
+
+    def test_revalidacao_responde_304_com_a_mesma_politica_de_cache(self):
+        resposta = self.client.get(self.url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta["Cache-Control"], "private, no-cache")
+
+        revalidada = self.client.get(self.url, headers={"If-None-Match": resposta["ETag"]})
+        self.assertEqual(revalidada.status_code, 304)
+        self.assertEqual(revalidada["ETag"], resposta["ETag"])
+        self.assertEqual(revalidada["Cache-Control"], "private, no-cache")
+
+    def test_url_versionada_e_imutavel_tambem_no_304(self):
+        versao = referencias.versao()
+        resposta = self.client.get(
+            self.url, {"v": versao}, headers={"If-None-Match": f'"{versao}"'}
+        )
+        self.assertEqual(resposta.status_code, 304)
+        self.assertIn("immutable", resposta["Cache-Control"])
+
+    def test_etag_e_conteudo_da_mesma_versao(self):
+        # A versão muda entre duas leituras: só a primeira pode ser usada
+        with mock.patch.object(referencias, "versao", side_effect=["antiga", "nova"]):
+            with mock.patch.object(referencias, "pacote_json", return_value="{}") as pacote:
+                resposta = self.client.get(self.url)
+
+        self.assertEqual(resposta["ETag"], '"antiga"')
+        pacote.assert_called_once_with("antiga")
+
+
+class SelectSobDemandaTests(TestCase):
+    def test_rotulos_das_linhas_sem_ler_o_catalogo(self):
+        usuario = get_user_model().objects.create_user(username="plantonista", password="senha")
+        ocorrencia = Ocorrencia.objects.create(
+            natureza=NaturezaOcorrencia.objects.create(nome="ROUBO", tipo_impacto="N"),
+            relatorio_diario=RelatorioDiario.objects.create(
+                nr_relatorio=1,
+                ano_criacao=2025,
+                data_inicio=timezone.now(),
+                usuario_responsavel=usuario,
+            ),
+            opm=OPM.objects.create(nome="1º BPM", sigla="1BPM"),
+            municipio=Municipio.objects.create(nome="PORTO ALEGRE"),
+        )
+        materiais = [
+            MaterialApreendidoTipo.objects.create(nome=nome)
+            for nome in ("PISTOLA", "REVÓLVER", "FACA")
+        ]
+        for material in materiais:
+            Apreensao.objects.create(ocorrencia=ocorrencia, material_tipo=material, quantidade=1)
+        formset = ApreensaoFormSet(instance=ocorrencia, prefix="apreensoes")
+
+        with mock.patch.object(referencias, "lista") as lista:
+            html = "".join(str(form["material_tipo"]) for form in formset.forms)
+
+        lista.assert_not_called()
+        for material in materiais:
+            self.assertInHTML(
+                f'<option value="{material.pk}" selected>{material.nome}</option>', html
+            )
@@ -0,0 +1,139 @@
+"""
+Envio de imagens em partes, com retomada.
+
+Mandar as fotos junto com o POST da ocorrência faz uma queda de conexão
+(comum no celular, em campo) perder o formulário e todas as imagens. Aqui
+cada arquivo é enviado antes, em partes de UPLOAD_TAMANHO_PARTE bytes:
+
+1. POST api/uploads/ com nome, tamanho e sha256 do arquivo -> token;
+2. POST api/uploads/<token>/ com os bytes da parte no corpo e o cabeçalho
+   "Content-Range: bytes <inicio>-<fim>/<tamanho>". A parte precisa começar
+   no máximo onde o servidor parou (GET api/uploads/<token>/ informa), então
+   após uma queda o envio continua de onde estava;
+3. ao receber o último byte o SHA-256 do arquivo é conferido; se não bater,
+   o envio é descartado.
+
+O formulário da ocorrência recebe só o token (campo oculto upload_token, ver
+UploadPorTokenForm em forms.py) e anexa o arquivo ao salvar.
+"""
+
+import hashlib
+import re
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .models import UploadTemporario
+
+_RE_CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+_RE_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+class UploadInvalido(Exception):
+    """Envio recusado; a mensagem é devolvida ao navegador."""
+
+
+def tamanho_maximo_imagem():
+    """Limite de tamanho de uma foto (ver IMAGEM_TAMANHO_MAXIMO no settings)."""
+    if settings.IMAGEM_ACEITAR_ORIGINAL:
+        return settings.UPLOAD_TAMANHO_MAXIMO
+    return settings.IMAGEM_TAMANHO_MAXIMO
+
+
+def caminho(upload):
+    return Path(settings.UPLOAD_TEMPORARIO_DIR) / f"{upload.token.hex}.parcial"
+
+
+def iniciar(usuario, nome, tamanho, sha256):
+    if not nome:
+        raise UploadInvalido("Nome do arquivo não informado.")
+    # Recusa já no início: não adianta transferir uma foto grande demais
+    if not str(tamanho).isdigit() or not 0 < int(tamanho) <= tamanho_maximo_imagem():
+        raise UploadInvalido(
+            f"Tamanho inválido (máximo {tamanho_maximo_imagem() / (1024 * 1024):.0f} MB)."
+        )
+    sha256 = (sha256 or "").lower()
+    if not _RE_SHA256.match(sha256):
+        raise UploadInvalido("SHA-256 do arquivo inválido.")
+
+    upload = UploadTemporario.objects.create(
+        usuario=usuario,
+        nome_original=Path(nome).name[:255],
+        tamanho=int(tamanho),
+        sha256=sha256,
+    )
+    destino = caminho(upload)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.touch()
+    return upload
+
+
+def ler_content_range(cabecalho, tamanho_corpo):
+    """(inicio, fim) do cabeçalho Content-Range, conferido com o corpo recebido."""
+    encontrado = _RE_CONTENT_RANGE.match(cabecalho or "")
+    if not encontrado:
+        raise UploadInvalido("Cabeçalho Content-Range ausente ou inválido.")
+    inicio, fim, _ = (int(v) for v in encontrado.groups())
+    if fim < inicio or fim - inicio + 1 != tamanho_corpo:
+        raise UploadInvalido("O tamanho da parte não confere com o Content-Range.")
+    return inicio, fim
+
+
+def gravar_parte(upload, inicio, dados, sha256_parte=None):
+    """
+    Grava a parte a partir de `inicio`. Reenviar uma parte já recebida (a
+    resposta anterior se perdeu) apenas a sobrescreve. Chamar com o registro
+    travado (select_for_update) para não intercalar partes do mesmo envio.
+    """
+    if upload.concluido:
+        return upload
+    if inicio > upload.recebido:
+        raise UploadInvalido("Parte fora de ordem.")
+    if inicio + len(dados) > upload.tamanho:
+        raise UploadInvalido("A parte ultrapassa o tamanho declarado do arquivo.")
+    if sha256_parte and hashlib.sha256(dados).hexdigest() != sha256_parte.lower():
+        raise UploadInvalido("A parte chegou corrompida (SHA-256 não confere).")
+
+    with open(caminho(upload), "r+b") as arquivo:
+        arquivo.seek(inicio)
+        arquivo.write(dados)
+    upload.recebido = max(upload.recebido, inicio + len(dados))
+
+    if upload.recebido == upload.tamanho:
+        if _sha256_arquivo(caminho(upload)) != upload.sha256:
+            descartar(upload)
+            raise UploadInvalido("O arquivo chegou corrompido (SHA-256 não confere).")
+        upload.concluido = True
+
+    upload.save(update_fields=["recebido", "concluido", "atualizado_em"])
+    return upload
+
+
+def _sha256_arquivo(destino):
+    resumo = hashlib.sha256()
+    with open(destino, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b""):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def abrir(upload):
+    """O arquivo recebido como File do Django (para anexar a um FileField)."""
+    return File(open(caminho(upload), "rb"), name=upload.nome_original)
+
+
+def descartar(upload):
+    caminho(upload).unlink(missing_ok=True)
+    if upload.pk:
+        upload.delete()
+
+
+def expirados(horas=None):
+    """Envios parados há mais de UPLOAD_TEMPORARIO_HORAS (não anexados)."""
+    horas = settings.UPLOAD_TEMPORARIO_HORAS if horas is None else horas
+    return UploadTemporario.objects.filter(
+        atualizado_em__lt=timezone.now() - timedelta(hours=horas)
+    )
@@ -143,6 +143,43 @@ urlpatterns = [
         views.cadastrar_natureza_rapida,
         name="cadastrar_natureza_rapida",
     ),
+    # Busca paginada dos selects sob demanda (OPM, município, materiais...)
+    path(
+        "api/catalogos/<slug:catalogo>/",
+        views.buscar_catalogo,
+        name="buscar_catalogo",
+    ),
+    # Outras ocorrências com fotos parecidas (rpi/assinaturas.py)
+    path(
+        "api/ocorrencias/<int:pk>/imagens-similares/",
+        views.imagens_similares,
+        name="imagens_similares",
+    ),
+    # Edição item a item (envolvidos, apreensões e imagens) da ocorrência
+    path(
+        "api/ocorrencias/<int:ocorrencia_pk>/<slug:tipo>/",
+        views.salvar_item_ocorrencia,
+        name="criar_item_ocorrencia",
+    ),
+    path(
+        "api/ocorrencias/<int:ocorrencia_pk>/<slug:tipo>/<int:pk>/",
+        views.salvar_item_ocorrencia,
+        name="salvar_item_ocorrencia",
+    ),
+    path(
+        "api/ocorrencias/<int:ocorrencia_pk>/<slug:tipo>/<int:pk>/excluir/",
+        views.excluir_item_ocorrencia,
+        name="excluir_item_ocorrencia",
+    ),
+    # Envio de imagens em partes, com retomada (rpi/uploads.py)
+    path("api/uploads/", views.iniciar_upload, name="iniciar_upload"),
+    path(
+        "api/uploads/<uuid:token>/",
+        views.enviar_parte_upload,
+        name="enviar_parte_upload",
+    ),
+    # Pacote de dados de referência do formulário (versionado, com ETag)
+    path("api/referencias/", views.referencias_json, name="referencias_json"),
     # lista os usuários cadastrados no banco de dados
     path("listar_usuarios/", views.listar_usuarios, name="listar_usuarios"),
     # deletar usuário do sistema
@@ -164,4 +201,17 @@ urlpatterns = [
         name="ajax_carregar_municipios",
     ),
     path("lista_cvli/", views.lista_cvli, name="lista_cvli"),
+    # Painel de estatísticas (tabelas consolidadas por dia de plantão)
+    path("estatisticas/", views.painel_estatisticas, name="painel_estatisticas"),
+    # Métricas de desempenho (Prometheus)
+    path("metrics", views.metricas_prometheus, name="metricas_prometheus"),
+    # Consultas SQL lentas capturadas
+    path("desempenho/consultas/", views.consultas_lentas, name="consultas_lentas"),
+    # Perfis de requisição (cProfile) sob demanda
+    path("desempenho/perfis/", views.perfis_requisicao, name="perfis_requisicao"),
+    path(
+        "desempenho/perfis/<str:nome>/download/",
+        views.download_perfil,
+        name="download_perfil",
+    ),
 ]
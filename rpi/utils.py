@@ -1,3 +1,11 @@
+import base64
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from datetime import time, timedelta
 
@@ -24,4 +32,113 @@ def calcular_janela_plantao(data_inicio_str=None, data_fim_str=None):
         "dt_fim": dt_fim,
         "data_inicio_str": data_inicio_str or dt_inicio.strftime('%Y-%m-%d'),
         "data_fim_str": data_fim_str or (dt_fim - timedelta(days=1)).strftime('%Y-%m-%d'),
-    }
\ No newline at end of file
+    }
+
+
+# --- PAGINAÇÃO POR CURSOR (keyset) ---
+# Em vez de OFFSET (que relê as linhas das páginas anteriores e "pula" ou
+# repete linhas quando alguém cadastra durante a navegação), a próxima página
+# é pedida a partir dos valores de ordenação da última linha exibida.
+
+
+def _codificar_cursor(valores):
+    texto = json.dumps(valores, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor):
+    try:
+        texto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(texto)
+    except (ValueError, TypeError):
+        return None
+    return valores if isinstance(valores, list) else None
+
+
+def _filtro_apos(ordem, valores):
+    """
+    Q das linhas que vêm depois de `valores` na `ordem` (nomes de campos,
+    com "-" para decrescente; nulos por último, como em `paginar_por_cursor`).
+    """
+    filtro = Q(pk__in=[])
+    anteriores_iguais = Q()
+    for campo, valor in zip(ordem, valores):
+        nome = campo.lstrip("-")
+        if valor is None:
+            # Nulos vêm por último: depois de um nulo só há outro nulo
+            anteriores_iguais &= Q(**{f"{nome}__isnull": True})
+            continue
+        operador = "lt" if campo.startswith("-") else "gt"
+        filtro |= anteriores_iguais & (
+            Q(**{f"{nome}__{operador}": valor}) | Q(**{f"{nome}__isnull": True})
+        )
+        anteriores_iguais &= Q(**{nome: valor})
+    return filtro
+
+
+def paginar_por_cursor(queryset, ordem, cursor=None, por_pagina=50):
+    """
+    Uma página do queryset na `ordem` dada, a partir do `cursor` (None ou
+    inválido: primeira página). A ordem precisa terminar num campo único
+    (ex.: ("-data_hora_fato", "-pk")); campos de relações são aceitos
+    ("-ocorrencia__data_hora_fato"). Devolve (itens, cursor da próxima
+    página ou None).
+    """
+    expressoes = [
+        F(campo.lstrip("-")).desc(nulls_last=True)
+        if campo.startswith("-")
+        else F(campo).asc(nulls_last=True)
+        for campo in ordem
+    ]
+    queryset = queryset.order_by(*expressoes)
+    valores = _decodificar_cursor(cursor) if cursor else None
+    if valores and len(valores) == len(ordem):
+        try:
+            queryset = queryset.filter(_filtro_apos(ordem, valores))
+        except (ValidationError, ValueError, TypeError):
+            # Cursor adulterado: volta para a primeira página
+            pass
+
+    # Uma linha a mais só para saber se existe próxima página
+    itens = list(queryset[: por_pagina + 1])
+    if len(itens) <= por_pagina:
+        return itens, None
+    itens = itens[:por_pagina]
+    return itens, _codificar_cursor([_valor(itens[-1], campo) for campo in ordem])
+
+
+def _valor(obj, campo):
+    """Valor de `campo` no objeto, seguindo relações ("ocorrencia__data_hora_fato")."""
+    for parte in campo.lstrip("-").split("__"):
+        obj = getattr(obj, parte)
+    return obj
+
+
+# --- EXPORTAÇÃO EM CSV (streaming) ---
+
+
+class _Eco:
+    """"Arquivo" para o csv.writer que devolve a linha em vez de gravá-la."""
+
+    def write(self, valor):
+        return valor
+
+
+def resposta_csv(nome_arquivo, cabecalho, linhas):
+    """
+    CSV (separado por ";", que o Excel em português abre em colunas) enviado
+    linha a linha: `linhas` deve ser um gerador, ex. sobre
+    `queryset.iterator(chunk_size=...)`, para a memória não crescer com o
+    período pedido.
+    """
+    escritor = csv.writer(_Eco(), delimiter=";")
+
+    def conteudo():
+        # BOM: o Excel reconhece o UTF-8 (acentos)
+        yield "\ufeff" + escritor.writerow(cabecalho)
+        for linha in linhas:
+            yield escritor.writerow(linha)
+
+    resposta = StreamingHttpResponse(conteudo(), content_type="text/csv; charset=utf-8")
+    resposta["Content-Disposition"] = f'attachment; filename="{nome_arquivo}"'
+    return resposta
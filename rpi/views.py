@@ -1,14 +1,14 @@
 # 1. Bibliotecas padrão do Python (Standard Library)
-import urllib.parse
-import urllib.request
-from collections import Counter, defaultdict
+from collections import defaultdict
+import logging
+import os
+import posixpath
+import zipfile
 from datetime import datetime, time, timedelta
-from pathlib import Path
-
+from itertools import chain
 
 # 2. Bibliotecas de terceiros (Third-party)
-from weasyprint import CSS, HTML
-from itertools import chain
+# O WeasyPrint (Pango/cairo) é carregado sob demanda em rpi/pdf.py
 
 # 3. Django Core e Utilitários
 from django.conf import settings
@@ -19,27 +19,41 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import PasswordChangeView
-from django.contrib.staticfiles.finders import find
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
 from django.core.mail import send_mail
 
 # 4. Django Banco de Dados e Modelos
 from django.db import IntegrityError, transaction
-from django.db.models import F, Prefetch, Q, Sum, Count, ProtectedError
+from django.db.models import F, Prefetch, Sum, Count, ProtectedError, Avg, Max
+from django.db.models import Case, CharField, Q, Value, When, Window
 
 # 5. Django HTTP e View Helpers
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
 from django.utils import timezone
-from .utils import calcular_janela_plantao
+from django.utils.crypto import constant_time_compare
+from . import assinaturas, estatisticas, midia, perfilamento, referencias, relatorio_atual, uploads
+from .pdf import gerar_pdf_relatorio_weasyprint
+from .metricas import registro as registro_metricas
+from .storage import ArmazenamentoDeduplicado
+from .utils import calcular_janela_plantao, paginar_por_cursor, resposta_csv
 from django.utils.dateparse import parse_date
+from django.utils.formats import date_format, localize
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag, urlencode
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_GET, require_POST
+from django.views.decorators.http import (
+    require_GET,
+    require_http_methods,
+    require_POST,
+    require_safe,
+)
 
 # 6. Django Generic Views e Formulários
-from django.forms import inlineformset_factory, modelformset_factory
+from django.forms import modelformset_factory
 from django.views.generic import (
     CreateView,
     DeleteView,
@@ -53,6 +67,7 @@ from .forms import (
     ApreensaoForm,
     ApreensaoFormSet,
     CadastroUsuarioForm,
+    EnvolvidoEdicaoFormSet,
     EnvolvidoForm,
     EnvolvidoFormSet,
     ImagemFormSet,
@@ -60,9 +75,14 @@ from .forms import (
     MaterialApreendidoTipoForm,
     NaturezaOcorrenciaForm,
     OcorrenciaForm,
+    OcorrenciaImagemForm,
+    OcorrenciaImagemFormSet,
+    UploadPorTokenForm,
 )
 from .models import (
     Apreensao,
+    AssinaturaImagem,
+    ConsultaLenta,
     Envolvido,
     Instrumento,
     MaterialApreendidoTipo,
@@ -70,10 +90,14 @@ from .models import (
     Ocorrencia,
     OcorrenciaImagem,
     RelatorioDiario,
-    Municipio,
-    OPM,
+    ResumoDiarioApreensoes,
+    ResumoDiarioEnvolvidos,
+    ResumoDiarioOcorrencias,
+    UploadTemporario,
 )
 
+logger = logging.getLogger("rpi.midia")
+
 
 # O @user_passes_test verifica se o usuário é staff (admin)
 # Apenas usuários staff podem ativar o cadastro de novos usuários
@@ -286,9 +310,7 @@ def reexportar_pdf(request, pk):
 @login_required
 def iniciar_dia(request):
     # BUSCA EXPLÍCITA: Verifica se já existe um relatório ABERTO para o usuário
-    relatorio_aberto = RelatorioDiario.objects.filter(
-        usuario_responsavel=request.user, finalizado=False
-    ).last()
+    relatorio_aberto = relatorio_atual.aberto(request, usuario=request.user)
 
     if request.method == "POST" and not relatorio_aberto:
         agora = timezone.now()
@@ -345,44 +367,112 @@ class OcorrenciaListView(LoginRequiredMixin, ListView):
     model = Ocorrencia
     template_name = "rpi/ocorrencia_list.html"
     context_object_name = "ocorrencias"
+    paginate_by = 50
+    # Mais recentes primeiro; o pk desempata (paginação por cursor)
+    ordem = ("-data_hora_fato", "-pk")
+
+    def get_relatorio(self):
+        """
+        Relatório exibido: o que está ABERTO agora (ver rpi/relatorio_atual.py)
+        ou, se nenhum estiver (plantão finalizado e nenhum novo iniciado), o
+        último finalizado, para não mostrar a tela vazia.
+        """
+        if not hasattr(self, "_relatorio"):
+            self._relatorio = (
+                relatorio_atual.aberto(self.request)
+                or RelatorioDiario.objects.filter(finalizado=True)
+                .order_by("-data_inicio")
+                .first()
+            )
+        return self._relatorio
 
     def get_queryset(self):
-        # 1. Busca APENAS o relatório que está ABERTO agora
-        relatorio_aberto = RelatorioDiario.objects.filter(finalizado=False).last()
-
-        # 2. Se houver um aberto, mostra apenas as ocorrências dele
-        if relatorio_aberto:
-            return relatorio_aberto.ocorrencias.all().order_by("-data_hora_fato")
-
-        # 3. Se NÃO houver nenhum aberto (plantão finalizado e nenhum novo iniciado),
-        # você pode optar por mostrar as do ÚLTIMO finalizado para não ver a tela vazia,
-        # OU retornar vazio para forçar o início de um novo dia.
-        ultimo_finalizado = (
-            RelatorioDiario.objects.filter(finalizado=True)
-            .order_by("-data_inicio")
-            .first()
+        relatorio = self.get_relatorio()
+        if relatorio is None:
+            return Ocorrencia.objects.none()
+
+        # Natureza, OPM e município na mesma consulta, só com as colunas
+        # que a tabela exibe
+        return (
+            Ocorrencia.objects.filter(relatorio_diario=relatorio)
+            .select_related("natureza", "opm", "municipio")
+            .only(
+                "pk",
+                "data_hora_fato",
+                "natureza__nome",
+                "natureza__tipo_impacto",
+                "opm__sigla",
+                "municipio__nome",
+            )
         )
 
-        if ultimo_finalizado:
-            return ultimo_finalizado.ocorrencias.all().order_by("-data_hora_fato")
-
-        return Ocorrencia.objects.none()
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get("cursor")
+        itens, self.proximo_cursor = paginar_por_cursor(
+            queryset, self.ordem, cursor, page_size
+        )
+        return None, None, itens, bool(cursor or self.proximo_cursor)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Busca o mesmo relatório para o template decidir se mostra os botões de Editar/Excluir
-        relatorio = (
-            RelatorioDiario.objects.filter(finalizado=False).last()
-            or RelatorioDiario.objects.filter(finalizado=True)
-            .order_by("-data_inicio")
-            .first()
-        )
-
-        context["relatorio_atual"] = relatorio
+        # O template decide pelos botões de Editar/Excluir
+        context["relatorio_atual"] = self.get_relatorio()
+        context["proximo_cursor"] = self.proximo_cursor
+        context["pagina_inicial"] = not self.request.GET.get("cursor")
         return context
 
 
-class OcorrenciaCreateView(LoginRequiredMixin, CreateView):
+class OcorrenciaFormsetsMixin:
+    """
+    Formsets (envolvidos, apreensões e fotos) das telas de cadastro e edição.
+
+    As classes vêm prontas de forms.py; aqui elas só são instanciadas, uma
+    vez por requisição (get_context_data e form_valid usam as mesmas).
+    """
+
+    envolvido_formset_class = EnvolvidoFormSet
+    apreensao_formset_class = ApreensaoFormSet
+    imagem_formset_class = OcorrenciaImagemFormSet
+
+    def get_context_data(self, **kwargs):
+        data = super().get_context_data(**kwargs)
+        # Redução das fotos no navegador antes do envio (ver settings)
+        data["config_imagens"] = {
+            "dimensao_maxima": settings.IMAGEM_DIMENSAO_MAXIMA,
+            "qualidade": settings.IMAGEM_QUALIDADE,
+            "tamanho_maximo": uploads.tamanho_maximo_imagem(),
+            "manter_original": settings.IMAGEM_ACEITAR_ORIGINAL,
+        }
+        return data
+
+    def get_formsets(self):
+        if not hasattr(self, "_formsets"):
+            if self.request.POST:
+                # CRÍTICO: Todos os formsets que possuem FileField devem receber self.request.FILES
+                args = (self.request.POST, self.request.FILES)
+            else:
+                args = ()
+            self._formsets = {
+                "envolvido_formset": self.envolvido_formset_class(
+                    *args,
+                    instance=self.object,
+                    prefix="envolvidos",
+                    form_kwargs={"usuario": self.request.user},
+                ),
+                "apreensao_formset": self.apreensao_formset_class(
+                    *args, instance=self.object, prefix="apreensoes"
+                ),
+                "imagem_formset": self.imagem_formset_class(
+                    *args,
+                    instance=self.object,
+                    prefix="imagens",
+                    form_kwargs={"usuario": self.request.user},
+                ),
+            }
+        return self._formsets
+
+
+class OcorrenciaCreateView(LoginRequiredMixin, OcorrenciaFormsetsMixin, CreateView):
     model = Ocorrencia
     form_class = OcorrenciaForm
     template_name = "rpi/ocorrencia_form.html"
@@ -390,7 +480,7 @@ class OcorrenciaCreateView(LoginRequiredMixin, CreateView):
 
     def dispatch(self, request, *args, **kwargs):
         """Verifica se há um relatório aberto antes de permitir a criação"""
-        self.relatorio_atual = RelatorioDiario.objects.filter(finalizado=False).last()
+        self.relatorio_atual = relatorio_atual.aberto(request)
         if not self.relatorio_atual:
             messages.warning(
                 request, "Não há relatório aberto. Inicie um novo plantão."
@@ -401,45 +491,16 @@ class OcorrenciaCreateView(LoginRequiredMixin, CreateView):
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
         data["relatorio"] = self.relatorio_atual
+        data["versao_referencias"] = referencias.versao()
 
-        # Fábricas de Formset
-        EnvolvidoFormSet = inlineformset_factory(
-            self.model, Envolvido, form=EnvolvidoForm, extra=1, can_delete=True
-        )
-        ApreensaoFormSet = inlineformset_factory(
-            self.model, Apreensao, form=ApreensaoForm, extra=1, can_delete=True
-        )
-        OcorrenciaImagemFormSet = inlineformset_factory(
-            self.model,
-            OcorrenciaImagem,
-            fields=("imagem", "legenda"),
-            extra=1,
-            can_delete=True,
-        )
-
-        if self.request.POST:
-            # CRÍTICO: Todos os formsets que possuem FileField devem receber self.request.FILES
-            data["envolvido_formset"] = EnvolvidoFormSet(
-                self.request.POST, self.request.FILES, prefix="envolvidos"
-            )
-            data["apreensao_formset"] = ApreensaoFormSet(
-                self.request.POST, prefix="apreensoes"
-            )
-            data["imagem_formset"] = OcorrenciaImagemFormSet(
-                self.request.POST, self.request.FILES, prefix="imagens"
-            )
-        else:
-            data["envolvido_formset"] = EnvolvidoFormSet(prefix="envolvidos")
-            data["apreensao_formset"] = ApreensaoFormSet(prefix="apreensoes")
-            data["imagem_formset"] = OcorrenciaImagemFormSet(prefix="imagens")
-
+        data.update(self.get_formsets())
         return data
 
     def form_valid(self, form):
-        context = self.get_context_data()
-        envolvido_formset = context["envolvido_formset"]
-        apreensao_formset = context["apreensao_formset"]
-        imagem_formset = context["imagem_formset"]
+        formsets = self.get_formsets()
+        envolvido_formset = formsets["envolvido_formset"]
+        apreensao_formset = formsets["apreensao_formset"]
+        imagem_formset = formsets["imagem_formset"]
 
         if (
             form.is_valid()
@@ -473,29 +534,24 @@ class OcorrenciaCreateView(LoginRequiredMixin, CreateView):
             return self.render_to_response(self.get_context_data(form=form))
 
 
-def ajax_carregar_municipios(request):
+async def ajax_carregar_municipios(request):
     opm_id = request.GET.get("opm_id")
 
     if not opm_id:
         return JsonResponse([], safe=False)
+    if not opm_id.isdigit():
+        return JsonResponse({"error": "OPM inválida"}, status=400)
 
     try:
-        # 1. Buscamos a OPM específica
-        opm = OPM.objects.get(id=opm_id)
-
-        # 2. Pegamos todos os municípios associados a essa OPM
-        # Como é ManyToMany, usamos .all() no campo municipios
-        municipios = opm.municipios.all().order_by("nome")
-
-        # 3. Formatamos para JSON
-        data = [{"id": m.id, "nome": m.nome} for m in municipios]
-        return JsonResponse(data, safe=False)
-
-    except OPM.DoesNotExist:
-        return JsonResponse({"error": "OPM não encontrada"}, status=404)
+        # Municípios da OPM, do cache de referências (ver rpi/referencias.py)
+        data = await referencias.amunicipios_da_opm(int(opm_id))
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
+    if data is None:
+        return JsonResponse({"error": "OPM não encontrada"}, status=404)
+    return JsonResponse(data, safe=False)
+
 
 class OcorrenciaDetailView(LoginRequiredMixin, DetailView):
     model = Ocorrencia
@@ -523,11 +579,12 @@ class OcorrenciaDetailView(LoginRequiredMixin, DetailView):
         return context
 
 
-class OcorrenciaUpdateView(LoginRequiredMixin, UpdateView):
+class OcorrenciaUpdateView(LoginRequiredMixin, OcorrenciaFormsetsMixin, UpdateView):
     model = Ocorrencia
     form_class = OcorrenciaForm
     template_name = "rpi/ocorrencia_form.html"
     success_url = reverse_lazy("ocorrencia_list")
+    envolvido_formset_class = EnvolvidoEdicaoFormSet
 
     def dispatch(self, request, *args, **kwargs):
         obj = self.get_object()
@@ -540,57 +597,17 @@ class OcorrenciaUpdateView(LoginRequiredMixin, UpdateView):
 
     def get_context_data(self, **kwargs):
         data = super().get_context_data(**kwargs)
+        data["versao_referencias"] = referencias.versao()
 
-        # Definição dos FormSets
-        EnvolvidoFormSet = inlineformset_factory(
-            self.model, Envolvido, form=EnvolvidoForm, extra=0, can_delete=True
-        )
-        ApreensaoFormSet = inlineformset_factory(
-            self.model, Apreensao, form=ApreensaoForm, extra=1, can_delete=True
-        )
-        OcorrenciaImagemFormSet = inlineformset_factory(
-            self.model,
-            OcorrenciaImagem,
-            fields=("imagem", "legenda"),
-            extra=1,
-            can_delete=True,
-        )
-
-        if self.request.POST:
-            data["envolvido_formset"] = EnvolvidoFormSet(
-                self.request.POST,
-                self.request.FILES,
-                instance=self.object,
-                prefix="envolvidos",
-            )
-            data["apreensao_formset"] = ApreensaoFormSet(
-                self.request.POST, instance=self.object, prefix="apreensoes"
-            )
-            data["imagem_formset"] = OcorrenciaImagemFormSet(
-                self.request.POST,
-                self.request.FILES,
-                instance=self.object,
-                prefix="imagens",
-            )
-        else:
-            data["envolvido_formset"] = EnvolvidoFormSet(
-                instance=self.object, prefix="envolvidos"
-            )
-            data["apreensao_formset"] = ApreensaoFormSet(
-                instance=self.object, prefix="apreensoes"
-            )
-            data["imagem_formset"] = OcorrenciaImagemFormSet(
-                instance=self.object, prefix="imagens"
-            )
-
+        data.update(self.get_formsets())
         return data
 
     def form_valid(self, form):
         # TUDO AQUI DENTRO PRECISA DE 4 ESPAÇOS DE RECUO
-        context = self.get_context_data()
-        envolvido_formset = context["envolvido_formset"]
-        apreensao_formset = context["apreensao_formset"]
-        imagem_formset = context["imagem_formset"]
+        formsets = self.get_formsets()
+        envolvido_formset = formsets["envolvido_formset"]
+        apreensao_formset = formsets["apreensao_formset"]
+        imagem_formset = formsets["imagem_formset"]
 
         # Validamos todos. Se UM falhar, nada é salvo.
         if (form.is_valid() and envolvido_formset.is_valid() and 
@@ -598,8 +615,12 @@ class OcorrenciaUpdateView(LoginRequiredMixin, UpdateView):
             
             try:
                 with transaction.atomic():
-                    self.object = form.save()
-                    
+                    # Só grava o que mudou: a ocorrência se o formulário
+                    # principal mudou; nos formsets, o save() já ignora as
+                    # linhas sem alteração (has_changed)
+                    if form.has_changed():
+                        self.object = form.save()
+
                     for fs in [envolvido_formset, apreensao_formset, imagem_formset]:
                         fs.instance = self.object
                         fs.save()
@@ -617,14 +638,7 @@ class OcorrenciaUpdateView(LoginRequiredMixin, UpdateView):
             print("Imagens:", imagem_formset.errors)
             
             # Retorna para a página mostrando os erros
-            return self.render_to_response(
-                self.get_context_data(
-                    form=form,
-                    envolvido_formset=envolvido_formset,
-                    apreensao_formset=apreensao_formset,
-                    imagem_formset=imagem_formset
-                )
-            )
+            return self.render_to_response(self.get_context_data(form=form))
 
 class OcorrenciaDeleteView(LoginRequiredMixin, DeleteView):
     """Permite excluir uma ocorrência."""
@@ -650,6 +664,306 @@ class OcorrenciaDeleteView(LoginRequiredMixin, DeleteView):
         return super().form_valid(form)
 
 
+# --- EDIÇÃO ITEM A ITEM (envolvidos, apreensões e imagens) ---
+# O editor grava um item por vez, enviando só os campos alterados, em vez de
+# reenviar e revalidar a ocorrência inteira com todos os formsets.
+
+# nome na URL -> (modelo, formulário)
+ITENS_OCORRENCIA = {
+    "envolvidos": (Envolvido, EnvolvidoForm),
+    "apreensoes": (Apreensao, ApreensaoForm),
+    "imagens": (OcorrenciaImagem, OcorrenciaImagemForm),
+}
+
+
+def _resposta_item(item, status=200):
+    return JsonResponse(
+        {"success": True, "id": item.pk, "versao": item.versao, "texto": str(item)},
+        status=status,
+    )
+
+
+def _travar_item(request, ocorrencia_pk, tipo, pk):
+    """
+    Trava (select_for_update) a ocorrência e, se houver, o item. Devolve
+    (item, erro): erro é a JsonResponse a devolver quando o relatório está
+    finalizado ou quando a versão enviada não é mais a atual.
+    Deve rodar dentro de transaction.atomic().
+    """
+    modelo = ITENS_OCORRENCIA[tipo][0]
+    ocorrencia = get_object_or_404(
+        Ocorrencia.objects.select_for_update().select_related("relatorio_diario"),
+        pk=ocorrencia_pk,
+    )
+    if ocorrencia.relatorio_diario.finalizado:
+        return None, JsonResponse(
+            {
+                "success": False,
+                "error": "Este relatório já está finalizado e não pode ser editado.",
+            },
+            status=403,
+        )
+
+    if pk is None:
+        return modelo(ocorrencia=ocorrencia), None
+
+    item = get_object_or_404(
+        modelo.objects.select_for_update(), pk=pk, ocorrencia=ocorrencia
+    )
+    versao = request.POST.get("versao", "")
+    if not versao.isdigit():
+        return None, JsonResponse(
+            {"success": False, "error": "Versão do item não informada."}, status=400
+        )
+    if int(versao) != item.versao:
+        # Outro usuário gravou o item depois que este editor o carregou
+        return None, JsonResponse(
+            {
+                "success": False,
+                "error": "O item foi alterado por outro usuário. Recarregue e tente novamente.",
+                "versao": item.versao,
+                "texto": str(item),
+            },
+            status=409,
+        )
+    return item, None
+
+
+@login_required
+@require_POST
+def salvar_item_ocorrencia(request, ocorrencia_pk, tipo, pk=None):
+    """
+    Cria (sem pk) ou altera (com pk e versao) um envolvido, apreensão ou
+    imagem da ocorrência. Na alteração basta enviar os campos alterados: os
+    demais são completados com os valores atuais do item.
+    """
+    if tipo not in ITENS_OCORRENCIA:
+        raise Http404("Tipo de item inexistente")
+    form_class = ITENS_OCORRENCIA[tipo][1]
+
+    with transaction.atomic():
+        item, erro = _travar_item(request, ocorrencia_pk, tipo, pk)
+        if erro:
+            return erro
+
+        dados = request.POST
+        if pk is not None:
+            # 1. Valores atuais + campos enviados
+            atual = form_class(instance=item)
+            dados = {nome: atual[nome].value() for nome in atual.fields}
+            dados.update(request.POST.dict())
+
+        extras = {}
+        if issubclass(form_class, UploadPorTokenForm):
+            # Só aceita upload_token de envios do próprio usuário
+            extras["usuario"] = request.user
+        form = form_class(dados, request.FILES, instance=item, **extras)
+        if not form.is_valid():
+            return JsonResponse({"success": False, "errors": form.errors}, status=400)
+
+        # 2. Nada mudou: não grava (nem gera histórico)
+        if pk is not None and not form.has_changed():
+            return _resposta_item(item)
+
+        item = form.save()
+
+    return _resposta_item(item, status=201 if pk is None else 200)
+
+
+@login_required
+@require_POST
+def excluir_item_ocorrencia(request, ocorrencia_pk, tipo, pk):
+    if tipo not in ITENS_OCORRENCIA:
+        raise Http404("Tipo de item inexistente")
+
+    with transaction.atomic():
+        item, erro = _travar_item(request, ocorrencia_pk, tipo, pk)
+        if erro:
+            return erro
+        item.delete()
+
+    return JsonResponse({"success": True, "id": pk})
+
+
+# --- ENVIO DE IMAGENS EM PARTES (ver rpi/uploads.py) ---
+
+
+def _estado_upload(upload, status=200):
+    return JsonResponse(
+        {
+            "token": str(upload.token),
+            "recebido": upload.recebido,
+            "tamanho": upload.tamanho,
+            "concluido": upload.concluido,
+            "tamanho_parte": settings.UPLOAD_TAMANHO_PARTE,
+        },
+        status=status,
+    )
+
+
+@login_required
+@require_POST
+def iniciar_upload(request):
+    try:
+        upload = uploads.iniciar(
+            request.user,
+            request.POST.get("nome", "").strip(),
+            request.POST.get("tamanho", ""),
+            request.POST.get("sha256", ""),
+        )
+    except uploads.UploadInvalido as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return _estado_upload(upload, status=201)
+
+
+@login_required
+@require_http_methods(["GET", "POST"])
+def enviar_parte_upload(request, token):
+    """GET: quanto já foi recebido (para retomar). POST: grava uma parte."""
+    if request.method == "GET":
+        upload = get_object_or_404(UploadTemporario, token=token, usuario=request.user)
+        return _estado_upload(upload)
+
+    dados = request.body
+    with transaction.atomic():
+        upload = get_object_or_404(
+            UploadTemporario.objects.select_for_update(),
+            token=token,
+            usuario=request.user,
+        )
+        try:
+            inicio, _ = uploads.ler_content_range(
+                request.headers.get("Content-Range"), len(dados)
+            )
+            uploads.gravar_parte(
+                upload, inicio, dados, request.headers.get("X-Parte-Sha256")
+            )
+        except uploads.UploadInvalido as e:
+            # O navegador usa "recebido" para continuar do ponto certo
+            return JsonResponse(
+                {"error": str(e), "recebido": upload.recebido},
+                status=409 if upload.pk else 400,
+            )
+    return _estado_upload(upload)
+
+
+# --- MÍDIA (ver rpi/midia.py) ---
+
+
+@login_required
+@require_safe
+def servir_midia(request, caminho):
+    """
+    Arquivo do MEDIA_ROOT (ou da camada fria) para usuários logados. Os
+    blobs da deduplicação não são acessíveis pelo hash.
+    """
+    nome = posixpath.normpath(caminho).lstrip("/")
+    if nome.split("/")[0] in ("..", ArmazenamentoDeduplicado.pasta_blobs):
+        raise Http404("Arquivo não encontrado")
+    try:
+        local = default_storage.path(nome)
+    except (SuspiciousFileOperation, OSError, KeyError):
+        raise Http404("Arquivo não encontrado")
+    except zipfile.BadZipFile:
+        # Pacote da camada fria danificado: some só este arquivo, não a página
+        logger.error("Pacote de mídia arquivada danificado ao ler %s", nome, exc_info=True)
+        raise Http404("Arquivo não encontrado")
+    if not os.path.isfile(local):
+        raise Http404("Arquivo não encontrado")
+    return midia.resposta_arquivo(request, local)
+
+
+# --- FOTOS REPETIDAS ENTRE OCORRÊNCIAS (ver rpi/assinaturas.py) ---
+
+
+@login_required
+@require_GET
+def imagens_similares(request, pk):
+    """
+    Outras ocorrências com imagens ou fotos de envolvidos visualmente iguais
+    às desta (hash perceptual), mais parecidas primeiro. Parâmetro opcional:
+    distancia (bits de diferença, 0 a 7; padrão IMAGEM_DISTANCIA_SIMILAR).
+    """
+    ocorrencia = get_object_or_404(Ocorrencia, pk=pk)
+    distancia = request.GET.get("distancia", "")
+    distancia = int(distancia) if distancia.isdigit() else None
+
+    # 1. Assinaturas de outras ocorrências próximas das desta (cada uma
+    # com a menor distância encontrada)
+    outras = AssinaturaImagem.objects.exclude(ocorrencia=ocorrencia)
+    encontradas = {}
+    for propria in ocorrencia.assinaturas_imagens.all():
+        valor = assinaturas.do_banco(propria.dhash)
+        for assinatura, bits in assinaturas.similares(valor, distancia, outras):
+            anterior = encontradas.get(assinatura.pk)
+            if anterior is None or bits < anterior[1]:
+                encontradas[assinatura.pk] = (assinatura, bits, propria)
+
+    # 2. Agrupa por ocorrência
+    por_ocorrencia = defaultdict(list)
+    for assinatura, bits, propria in encontradas.values():
+        por_ocorrencia[assinatura.ocorrencia_id].append(
+            {
+                "origem": "imagem" if assinatura.imagem_id else "envolvido",
+                "url": default_storage.url(assinatura.arquivo),
+                "semelhante_a": default_storage.url(propria.arquivo),
+                "distancia": bits,
+            }
+        )
+
+    # 3. Dados das ocorrências numa consulta só
+    ocorrencias = Ocorrencia.objects.filter(pk__in=por_ocorrencia).select_related(
+        "natureza", "opm"
+    )
+    resultado = []
+    for outra in ocorrencias:
+        imagens = sorted(por_ocorrencia[outra.pk], key=lambda i: i["distancia"])
+        resultado.append(
+            {
+                "id": outra.pk,
+                "descricao": str(outra),
+                "opm": outra.opm.sigla,
+                "data_hora_fato": outra.data_hora_fato,
+                "url": reverse("ocorrencia_detail", args=[outra.pk]),
+                "distancia": imagens[0]["distancia"],
+                "imagens": imagens,
+            }
+        )
+    resultado.sort(key=lambda o: (o["distancia"], -o["id"]))
+    return JsonResponse({"ocorrencia": ocorrencia.pk, "similares": resultado})
+
+
+# --- LISTAGENS POR PERÍODO (prisões, materiais apreendidos, CVLI) ---
+# Um período longo (ex.: o ano) pode ter milhares de linhas: a tela mostra uma
+# página por vez (cursor sobre data do fato + id, ver utils.paginar_por_cursor)
+# e o período completo sai em CSV, enviado linha a linha (?formato=csv).
+
+LINHAS_POR_PAGINA = 100
+ORDEM_POR_DATA_DO_FATO = ("-ocorrencia__data_hora_fato", "-pk")
+
+
+def _data_do_fato(ocorrencia):
+    if not ocorrencia.data_hora_fato:
+        return ""
+    return date_format(timezone.localtime(ocorrencia.data_hora_fato), "d/m/Y H:i")
+
+
+def _pagina_do_periodo(request, queryset, data_inicio, data_fim):
+    """Itens da página pedida e o contexto da navegação (paginacao_cursor.html)."""
+    cursor = request.GET.get("cursor")
+    itens, proximo = paginar_por_cursor(
+        queryset, ORDEM_POR_DATA_DO_FATO, cursor, LINHAS_POR_PAGINA
+    )
+    parametros = urlencode({"data_inicio": data_inicio, "data_fim": data_fim})
+    return itens, {
+        "proximo_cursor": proximo,
+        "pagina_inicial": not cursor,
+        "parametros": parametros,
+        "url_csv": f"?{parametros}&formato=csv",
+    }
+
+
+@login_required
 def listar_materiais_apreendidos(request):
     # 1. Chama a função utilitária para resolver as datas
     plantao = calcular_janela_plantao(
@@ -661,21 +975,52 @@ def listar_materiais_apreendidos(request):
         ocorrencia__data_hora_fato__range=(plantao["dt_inicio"], plantao["dt_fim"])
     )
 
-    # 3. Resumo de totais
+    # 3. Período completo em CSV, sem carregar tudo na memória
+    if request.GET.get("formato") == "csv":
+        return resposta_csv(
+            f"materiais_apreendidos_{plantao['data_inicio_str']}_{plantao['data_fim_str']}.csv",
+            ["Data do Fato", "Quantidade", "Unidade", "Material", "Descrição", "Ocorrência"],
+            (
+                [
+                    _data_do_fato(item.ocorrencia),
+                    localize(item.quantidade),
+                    item.unidade_medida or "",
+                    item.material_tipo.nome,
+                    item.descricao_adicional or "",
+                    item.ocorrencia_id,
+                ]
+                for item in materiais.order_by(
+                    "-ocorrencia__data_hora_fato", "-pk"
+                ).iterator(chunk_size=500)
+            ),
+        )
+
+    # 4. Resumo de totais (das estatísticas consolidadas por dia de plantão)
     resumo_totais = (
-        materiais.values("material_tipo__nome", "unidade_medida")
+        ResumoDiarioApreensoes.objects.filter(
+            dia__range=estatisticas.dias_do_periodo(
+                plantao["data_inicio_str"], plantao["data_fim_str"]
+            )
+        )
+        .values("material_tipo__nome", "unidade_medida")
         .annotate(total_quantidade=Sum("quantidade"))
         .order_by("material_tipo__nome")
     )
 
-    # 4. Contexto organizado
+    # 5. Uma página da lista
+    itens, paginacao = _pagina_do_periodo(
+        request, materiais, plantao["data_inicio_str"], plantao["data_fim_str"]
+    )
+
+    # 6. Contexto organizado
     context = {
-        "materiais": materiais.order_by("-ocorrencia__data_hora_fato"),
+        "materiais": itens,
         "resumo_totais": resumo_totais,
         "data_inicio_full": plantao["dt_inicio"],  # Usado na legenda HTML
         "data_fim_full": plantao["dt_fim"],  # Usado na legenda HTML
         "data_inicio": plantao["data_inicio_str"],  # Usado no valor do input date
         "data_fim": plantao["data_fim_str"],  # Usado no valor do input date
+        **paginacao,
     }
 
     return render(request, "rpi/lista_materiais_apreendidos.html", context)
@@ -691,6 +1036,7 @@ def deletar_materiais_apreendidos(request, apreensao_id):
     return redirect("listar_materiais_apreendidos")
 
 
+@login_required
 def listar_prisoes(request):
     # 1. Resolve a lógica de datas em uma linha
     plantao = calcular_janela_plantao(
@@ -703,59 +1049,113 @@ def listar_prisoes(request):
         ocorrencia__data_hora_fato__range=(plantao["dt_inicio"], plantao["dt_fim"]),
     ).select_related("ocorrencia")
 
-    # 3. Resumo totalizado
+    # 3. Período completo em CSV, sem carregar tudo na memória
+    if request.GET.get("formato") == "csv":
+        return resposta_csv(
+            f"prisoes_{plantao['data_inicio_str']}_{plantao['data_fim_str']}.csv",
+            ["Data do Fato", "Nome", "Idade", "Documento", "Número", "Tipo", "Antecedentes", "Ocorrência"],
+            (
+                [
+                    _data_do_fato(item.ocorrencia),
+                    item.nome,
+                    item.idade or "",
+                    item.get_tipo_documento_display() or "",
+                    item.nr_documento or "",
+                    item.get_tipo_participante_display(),
+                    item.get_antecedentes_display(),
+                    item.ocorrencia_id,
+                ]
+                for item in envolvidos.order_by(
+                    "-ocorrencia__data_hora_fato", "-pk"
+                ).iterator(chunk_size=500)
+            ),
+        )
+
+    # 4. Resumo totalizado (das estatísticas consolidadas por dia de plantão)
     resumo_totais = (
-        envolvidos.values("tipo_participante")
-        .annotate(total=Count("id"))  # annotate faz a contagem
+        ResumoDiarioEnvolvidos.objects.filter(
+            tipo_participante__in=["P", "S", "M", "A"],
+            dia__range=estatisticas.dias_do_periodo(
+                plantao["data_inicio_str"], plantao["data_fim_str"]
+            ),
+        )
+        .values("tipo_participante")
+        .annotate(total=Sum("total"))
         .order_by("tipo_participante")
     )
 
+    # 5. Uma página da lista
+    itens, paginacao = _pagina_do_periodo(
+        request, envolvidos, plantao["data_inicio_str"], plantao["data_fim_str"]
+    )
+
     context = {
-        "envolvidos": envolvidos.order_by("-ocorrencia__data_hora_fato"),
+        "envolvidos": itens,
         "resumo_totais": resumo_totais,
         "data_inicio_full": plantao["dt_inicio"],
         "data_fim_full": plantao["dt_fim"],
         "data_inicio": plantao["data_inicio_str"],
         "data_fim": plantao["data_fim_str"],
+        **paginacao,
     }
     return render(request, "rpi/lista_prisoes.html", context)
 
 
+def _rotulo_da_escolha(campo):
+    """Texto da escolha (como get_<campo>_display) calculado no banco."""
+    escolhas = Envolvido._meta.get_field(campo).choices
+    return Case(
+        *[When(**{campo: valor}, then=Value(rotulo)) for valor, rotulo in escolhas],
+        default=F(campo),
+        output_field=CharField(),
+    )
+
+
+@login_required
 def listar_prisoes_por_opm(request):
     # 1. Resolve a lógica de datas
     plantao = calcular_janela_plantao(
         request.GET.get("data_inicio"), request.GET.get("data_fim")
     )
 
-    # 2. Query principal usando o range do plantão
-    envolvidos = Envolvido.objects.filter(
-        tipo_participante__in=["P", "S", "M", "A"],
-        ocorrencia__data_hora_fato__range=(plantao["dt_inicio"], plantao["dt_fim"]),
-    ).select_related("ocorrencia", "ocorrencia__opm")
-
-    # 3. Lógica de Totais por OPM
-    totais_query = envolvidos.values(
-        "ocorrencia__opm__nome", "tipo_participante"
-    ).annotate(total=Count("id"))
-
-    totais_opm = defaultdict(lambda: {"P": 0, "S": 0, "A": 0, "M": 0, "total": 0})
-    for row in totais_query:
-        opm_nome = row["ocorrencia__opm__nome"] or "OPM não informada"
-        tipo = row["tipo_participante"]
-        totais_opm[opm_nome][tipo] = row["total"]
-        totais_opm[opm_nome]["total"] += row["total"]
-
-    # 4. Agrupamento para o Template
-    envolvidos_por_opm = defaultdict(lambda: {"lista": [], "resumo": {}})
-    for envolvido in envolvidos.order_by(
-        "ocorrencia__opm__nome", "-ocorrencia__data_hora_fato"
-    ):
-        opm_nome = getattr(envolvido.ocorrencia.opm, "nome", "OPM não informada")
-        envolvidos_por_opm[opm_nome]["lista"].append(envolvido)
-        envolvidos_por_opm[opm_nome]["resumo"] = totais_opm[opm_nome]
+    # 2. Uma só consulta, já na ordem dos grupos: cada linha traz os totais da
+    # sua OPM (funções de janela particionadas pela OPM) e só as colunas
+    # exibidas, sem montar instâncias de Envolvido
+    por_opm = {"partition_by": [F("ocorrencia__opm")]}
+    linhas = (
+        Envolvido.objects.filter(
+            tipo_participante__in=["P", "S", "M", "A"],
+            ocorrencia__data_hora_fato__range=(plantao["dt_inicio"], plantao["dt_fim"]),
+        )
+        .annotate(
+            opm=F("ocorrencia__opm__nome"),
+            data_hora_fato=F("ocorrencia__data_hora_fato"),
+            tipo_documento_rotulo=_rotulo_da_escolha("tipo_documento"),
+            tipo_participante_rotulo=_rotulo_da_escolha("tipo_participante"),
+            antecedentes_rotulo=_rotulo_da_escolha("antecedentes"),
+            total_opm=Window(Count("pk"), **por_opm),
+            **{
+                f"total_{tipo}": Window(Count("pk", filter=Q(tipo_participante=tipo)), **por_opm)
+                for tipo in ("P", "S", "A", "M")
+            },
+        )
+        .order_by(
+            "ocorrencia__opm__nome",
+            "ocorrencia__opm",
+            "-ocorrencia__data_hora_fato",
+            "-pk",
+        )
+        .values(
+            "ocorrencia_id", "ocorrencia__opm", "opm", "data_hora_fato", "nome", "idade", "nr_documento",
+            "tipo_participante", "tipo_documento_rotulo", "tipo_participante_rotulo",
+            "antecedentes_rotulo", "total_opm", "total_P", "total_S", "total_A", "total_M",
+        )
+    )
 
+    # 3. O template lê as linhas uma vez e abre o cabeçalho de cada OPM com
+    # {% ifchanged %}
     context = {
-        "envolvidos_por_opm": dict(envolvidos_por_opm),
+        "linhas": linhas.iterator(chunk_size=1000),
         "data_inicio_full": plantao["dt_inicio"],
         "data_fim_full": plantao["dt_fim"],
         "data_inicio": plantao["data_inicio_str"],
@@ -764,155 +1164,6 @@ def listar_prisoes_por_opm(request):
     return render(request, "rpi/lista_prisoes_por_opm.html", context)
 
 
-def gerar_pdf_relatorio_weasyprint(relatorio_diario, request):
-    """
-    Gera o PDF do relatório diário utilizando WeasyPrint com suporte a fotos de envolvidos
-    """
-
-    def formatar_data_militar(data):
-        if not data:
-            return ""
-        meses = {
-            1: "JAN",
-            2: "FEV",
-            3: "MAR",
-            4: "ABR",
-            5: "MAI",
-            6: "JUN",
-            7: "JUL",
-            8: "AGO",
-            9: "SET",
-            10: "OUT",
-            11: "NOV",
-            12: "DEZ",
-        }
-        return f"{data.strftime('%d%H%M')}{meses[data.month]}{data.strftime('%y')}"
-
-    CRIMES_CVLI = [
-        "HOMICÍDIO DECORRENTE DE OPOSIÇÃO A INTERVENÇÃO POLICIAL",
-        "HOMICÍDIO DOLOSO",
-        "HOMICÍDIO DOLOSO NA DIREÇÃO DE VEÍCULO AUTOMOTOR",
-        "INDUZIMENTO, INSTIGAÇÃO OU AUXÍLIO AO SUICÍDIO OU A AUTOMUTILAÇÃO",
-        "FEMINICÍDIO",
-        "ABORTO",
-        "LESÃO CORPORAL SEGUIDA DE MORTE",
-        "ROUBO A PEDESTRE COM MORTE",
-        "ROUBO A RESIDÊNCIA COM MORTE",
-        "ROUBO A COMÉRCIO COM MORTE",
-        "ROUBO A MOTORISTA COM MORTE",
-        "ROUBO DE ARMA COM MORTE",
-        "ROUBO DE VEÍCULO COM MORTE",
-        "ROUBO A ESTABELECIMENTO BANCÁRIO COM MORTE",
-        "ROUBO COM MORTE",
-    ]
-
-    ocorrencias_qs = (
-        relatorio_diario.ocorrencias.select_related("natureza", "opm", "municipio")
-        .prefetch_related("envolvidos", "apreensoes", "imagens")
-        .order_by("data_hora_fato")
-    )
-
-    ocorrencias_normais = []
-    ocorrencias_cvli = []
-
-    for ocorrencia in ocorrencias_qs:
-        natureza_nome = ocorrencia.natureza.nome.upper()
-
-        # --- PROCESSAMENTO DE IMAGENS DA OCORRÊNCIA ---
-        imagens_list = []
-        for img in ocorrencia.imagens.all():
-            if img.imagem and hasattr(img.imagem, "path"):
-                try:
-                    imagens_list.append(
-                        {
-                            "uri": Path(img.imagem.path).as_uri(),
-                            "legenda": img.legenda,
-                        }
-                    )
-                except:
-                    continue
-
-        # --- NOVO: PROCESSAMENTO DE FOTOS DOS ENVOLVIDOS ---
-        # Criamos uma lista de envolvidos com a URI da foto já pronta para o WeasyPrint
-        envolvidos_processados = []
-        for env in ocorrencia.envolvidos.all():
-            foto_uri = None
-            if env.foto and hasattr(env.foto, "path"):
-                try:
-                    foto_uri = Path(env.foto.path).as_uri()
-                except:
-                    foto_uri = None
-
-            envolvidos_processados.append({"obj": env, "foto_uri": foto_uri})
-
-        item = {
-            "ocorrencia": ocorrencia,
-            "sigla_opm_limpa": (
-                ocorrencia.opm.sigla.split(" - ")[0] if ocorrencia.opm else ""
-            ),
-            "imagens": imagens_list,
-            "envolvidos_com_foto": envolvidos_processados,  # Passamos a nova lista processada
-        }
-
-        if natureza_nome in CRIMES_CVLI:
-            ocorrencias_cvli.append(item)
-        else:
-            ocorrencias_normais.append(item)
-
-    # Numeração e Letras
-    numero_cvli = len(ocorrencias_normais) + 1
-    letras = "abcdefghijklmnopqrstuvwxyz"
-    for idx, item in enumerate(ocorrencias_cvli):
-        item["letra"] = letras[idx]
-
-    # Tabela Resumo CVLI
-    tabela_cvli = []
-    contador_opm = Counter()
-    for item in ocorrencias_cvli:
-        oc = item["ocorrencia"]
-        sigla = item["sigla_opm_limpa"]
-        n_vitimas = oc.envolvidos.filter(tipo_participante="V").count() or 1
-        contador_opm[sigla] += n_vitimas
-        tabela_cvli.append(
-            {
-                "municipio": oc.municipio.nome if oc.municipio else "",
-                "opm": sigla,
-                "vitimas": n_vitimas,
-                "instrumento": (
-                    oc.instrumento.nome if oc.instrumento else "NÃO INFORMADO"
-                ),
-            }
-        )
-
-    total_cvli = sum(contador_opm.values())
-    cvli_resumo_opm = ", ".join(f"{qtd} - {opm}" for opm, qtd in contador_opm.items())
-
-    # Logo e CSS
-    logo_path = find("rpi/img/logo.png")
-    logo_uri = Path(logo_path).as_uri() if logo_path else ""
-    css_path = find("rpi/css/rpi.css")
-    css_uri = Path(css_path).as_uri() if css_path else ""
-
-    context = {
-        "relatorio": relatorio_diario,
-        "ocorrencias": ocorrencias_normais,
-        "ocorrencias_cvli": ocorrencias_cvli,
-        "numero_cvli": numero_cvli,
-        "tabela_cvli": tabela_cvli,
-        "total_cvli": total_cvli,
-        "cvli_resumo_opm": cvli_resumo_opm,
-        "logo_uri": logo_uri,
-        "css_uri": css_uri,
-    }
-
-    html_string = render_to_string("rpi/relatorio_pdf.html", context)
-    pdf = HTML(string=html_string, base_url=request.build_absolute_uri("/")).write_pdf()
-
-    response = HttpResponse(pdf, content_type="application/pdf")
-    response["Content-Disposition"] = "inline; filename=relatorio.pdf"
-    return response
-
-
 class RelatorioListView(LoginRequiredMixin, ListView):
     model = RelatorioDiario
     template_name = "rpi/relatorio_list.html"
@@ -1021,11 +1272,11 @@ class InstrumentoDetailView(LoginRequiredMixin, DetailView):
     context_object_name = "instrumento"
 
 
-def salvar_instrumento_ajax(request):
+async def salvar_instrumento_ajax(request):
     if request.method == "POST":
         nome = request.POST.get("nome")
         if nome:
-            novo_inst = Instrumento.objects.create(nome=nome)
+            novo_inst = await Instrumento.objects.acreate(nome=nome)
             return JsonResponse(
                 {"id": novo_inst.id, "nome": novo_inst.nome}, status=200
             )
@@ -1090,13 +1341,13 @@ class MaterialApreendidoTipoUpdateView(LoginRequiredMixin, UpdateView):
 
 @login_required
 @require_POST
-def salvar_material_apreendido_ajax(request):
+async def salvar_material_apreendido_ajax(request):
     nome = request.POST.get("nome", "").strip()
 
     if not nome:
         return JsonResponse({"error": "Nome não informado"}, status=400)
 
-    obj, created = MaterialApreendidoTipo.objects.get_or_create(
+    obj, created = await MaterialApreendidoTipo.objects.aget_or_create(
         nome__iexact=nome, defaults={"nome": nome}
     )
 
@@ -1106,41 +1357,43 @@ def salvar_material_apreendido_ajax(request):
 
 
 @require_GET
-def buscar_naturezas_ajax(request):
+async def buscar_naturezas_ajax(request):
     # 1. Obter o termo de busca (query)
     query = request.GET.get("q", "").strip()
 
-    # 2. Configura a filtragem
-    if query:
-        # Usa o Q object para realizar uma busca OR (nome OU tags_busca)
-        # icontains: busca o termo em qualquer parte da string, sem distinção de caixa
-        filtros = Q(nome__icontains=query) | Q(tags_busca__icontains=query)
-        naturezas = NaturezaOcorrencia.objects.filter(filtros).order_by("nome")[
-            :30
-        ]  # Limita a 30 resultados
-    else:
-        # Se não houver termo, mostra as 15 naturezas mais comuns (ou as primeiras)
-        # Otimização: Ajuste este filtro para mostrar crimes frequentes
-        naturezas = NaturezaOcorrencia.objects.all().order_by("nome")[:15]
-
-    # 3. Formatar os resultados para o Select2
-    results = []
-    for nat in naturezas:
-        results.append(
-            {
-                "id": nat.pk,  # Select2 usa 'id' para o valor
-                "text": nat.nome,  # Select2 usa 'text' para o que é exibido
-            }
-        )
+    # 2. Busca no cache de referências (ver rpi/referencias.py), sem consulta
+    # ao banco: termo no nome OU nas tags de busca, sem distinção de caixa
+    results, mais = await referencias.abuscar("naturezas", query)
 
-    # 4. Retorna a resposta JSON
-    return JsonResponse({"results": results, "pagination": {"more": False}})
+    # 3. Retorna no formato do Select2 ('id' é o valor, 'text' o exibido)
+    return JsonResponse({"results": results, "pagination": {"more": mais}})
+
+
+@login_required
+@require_GET
+async def buscar_catalogo(request, catalogo):
+    """
+    Busca paginada (formato do Select2) dos selects sob demanda
+    (rpi/campos.py). Parâmetros: q (termo), page e, para municípios, opm.
+    """
+    if catalogo not in referencias.CATALOGOS:
+        raise Http404("Catálogo inexistente")
+
+    pagina = request.GET.get("page", "1")
+    opm = request.GET.get("opm", "")
+    results, mais = await referencias.abuscar(
+        catalogo,
+        request.GET.get("q", "").strip(),
+        pagina=int(pagina) if pagina.isdigit() and int(pagina) > 0 else 1,
+        opm=int(opm) if opm.isdigit() else None,
+    )
+    return JsonResponse({"results": results, "pagination": {"more": mais}})
 
 
 @csrf_exempt  # OBS: Mantenha este decorador apenas se o token CSRF estiver falhando no JS.
 # A melhor prática é usá-lo no template com {% csrf_token %}.
 @require_POST
-def cadastrar_natureza_rapida(request):
+async def cadastrar_natureza_rapida(request):
     # Pega os dados diretamente do POST usando os nomes que estão no seu HTML
     nome = request.POST.get('nome')
     tipo_impacto = request.POST.get('tipo_impacto')
@@ -1148,7 +1401,7 @@ def cadastrar_natureza_rapida(request):
     if nome and tipo_impacto:
         try:
             # Cria o objeto diretamente no banco
-            nova_natureza = NaturezaOcorrencia.objects.create(
+            nova_natureza = await NaturezaOcorrencia.objects.acreate(
                 nome=nome,
                 tipo_impacto=tipo_impacto
             )
@@ -1162,6 +1415,36 @@ def cadastrar_natureza_rapida(request):
     
     return JsonResponse({"success": False, "errors": "Campos obrigatórios faltando."}, status=400)
 
+
+@login_required
+@require_GET
+def referencias_json(request):
+    """
+    Pacote com OPMs e municípios, naturezas, instrumentos e materiais, baixado
+    uma vez pelo formulário de ocorrência (ocorrencia_form.js), que passa a
+    filtrar as listas no navegador.
+
+    Com ?v=<versão atual> a resposta é imutável (a URL muda quando os dados
+    mudam); sem ela o navegador revalida pelo ETag e recebe 304.
+    """
+    # Uma leitura só: ETag e conteúdo sempre da mesma versão, mesmo que a
+    # invalidação aconteça no meio da requisição
+    versao = referencias.versao()
+    etag = quote_etag(versao)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(
+            referencias.pacote_json(versao), content_type="application/json"
+        )
+    response["ETag"] = etag
+    # Também no 304: a revalidação não pode trocar a política de cache
+    if request.GET.get("v") == versao:
+        response["Cache-Control"] = "private, max-age=31536000, immutable"
+    else:
+        response["Cache-Control"] = "private, no-cache"
+    return response
+
+
 @user_passes_test(lambda u: u.is_superuser)
 def lista_auditoria_objeto(request, pk):
     objeto = get_object_or_404(Ocorrencia, pk=pk)
@@ -1333,7 +1616,7 @@ def auditoria_geral(request):
     return render(request, "auditoria/lista_geral.html", {"historico": historico})
 
 
-
+@login_required
 def lista_cvli(request):
     # 1. Pegar datas do filtro ou usar hoje como padrão
     data_inicio_str = request.GET.get('data_inicio')
@@ -1368,14 +1651,212 @@ def lista_cvli(request):
         'ocorrencia__natureza', 
         'ocorrencia__municipio', 
         'ocorrencia__instrumento'
-    ).order_by('-ocorrencia__data_hora_fato')
+    )
+    data_inicio = data_inicio_dt.strftime('%Y-%m-%d')
+    data_fim = data_fim_dt.strftime('%Y-%m-%d')
+
+    # 5. Período completo em CSV, sem carregar tudo na memória
+    if request.GET.get('formato') == 'csv':
+        return resposta_csv(
+            f'cvli_{data_inicio}_{data_fim}.csv',
+            ['Data do Fato', 'Vítima', 'Documento', 'Número', 'Idade', 'Município', 'Bairro', 'Natureza', 'Meio Empregado', 'Ocorrência'],
+            (
+                [
+                    _data_do_fato(v.ocorrencia),
+                    v.nome,
+                    v.get_tipo_documento_display() or '',
+                    v.nr_documento or '',
+                    v.idade or '',
+                    v.ocorrencia.municipio.nome,
+                    v.ocorrencia.bairro or '',
+                    v.ocorrencia.natureza.nome,
+                    v.ocorrencia.instrumento.nome if v.ocorrencia.instrumento else '',
+                    v.ocorrencia_id,
+                ]
+                for v in vitimas.order_by(
+                    '-ocorrencia__data_hora_fato', '-pk'
+                ).iterator(chunk_size=500)
+            ),
+        )
+
+    # 6. Uma página da lista (o total considera o período inteiro)
+    itens, paginacao = _pagina_do_periodo(request, vitimas, data_inicio, data_fim)
 
     context = {
-        'vitimas': vitimas,
-        'data_inicio': data_inicio_dt.strftime('%Y-%m-%d'),
-        'data_fim': data_fim_dt.strftime('%Y-%m-%d'),
+        'vitimas': itens,
+        'total_vitimas': ResumoDiarioEnvolvidos.objects.filter(
+            tipo_participante='V',
+            natureza__in=naturezas_cvli,
+            dia__range=(data_inicio_dt, data_fim_dt),
+        ).aggregate(total=Sum('total'))['total'] or 0,
+        'data_inicio': data_inicio,
+        'data_fim': data_fim,
         'data_inicio_full': dt_inicio_full,
         'data_fim_full': dt_fim_full,
+        **paginacao,
     }
 
-    return render(request, 'rpi/lista_cvli.html', context)
\ No newline at end of file
+    return render(request, 'rpi/lista_cvli.html', context)
+
+
+@login_required
+def painel_estatisticas(request):
+    """
+    Painel de estatísticas de um período (padrão: os últimos 30 dias de
+    plantão), lido só das tabelas consolidadas (rpi.estatisticas).
+    """
+    # 1. Período em dias de plantão
+    data_inicio = request.GET.get("data_inicio")
+    data_fim = request.GET.get("data_fim")
+    if not (data_inicio and data_fim):
+        data_fim = calcular_janela_plantao()["data_inicio_str"]
+        data_inicio = (
+            datetime.strptime(data_fim, "%Y-%m-%d") - timedelta(days=29)
+        ).strftime("%Y-%m-%d")
+    plantao = calcular_janela_plantao(data_inicio, data_fim)
+    dias = estatisticas.dias_do_periodo(data_inicio, data_fim)
+
+    ocorrencias = ResumoDiarioOcorrencias.objects.filter(dia__range=dias)
+    envolvidos = ResumoDiarioEnvolvidos.objects.filter(dia__range=dias)
+    apreensoes = ResumoDiarioApreensoes.objects.filter(dia__range=dias)
+    por_aspecto = {
+        "ocorrencias": Sum("total"),
+        "negativas": Sum("total", filter=Q(tipo_impacto="N")),
+        "positivas": Sum("total", filter=Q(tipo_impacto="P")),
+    }
+
+    # 2. Totais do período
+    totais = ocorrencias.aggregate(**por_aspecto)
+    totais_envolvidos = dict(
+        envolvidos.values_list("tipo_participante").annotate(Sum("total")).order_by()
+    )
+    naturezas_cvli = NaturezaOcorrencia.objects.filter(tags_busca__icontains="CVLI")
+    totais["vitimas_cvli"] = (
+        envolvidos.filter(tipo_participante="V", natureza__in=naturezas_cvli)
+        .aggregate(total=Sum("total"))["total"]
+    )
+    totais["apreensoes"] = apreensoes.aggregate(total=Sum("total"))["total"]
+
+    # 3. Quebras por OPM (com as prisões), natureza, município e dia
+    presos_por_opm = dict(
+        envolvidos.filter(tipo_participante__in=["P", "S", "M", "A"])
+        .values_list("opm")
+        .annotate(Sum("total"))
+        .order_by()
+    )
+    por_opm = list(
+        ocorrencias.values("opm", "opm__nome")
+        .annotate(**por_aspecto)
+        .order_by("opm__nome")
+    )
+    for linha in por_opm:
+        linha["presos"] = presos_por_opm.get(linha["opm"], 0)
+
+    context = {
+        "totais": totais,
+        "totais_envolvidos": [
+            (rotulo, totais_envolvidos.get(tipo, 0))
+            for tipo, rotulo in Envolvido.TIPO_PARTICIPANTE_CHOICES
+        ],
+        "por_opm": por_opm,
+        "por_natureza": ocorrencias.values("natureza__nome", "tipo_impacto")
+        .annotate(total=Sum("total"))
+        .order_by("-total", "natureza__nome"),
+        "por_municipio": ocorrencias.values("municipio__nome")
+        .annotate(**por_aspecto)
+        .order_by("-ocorrencias", "municipio__nome")[:15],
+        "por_material": apreensoes.values("material_tipo__nome", "unidade_medida")
+        .annotate(quantidade=Sum("quantidade"), total=Sum("total"))
+        .order_by("material_tipo__nome"),
+        "por_dia": ocorrencias.values("dia").annotate(**por_aspecto).order_by("-dia"),
+        "data_inicio_full": plantao["dt_inicio"],
+        "data_fim_full": plantao["dt_fim"],
+        "data_inicio": data_inicio,
+        "data_fim": data_fim,
+    }
+    return render(request, "rpi/painel_estatisticas.html", context)
+
+
+def metricas_prometheus(request):
+    """
+    Exporta as métricas de desempenho (rpi.middleware.MetricasMiddleware) no
+    formato texto do Prometheus. Acesso para usuários staff ou para o coletor
+    que enviar o token definido em METRICAS_TOKEN.
+    """
+    token = getattr(settings, "METRICAS_TOKEN", "")
+    cabecalho = request.headers.get("Authorization", "")
+    autorizado_por_token = token and constant_time_compare(cabecalho, f"Bearer {token}")
+
+    if not (autorizado_por_token or request.user.is_staff):
+        return HttpResponse("Acesso restrito.", status=403, content_type="text/plain")
+
+    return HttpResponse(
+        registro_metricas.exportar_prometheus(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@user_passes_test(lambda u: u.is_staff)
+def consultas_lentas(request):
+    """
+    Lista as consultas SQL lentas capturadas (CONSULTAS_LENTAS_LIMITE_MS),
+    agrupadas pela impressão digital do SQL normalizado e ordenadas pelo
+    tempo total gasto no banco.
+    """
+    registros = ConsultaLenta.objects.all()
+
+    view_filtro = request.GET.get("view")
+    if view_filtro:
+        registros = registros.filter(view=view_filtro)
+
+    # 1. Agrupamento por impressão digital (piores primeiro)
+    grupos = list(
+        registros.values("impressao_digital")
+        .annotate(
+            ocorrencias=Count("id"),
+            pior_ms=Max("duracao_ms"),
+            media_ms=Avg("duracao_ms"),
+            total_ms=Sum("duracao_ms"),
+        )
+        .order_by("-total_ms")[:50]
+    )
+
+    # 2. Exemplo (execução mais lenta) de cada grupo, com plano e origem
+    exemplos = {}
+    for consulta in registros.filter(
+        impressao_digital__in=[g["impressao_digital"] for g in grupos]
+    ).order_by("-duracao_ms"):
+        exemplos.setdefault(consulta.impressao_digital, consulta)
+
+    for grupo in grupos:
+        grupo["exemplo"] = exemplos.get(grupo["impressao_digital"])
+
+    views_capturadas = (
+        ConsultaLenta.objects.order_by("view").values_list("view", flat=True).distinct()
+    )
+
+    context = {
+        "grupos": grupos,
+        "views_capturadas": views_capturadas,
+        "view_filtro": view_filtro,
+        "limite_ms": getattr(settings, "CONSULTAS_LENTAS_LIMITE_MS", None),
+    }
+    return render(request, "rpi/consultas_lentas.html", context)
+
+
+@user_passes_test(lambda u: u.is_staff)
+def perfis_requisicao(request):
+    """Lista os perfis cProfile gravados pelo PerfilamentoMiddleware."""
+    context = {
+        "perfis": perfilamento.listar_perfis(),
+        "habilitado": getattr(settings, "PERFILAMENTO_HABILITADO", False),
+    }
+    return render(request, "rpi/perfis_requisicao.html", context)
+
+
+@user_passes_test(lambda u: u.is_staff)
+def download_perfil(request, nome):
+    caminho = perfilamento.caminho_perfil(nome)
+    if not caminho:
+        raise Http404("Perfil não encontrado.")
+    return FileResponse(open(caminho, "rb"), as_attachment=True, filename=caminho.name)